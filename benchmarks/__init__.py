@@ -0,0 +1,15 @@
+"""
+<Program Name>
+  benchmarks/__init__.py
+
+<Purpose>
+  Performance benchmarks for the Uptane reference implementation. These are
+  not run as part of the test suite. Each module is run from the root of the
+  repository, e.g.:
+
+    python -m benchmarks.bench_asn1_codec --help
+
+  Results are written as JSON, and can be saved as a baseline against which
+  later runs are compared (see benchmarks/common.py).
+
+"""
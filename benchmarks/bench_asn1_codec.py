@@ -0,0 +1,306 @@
+"""
+<Program Name>
+  bench_asn1_codec.py
+
+<Purpose>
+  Measures the latency, throughput and memory allocation of the conversions in
+  uptane/encoding/asn1_codec.py, in both directions:
+
+    encode: convert_signed_metadata_to_der
+    decode: convert_signed_der_to_dersigned_json
+
+  for each datatype (Timeserver attestations, ECU Manifests and Vehicle
+  Manifests) at a range of sizes. The data converted is generated from the
+  samples in samples/: a Vehicle Manifest of size N has N ECU Manifests, and
+  a Timeserver attestation of size N has N nonces (one per ECU reporting
+  through the Primary). ECU Manifests do not grow, and are measured once.
+
+  Results are written as JSON (see benchmarks/common.py). If a baseline is
+  given, each median latency is compared to the baseline's, and the exit
+  status is 1 if any exceeds it by more than the tolerance.
+
+  Use (from the root of the repository; requires pyasn1):
+    python -m benchmarks.bench_asn1_codec --output results.json
+    python -m benchmarks.bench_asn1_codec --save-baseline baseline.json
+    python -m benchmarks.bench_asn1_codec --baseline baseline.json
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+import tuf.conf
+import uptane.encoding.asn1_codec as asn1_codec
+
+import os
+import sys
+import copy
+import json
+import hashlib
+import argparse
+
+import benchmarks.common as common
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'samples')
+
+SAMPLE_TIME_ATTESTATION_FNAME = os.path.join(
+    SAMPLES_DIR, 'sample_timeserver_attestation.json')
+SAMPLE_ECU_MANIFEST_FNAME = os.path.join(
+    SAMPLES_DIR, 'sample_ecu_manifest_TCUdemocar.json')
+SAMPLE_VEHICLE_MANIFEST_FNAME = os.path.join(
+    SAMPLES_DIR, 'sample_vehicle_manifest.json')
+
+# Default sizes (numbers of ECUs) at which to measure. The ASN.1 definitions
+# allow at most 256 ECU Manifests in a Vehicle Manifest.
+DEFAULT_ECU_COUNTS = [1, 4, 16, 64, 256]
+MAX_ECU_COUNT = 256
+
+# Default number of timed calls per measurement.
+DEFAULT_REPEAT = 50
+
+# The fields that identify a measurement in the results.
+KEY_FIELDS = ['datatype', 'ecus', 'operation']
+
+DATATYPES = [
+    asn1_codec.DATATYPE_TIME_ATTESTATION,
+    asn1_codec.DATATYPE_ECU_MANIFEST,
+    asn1_codec.DATATYPE_VEHICLE_MANIFEST]
+
+
+
+
+
+def _load_sample(fname):
+  with open(fname) as fobj:
+    return json.load(fobj)
+
+
+
+
+
+def _fake_hex(seed, length):
+  """Returns a deterministic string of hex characters of the given length."""
+  text = ''
+  counter = 0
+  while len(text) < length:
+    text += hashlib.sha512(
+        (seed + '/' + str(counter)).encode('utf-8')).hexdigest()
+    counter += 1
+  return text[:length]
+
+
+
+
+
+def _vary_signatures(signatures, seed):
+  """
+  Returns a copy of the given signatures with keyids and signature values
+  derived from seed, the same lengths as the originals.
+  """
+  signatures = copy.deepcopy(signatures)
+  for i, signature in enumerate(signatures):
+    signature['keyid'] = _fake_hex(seed + '/keyid/' + str(i),
+        len(signature['keyid']))
+    signature['sig'] = _fake_hex(seed + '/sig/' + str(i),
+        len(signature['sig']))
+  return signatures
+
+
+
+
+
+def generate_time_attestation(nonce_count):
+  """
+  Returns a signed Timeserver attestation like the sample one, but with
+  nonce_count nonces.
+  """
+  attestation = copy.deepcopy(_load_sample(SAMPLE_TIME_ATTESTATION_FNAME))
+  attestation['signed']['nonces'] = list(range(1, nonce_count + 1))
+  return attestation
+
+
+
+
+
+def generate_ecu_manifest(ecu_serial, sample=None):
+  """
+  Returns a signed ECU Manifest like the sample one, but from the ECU with
+  the given serial, with hashes and signatures derived from it.
+  """
+  if sample is None:
+    sample = _load_sample(SAMPLE_ECU_MANIFEST_FNAME)
+
+  manifest = copy.deepcopy(sample)
+  manifest['signed']['ecu_serial'] = ecu_serial
+  hashes = manifest['signed']['installed_image']['fileinfo']['hashes']
+  for algorithm in hashes:
+    hashes[algorithm] = _fake_hex(ecu_serial + '/' + algorithm,
+        len(hashes[algorithm]))
+  manifest['signatures'] = _vary_signatures(manifest['signatures'], ecu_serial)
+  return manifest
+
+
+
+
+
+def generate_vehicle_manifest(ecu_count):
+  """
+  Returns a signed Vehicle Manifest like the sample one, but with one ECU
+  Manifest from each of ecu_count ECUs (the first of which is the Primary).
+  """
+  if not 1 <= ecu_count <= MAX_ECU_COUNT:
+    raise ValueError('ecu_count must be from 1 to ' + str(MAX_ECU_COUNT))
+
+  ecu_manifest_sample = _load_sample(SAMPLE_ECU_MANIFEST_FNAME)
+  manifest = copy.deepcopy(_load_sample(SAMPLE_VEHICLE_MANIFEST_FNAME))
+
+  ecu_serials = ['ECU%05d' % i for i in range(ecu_count)]
+  manifest['signed']['primary_ecu_serial'] = ecu_serials[0]
+  manifest['signed']['ecu_version_manifests'] = dict(
+      (serial, [generate_ecu_manifest(serial, ecu_manifest_sample)])
+      for serial in ecu_serials)
+
+  return manifest
+
+
+
+
+
+def generate(datatype, ecu_count):
+  """Returns signed metadata of the given datatype and size to convert."""
+  if datatype == asn1_codec.DATATYPE_TIME_ATTESTATION:
+    return generate_time_attestation(ecu_count)
+  elif datatype == asn1_codec.DATATYPE_ECU_MANIFEST:
+    return generate_ecu_manifest('ECU00000')
+  elif datatype == asn1_codec.DATATYPE_VEHICLE_MANIFEST:
+    return generate_vehicle_manifest(ecu_count)
+  else:
+    raise ValueError('Unknown datatype: ' + repr(datatype))
+
+
+
+
+
+def _measure(datatype, ecu_count, operation, function, data_bytes, repeat):
+  durations = common.time_calls(function, repeat)
+  total_seconds = sum(durations)
+
+  measurement = {
+      'datatype': datatype,
+      'ecus': ecu_count,
+      'operation': operation,
+      'iterations': repeat,
+      'der_bytes': data_bytes,
+      'ops_per_second': repeat / total_seconds if total_seconds else None,
+      'bytes_per_second':
+          data_bytes * repeat / total_seconds if total_seconds else None}
+  measurement.update(common.summarize_latencies(durations))
+  measurement.update(common.measure_allocations(function))
+
+  return measurement
+
+
+
+
+
+def run_benchmarks(ecu_counts=DEFAULT_ECU_COUNTS, datatypes=DATATYPES,
+    repeat=DEFAULT_REPEAT):
+  """
+  <Purpose>
+    Measures encoding and decoding of each of the given datatypes at each of
+    the given sizes.
+
+  <Returns>
+    A results dictionary (see benchmarks/common.py), each measurement having
+    the fields:
+      'datatype', 'ecus', 'operation' ('encode' or 'decode'), 'iterations',
+      'der_bytes' (the size of the DER encoding), 'ops_per_second',
+      'bytes_per_second' (of DER produced or consumed), the latency summary
+      from common.summarize_latencies, and the allocation figures from
+      common.measure_allocations.
+  """
+  results = []
+
+  for datatype in datatypes:
+    # ECU Manifests do not grow with the number of ECUs.
+    counts = [1] if datatype == asn1_codec.DATATYPE_ECU_MANIFEST \
+        else ecu_counts
+
+    for ecu_count in counts:
+      signed_metadata = generate(datatype, ecu_count)
+      der_data = asn1_codec.convert_signed_metadata_to_der(
+          signed_metadata, datatype)
+
+      results.append(_measure(datatype, ecu_count, 'encode',
+          lambda: asn1_codec.convert_signed_metadata_to_der(
+          signed_metadata, datatype), len(der_data), repeat))
+
+      results.append(_measure(datatype, ecu_count, 'decode',
+          lambda: asn1_codec.convert_signed_der_to_dersigned_json(
+          der_data, datatype), len(der_data), repeat))
+
+      print('%s, %d ECUs: encode %.1f us, decode %.1f us (%d bytes)' % (
+          datatype, ecu_count, results[-2]['p50_us'], results[-1]['p50_us'],
+          len(der_data)), file=sys.stderr)
+
+  return {
+      'meta': common.run_metadata(benchmark='asn1_codec', repeat=repeat,
+          metadata_format=tuf.conf.METADATA_FORMAT),
+      'results': results}
+
+
+
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+      description='Benchmark ASN.1/DER encoding and decoding of Uptane '
+      'metadata.')
+  parser.add_argument('--ecus', default=','.join(
+      str(count) for count in DEFAULT_ECU_COUNTS),
+      help='Comma-separated numbers of ECUs (1 to ' + str(MAX_ECU_COUNT) +
+      ') at which to measure. Default: %(default)s')
+  parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+      help='Timed calls per measurement. Default: %(default)s')
+  parser.add_argument('--output', default='-',
+      help='File to which to write the results as JSON. Default: standard '
+      'output')
+  parser.add_argument('--baseline',
+      help='Results file against which to compare median latencies')
+  parser.add_argument('--save-baseline',
+      help='File to which to also write the results, as a new baseline')
+  parser.add_argument('--tolerance', type=float,
+      default=common.DEFAULT_TOLERANCE,
+      help='Greatest fraction by which a median latency may exceed the '
+      'baseline\'s. Default: %(default)s')
+  args = parser.parse_args(argv)
+
+  if not asn1_codec.PYASN1_EXISTS:
+    parser.error('pyasn1 is required to run this benchmark.')
+
+  ecu_counts = [int(count) for count in args.ecus.split(',')]
+  if any(not 1 <= count <= MAX_ECU_COUNT for count in ecu_counts):
+    parser.error('--ecus values must be from 1 to ' + str(MAX_ECU_COUNT))
+
+  results = run_benchmarks(ecu_counts, repeat=args.repeat)
+
+  common.write_results(results, args.output)
+  if args.save_baseline:
+    common.write_results(results, args.save_baseline)
+
+  if args.baseline:
+    comparisons = common.compare_to_baseline(results,
+        common.load_results(args.baseline), KEY_FIELDS, args.tolerance)
+    common.print_comparisons(comparisons, KEY_FIELDS)
+    if any(comparison['regression'] for comparison in comparisons):
+      return 1
+
+  return 0
+
+
+
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,691 @@
+"""
+<Program Name>
+  bench_fleet.py
+
+<Purpose>
+  Simulates a fleet of vehicles, each with a Primary and a number of
+  Secondaries (uptane.clients.primary.Primary and
+  uptane.clients.secondary.Secondary objects), running full update cycles
+  against local stand-ins for the services, and reports the latency of each
+  stage of the update cycle.
+
+  The services are:
+   -a Director (uptane.services.director.Director) with a repository for each
+    vehicle, which assigns an image (demo/images/TCU1.1.txt) to the first
+    Secondary in each vehicle, and which ingests the vehicles' manifests;
+   -an Image Repository, the sample Image Repository metadata in samples/,
+    with the images from demo/images;
+   -a Timeserver (uptane.services.timeserver.Timeserver).
+  Clients reach the repositories through file:// URLs and call the Director
+  and Timeserver objects directly, so no servers need to be running. Every
+  Primary uses the demo's Primary key, and every Secondary the demo's
+  Secondary key.
+
+  Each update cycle of each vehicle is divided into four stages, which are
+  timed separately:
+
+    manifest_ingest
+      Each Secondary signs an ECU Manifest and submits it to the Primary,
+      which signs a Vehicle Manifest that the Director then validates and
+      records.
+
+    time_attestation
+      The Primary requests a signed time for its Secondaries' nonces from the
+      Timeserver and validates it, and each Secondary validates it in turn.
+
+    metadata_refresh
+      The Primary's update cycle (Primary.primary_update_cycle): metadata and
+      images are downloaded from the repositories and validated.
+
+    image_delivery
+      Each Secondary receives and fully validates the metadata archive from
+      the Primary, and the image assigned to it, if any.
+
+  If a stage fails, the failure is counted and the rest of that vehicle's
+  cycle is skipped.
+
+  Vehicles are simulated one after another in this process or, with
+  --processes, divided among worker processes. Results are written as JSON
+  (see benchmarks/common.py), and can be compared to a baseline like those
+  of bench_asn1_codec.py.
+
+  Use (from the root of the repository):
+    python -m benchmarks.bench_fleet --vehicles 1000 --secondaries 4 \
+        --processes 8 --output results.json
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+import uptane.common
+import uptane.clients.primary as primary
+import uptane.clients.secondary as secondary
+import uptane.services.director as director
+import uptane.services.timeserver as timeserver
+import uptane.services.inventorydb as inventory
+import tuf
+import tuf.conf
+import tuf.formats
+import demo # for the demo's keys
+
+import os
+import sys
+import json
+import time
+import shutil
+import timeit
+import logging
+import argparse
+import tempfile
+import multiprocessing
+
+import benchmarks.common as common
+
+REPO_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The sample Image Repository metadata used as the Image Repository stand-in.
+SAMPLE_IMAGE_REPO_METADATA_DIR = os.path.join(
+    REPO_ROOT_DIR, 'samples', 'metadata_samples_long_expiry',
+    'update_to_one_ecu', 'full_metadata_archive', 'imagerepo', 'metadata')
+IMAGES_DIR = os.path.join(REPO_ROOT_DIR, 'demo', 'images')
+
+# The image the Director assigns to the first Secondary in each vehicle. It is
+# listed in the sample Image Repository metadata.
+IMAGE_FNAME = 'TCU1.1.txt'
+
+# The firmware every Secondary starts with.
+FACTORY_FIRMWARE_FILEINFO = {
+    'filepath': '/secondary_firmware.txt',
+    'fileinfo': {
+        'hashes': {
+            'sha512': '706c283972c5ae69864b199e1cdd9b4b8babc14f5a454d0fd4d3b35396a04ca0b40af731671b74020a738b5108a78deb032332c36d6ae9f31fae2f8a70f7e1ce',
+            'sha256': '6b9f987226610bfed08b824c93bf8b2f59521fce9a2adef80c495f363c1c9c44'},
+        'length': 37}}
+
+IMAGE_REPO_NAME = 'imagerepo'
+DIRECTOR_REPO_NAME = 'director'
+
+DEFAULT_VEHICLES = 100
+DEFAULT_SECONDARIES = 2
+DEFAULT_CYCLES = 1
+
+# The full_refresh_interval given to Primaries allowed to skip update cycles
+# (see --no-force-refresh).
+FULL_REFRESH_INTERVAL = 60
+
+STAGES = [
+    'manifest_ingest', 'time_attestation', 'metadata_refresh',
+    'image_delivery']
+
+# The fields that identify a measurement in the results.
+KEY_FIELDS = ['stage', 'vehicles', 'secondaries']
+
+
+
+
+
+def get_vins(vehicle_count):
+  return ['simcar%06d' % i for i in range(vehicle_count)]
+
+
+
+
+
+def get_primary_ecu_serial(vin):
+  return vin + '-primary'
+
+
+
+
+
+def get_secondary_ecu_serials(vin, secondary_count):
+  return [vin + '-ecu%03d' % i for i in range(secondary_count)]
+
+
+
+
+
+def _load_keys():
+  """
+  Returns a dictionary of the demo keys used by the services and clients.
+  """
+  keys = {}
+  for keyname in ['directorroot', 'directortimestamp', 'directorsnapshot',
+      'director', 'timeserver']:
+    keys[keyname + '_pub'] = demo.import_public_key(keyname)
+    keys[keyname + '_pri'] = demo.import_private_key(keyname)
+
+  for keyname in ['primary', 'secondary']:
+    keys[keyname + '_pub'] = demo.import_public_key(keyname)
+    keys[keyname] = uptane.common.canonical_key_from_pub_and_pri(
+        keys[keyname + '_pub'], demo.import_private_key(keyname))
+
+  return keys
+
+
+
+
+
+def _create_director(work_dir, keys):
+  return director.Director(
+      director_repos_dir=os.path.join(work_dir, DIRECTOR_REPO_NAME),
+      key_root_pri=keys['directorroot_pri'],
+      key_root_pub=keys['directorroot_pub'],
+      key_timestamp_pri=keys['directortimestamp_pri'],
+      key_timestamp_pub=keys['directortimestamp_pub'],
+      key_snapshot_pri=keys['directorsnapshot_pri'],
+      key_snapshot_pub=keys['directorsnapshot_pub'],
+      key_targets_pri=keys['director_pri'],
+      key_targets_pub=keys['director_pub'])
+
+
+
+
+
+def _register_vehicle(director_instance, vin, secondary_count, keys):
+  """
+  Registers the vehicle and its ECUs' keys with the Director, unless already
+  registered (e.g. in the process from which a worker process was forked).
+  """
+  if vin in inventory.ecus_by_vin:
+    return
+
+  inventory.register_vehicle(vin)
+
+  director_instance.register_ecu_serial(get_primary_ecu_serial(vin),
+      keys['primary_pub'], vin, is_primary=True)
+
+  for ecu_serial in get_secondary_ecu_serials(vin, secondary_count):
+    director_instance.register_ecu_serial(
+        ecu_serial, keys['secondary_pub'], vin)
+
+
+
+
+
+def set_up_services(work_dir, vins, secondary_count, processes=None):
+  """
+  <Purpose>
+    Creates the repositories that the simulated vehicles update from in
+    work_dir: the Image Repository stand-in, and a Director repository for
+    each vehicle, assigning IMAGE_FNAME to each vehicle's first Secondary.
+    Registers the vehicles and their ECUs with the Director.
+
+  <Returns>
+    The Director.
+  """
+  keys = _load_keys()
+
+  image_repo_dir = os.path.join(work_dir, IMAGE_REPO_NAME)
+  shutil.copytree(SAMPLE_IMAGE_REPO_METADATA_DIR,
+      os.path.join(image_repo_dir, 'metadata'))
+  shutil.copytree(IMAGES_DIR, os.path.join(image_repo_dir, 'targets'))
+
+  os.makedirs(os.path.join(work_dir, DIRECTOR_REPO_NAME))
+
+  # The Director changes the working directory when creating repositories.
+  cwd = os.getcwd()
+  try:
+    director_instance = _create_director(work_dir, keys)
+
+    for vin in vins:
+      director_instance.add_new_vehicle(vin)
+      _register_vehicle(director_instance, vin, secondary_count, keys)
+
+    if secondary_count:
+      director_instance.assign_campaign(
+          os.path.join(IMAGES_DIR, IMAGE_FNAME),
+          [(vin, get_secondary_ecu_serials(vin, 1)[0]) for vin in vins],
+          processes=processes)
+
+    director_instance.write_to_live(processes=processes)
+
+  finally:
+    os.chdir(cwd)
+
+  return director_instance
+
+
+
+
+
+class SimulatedVehicle(object):
+  """
+  <Purpose>
+    A vehicle: a Primary and its Secondaries, each with its own client
+    directory under vehicle_dir, updating from the repositories in work_dir
+    (see set_up_services).
+
+    Since the TUF client keeps its client directory in tuf.conf, only one
+    client's methods may run at a time in a process, and the client directory
+    is set before each client is used.
+
+  <Methods>
+    run_update_cycle(timeserver_instance, director_instance, durations,
+        errors, force_refresh=True)
+  """
+
+  def __init__(self, work_dir, vin, secondary_count, keys, clock,
+      full_refresh_interval=0):
+
+    self.vin = vin
+    vehicle_dir = os.path.join(work_dir, 'vehicles', vin)
+    os.makedirs(vehicle_dir)
+
+    image_repo_dir = os.path.join(work_dir, IMAGE_REPO_NAME)
+    director_repo_dir = os.path.join(work_dir, DIRECTOR_REPO_NAME, vin)
+    root_fnames = {
+        IMAGE_REPO_NAME: os.path.join(
+            image_repo_dir, 'metadata', 'root.' + tuf.conf.METADATA_FORMAT),
+        DIRECTOR_REPO_NAME: os.path.join(
+            director_repo_dir, 'metadata', 'root.' + tuf.conf.METADATA_FORMAT)}
+
+    # The Primary updates from the repositories, and each Secondary from the
+    # metadata archive the Primary gives it, expanded in its client directory.
+    self.primary_dir = os.path.join(vehicle_dir, 'primary')
+    _create_client_directory(self.primary_dir, image_repo_dir,
+        director_repo_dir, root_fnames)
+
+    self.primary = primary.Primary(
+        full_client_dir=self.primary_dir,
+        director_repo_name=DIRECTOR_REPO_NAME,
+        vin=vin,
+        ecu_serial=get_primary_ecu_serial(vin),
+        primary_key=keys['primary'],
+        time=clock,
+        timeserver_public_key=keys['timeserver_pub'],
+        full_refresh_interval=full_refresh_interval)
+
+    self.secondaries = []
+    for ecu_serial in get_secondary_ecu_serials(vin, secondary_count):
+      client_dir = os.path.join(vehicle_dir, ecu_serial)
+      _create_client_directory(client_dir,
+          os.path.join(client_dir, 'unverified', IMAGE_REPO_NAME),
+          os.path.join(client_dir, 'unverified', DIRECTOR_REPO_NAME),
+          root_fnames)
+
+      self.secondaries.append(secondary.Secondary(
+          full_client_dir=client_dir,
+          director_repo_name=DIRECTOR_REPO_NAME,
+          vin=vin,
+          ecu_serial=ecu_serial,
+          ecu_key=keys['secondary'],
+          time=clock,
+          timeserver_public_key=keys['timeserver_pub'],
+          firmware_fileinfo=FACTORY_FIRMWARE_FILEINFO))
+
+      self.primary.register_new_secondary(ecu_serial)
+
+
+
+
+
+  def run_update_cycle(self, timeserver_instance, director_instance,
+      durations, errors, force_refresh=True):
+    """
+    Runs one update cycle for the vehicle, appending the time taken by each
+    stage, in seconds, to the list for that stage in durations. If a stage
+    fails, the exception is appended to the list for that stage in errors,
+    and the rest of the cycle is skipped. Returns True if every stage
+    succeeded.
+    """
+    timer = timeit.default_timer
+
+    for stage, stage_function in [
+        ('manifest_ingest', lambda: self._ingest_manifests(director_instance)),
+        ('time_attestation',
+            lambda: self._attest_time(timeserver_instance)),
+        ('metadata_refresh', lambda: self._refresh_metadata(force_refresh)),
+        ('image_delivery', self._deliver_images)]:
+
+      start_time = timer()
+      try:
+        stage_function()
+      except Exception as e:
+        errors[stage].append(e)
+        return False
+
+      durations[stage].append(timer() - start_time)
+
+    return True
+
+
+
+
+
+  def _ingest_manifests(self, director_instance):
+    for secondary_instance in self.secondaries:
+      tuf.conf.repository_directory = secondary_instance.full_client_dir
+      self.primary.register_ecu_manifest(self.vin,
+          secondary_instance.ecu_serial, secondary_instance.nonce_next,
+          secondary_instance.generate_signed_ecu_manifest())
+      secondary_instance.set_nonce_as_sent()
+
+    director_instance.register_vehicle_manifest(self.vin,
+        self.primary.ecu_serial,
+        self.primary.generate_signed_vehicle_manifest())
+
+
+
+
+
+  def _attest_time(self, timeserver_instance):
+    nonces = self.primary.get_nonces_to_send_and_rotate()
+
+    if tuf.conf.METADATA_FORMAT == 'der':
+      attestation = timeserver_instance.get_signed_time_der(nonces)
+    else:
+      attestation = timeserver_instance.get_signed_time(nonces)
+
+    self.primary.validate_time_attestation(attestation)
+
+    attestation = self.primary.get_last_timeserver_attestation()
+    for secondary_instance in self.secondaries:
+      secondary_instance.validate_time_attestation(attestation)
+
+
+
+
+
+  def _refresh_metadata(self, force_refresh):
+    tuf.conf.repository_directory = self.primary_dir
+    self.primary.primary_update_cycle(force_refresh=force_refresh)
+
+
+
+
+
+  def _deliver_images(self):
+    archive_fname = self.primary.get_full_metadata_archive_fname()
+
+    for secondary_instance in self.secondaries:
+      client_dir = secondary_instance.full_client_dir
+      tuf.conf.repository_directory = client_dir
+
+      # Stands in for the transfer of the archive from Primary to Secondary.
+      received_archive_fname = os.path.join(client_dir, 'metadata_archive.zip')
+      shutil.copyfile(archive_fname, received_archive_fname)
+      secondary_instance.process_metadata(received_archive_fname)
+
+      image_fname = self.primary.get_image_fname_for_ecu(
+          secondary_instance.ecu_serial)
+      if image_fname is None or \
+          not secondary_instance.validated_targets_for_this_ecu:
+        continue
+
+      target_info = secondary_instance.validated_targets_for_this_ecu[-1]
+      target_fname = target_info['filepath'].lstrip('/')
+
+      unverified_targets_dir = os.path.join(client_dir, 'unverified_targets')
+      if not os.path.exists(unverified_targets_dir):
+        os.mkdir(unverified_targets_dir)
+      shutil.copyfile(
+          image_fname, os.path.join(unverified_targets_dir, target_fname))
+
+      secondary_instance.validate_image(target_fname)
+
+      # "Install" the image.
+      secondary_instance.firmware_fileinfo = target_info
+
+
+
+
+
+def _create_client_directory(
+    client_dir, image_repo_dir, director_repo_dir, root_fnames):
+  """
+  Creates a client directory with a pinning file (beside it, as the client
+  directory links to it) directing the client to the given repositories.
+  """
+  pinnings = {
+      'repositories': {
+          IMAGE_REPO_NAME: {'mirrors': ['file://' + image_repo_dir]},
+          DIRECTOR_REPO_NAME: {'mirrors': ['file://' + director_repo_dir]}},
+      'delegations': [{
+          'paths': ['*'],
+          'repositories': [IMAGE_REPO_NAME, DIRECTOR_REPO_NAME]}]}
+
+  pinning_fname = client_dir + '.pinned.json'
+  with open(pinning_fname, 'w') as fobj:
+    json.dump(pinnings, fobj)
+
+  uptane.common.create_directory_structure_for_client(
+      client_dir, pinning_fname, root_fnames)
+
+
+
+
+
+def simulate_vehicles(work_dir, vins, secondary_count, cycles,
+    force_refresh=True, director_instance=None):
+  """
+  <Purpose>
+    Creates a SimulatedVehicle for each of the given VINs and runs cycles
+    update cycles for each, one vehicle at a time. The services must already
+    have been set up in work_dir (see set_up_services). If director_instance
+    is not given, a Director is created over the repositories in work_dir.
+
+  <Returns>
+    A dictionary with:
+      'durations': {<stage>: <list of durations, in seconds>}
+      'errors': {<stage>: <number of failures>}
+      'error_examples': a list of up to 5 strings describing failures
+      'cycles_completed': the number of cycles in which every stage succeeded
+  """
+  keys = _load_keys()
+
+  if director_instance is None:
+    director_instance = _create_director(work_dir, keys)
+  for vin in vins:
+    _register_vehicle(director_instance, vin, secondary_count, keys)
+
+  timeserver_instance = timeserver.Timeserver(keys['timeserver_pri'])
+
+  clock = tuf.formats.unix_timestamp_to_datetime(
+      int(time.time())).isoformat() + 'Z'
+
+  # Primaries may only skip cycles if so configured.
+  full_refresh_interval = 0 if force_refresh else FULL_REFRESH_INTERVAL
+  vehicles = [SimulatedVehicle(work_dir, vin, secondary_count, keys, clock,
+      full_refresh_interval) for vin in vins]
+
+  durations = dict((stage, []) for stage in STAGES)
+  errors = dict((stage, []) for stage in STAGES)
+  cycles_completed = 0
+
+  for cycle in range(cycles):
+    for vehicle in vehicles:
+      if vehicle.run_update_cycle(timeserver_instance, director_instance,
+          durations, errors, force_refresh):
+        cycles_completed += 1
+
+  error_examples = []
+  for stage in STAGES:
+    for e in errors[stage][:5 - len(error_examples)]:
+      error_examples.append(stage + ': ' + repr(e))
+
+  return {
+      'durations': durations,
+      'errors': dict((stage, len(errors[stage])) for stage in STAGES),
+      'error_examples': error_examples,
+      'cycles_completed': cycles_completed}
+
+
+
+
+
+def _simulate_vehicles_in_worker(task):
+  """
+  Runs simulate_vehicles in a worker process. task is a tuple of its
+  arguments, except director_instance.
+  """
+  return simulate_vehicles(*task)
+
+
+
+
+
+def run_benchmark(vehicle_count=DEFAULT_VEHICLES,
+    secondary_count=DEFAULT_SECONDARIES, cycles=DEFAULT_CYCLES,
+    processes=None, force_refresh=True, work_dir=None):
+  """
+  <Purpose>
+    Sets up the services for a fleet of vehicle_count vehicles, each with
+    secondary_count Secondaries, and runs cycles update cycles for each
+    vehicle, in this process or, if processes is given, divided among that
+    many worker processes.
+
+    If work_dir is given, the repositories and client directories are created
+    (and left) there; otherwise, a temporary directory is used and removed
+    afterwards.
+
+  <Returns>
+    A results dictionary (see benchmarks/common.py), with one measurement per
+    stage (see STAGES), each with the fields 'stage', 'vehicles',
+    'secondaries', 'samples' (the number of times the stage succeeded),
+    'errors' (the number of times it failed), and the latency summary from
+    common.summarize_latencies (if it ever succeeded).
+  """
+  remove_work_dir = work_dir is None
+  if work_dir is None:
+    work_dir = tempfile.mkdtemp(prefix='uptane_fleet_')
+  work_dir = os.path.abspath(work_dir)
+
+  vins = get_vins(vehicle_count)
+
+  try:
+    start_time = time.time()
+    director_instance = set_up_services(
+        work_dir, vins, secondary_count, processes)
+    setup_seconds = time.time() - start_time
+    print('Set up services for ' + str(vehicle_count) + ' vehicles in ' +
+        '%.1f' % setup_seconds + ' seconds.', file=sys.stderr)
+
+    start_time = time.time()
+
+    if processes is None:
+      outcomes = [simulate_vehicles(work_dir, vins, secondary_count, cycles,
+          force_refresh, director_instance)]
+
+    else:
+      tasks = [(work_dir, vins[i::processes], secondary_count, cycles,
+          force_refresh) for i in range(processes) if vins[i::processes]]
+      pool = multiprocessing.Pool(len(tasks))
+      try:
+        outcomes = pool.map(_simulate_vehicles_in_worker, tasks)
+      finally:
+        pool.close()
+        pool.join()
+
+    simulation_seconds = time.time() - start_time
+
+  finally:
+    if remove_work_dir:
+      shutil.rmtree(work_dir, ignore_errors=True)
+
+  results = []
+  for stage in STAGES:
+    durations = []
+    errors = 0
+    for outcome in outcomes:
+      durations.extend(outcome['durations'][stage])
+      errors += outcome['errors'][stage]
+
+    measurement = {'stage': stage, 'vehicles': vehicle_count,
+        'secondaries': secondary_count, 'samples': len(durations),
+        'errors': errors, 'p50_us': None}
+    if durations:
+      measurement.update(common.summarize_latencies(durations))
+    results.append(measurement)
+
+    print(stage + ': ' + str(len(durations)) + ' samples, ' + str(errors) +
+        ' errors' + ('' if not durations else ', p50 %.1f ms, p99 %.1f ms' % (
+        measurement['p50_us'] / 1000, measurement['p99_us'] / 1000)),
+        file=sys.stderr)
+
+  cycles_completed = sum(outcome['cycles_completed'] for outcome in outcomes)
+
+  for outcome in outcomes:
+    for example in outcome['error_examples']:
+      print('Failure: ' + example, file=sys.stderr)
+
+  return {
+      'meta': common.run_metadata(benchmark='fleet', vehicles=vehicle_count,
+          secondaries=secondary_count, cycles=cycles, processes=processes,
+          force_refresh=force_refresh,
+          metadata_format=tuf.conf.METADATA_FORMAT,
+          setup_seconds=setup_seconds,
+          simulation_seconds=simulation_seconds,
+          cycles_completed=cycles_completed,
+          cycles_per_second=cycles_completed / simulation_seconds
+              if simulation_seconds else None),
+      'results': results}
+
+
+
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+      description='Simulate update cycles for a fleet of vehicles and report '
+      'the latency of each stage.')
+  parser.add_argument('--vehicles', type=int, default=DEFAULT_VEHICLES,
+      help='Number of vehicles. Default: %(default)s')
+  parser.add_argument('--secondaries', type=int, default=DEFAULT_SECONDARIES,
+      help='Number of Secondaries per vehicle. Default: %(default)s')
+  parser.add_argument('--cycles', type=int, default=DEFAULT_CYCLES,
+      help='Update cycles per vehicle. Default: %(default)s')
+  parser.add_argument('--processes', type=int,
+      help='Number of worker processes among which to divide the vehicles. '
+      'Default: simulate every vehicle in this process')
+  parser.add_argument('--no-force-refresh', dest='force_refresh',
+      action='store_false', help='Let Primaries skip update cycles when the '
+      'Director\'s metadata has not changed, as they do when given a '
+      'full_refresh_interval')
+  parser.add_argument('--work-dir',
+      help='Directory in which to create (and leave) repositories and client '
+      'directories. Default: a temporary directory, removed afterwards')
+  parser.add_argument('--output', default='-',
+      help='File to which to write the results as JSON. Default: standard '
+      'output')
+  parser.add_argument('--baseline',
+      help='Results file against which to compare median latencies')
+  parser.add_argument('--save-baseline',
+      help='File to which to also write the results, as a new baseline')
+  parser.add_argument('--tolerance', type=float,
+      default=common.DEFAULT_TOLERANCE,
+      help='Greatest fraction by which a median latency may exceed the '
+      'baseline\'s. Default: %(default)s')
+  args = parser.parse_args(argv)
+
+  if args.vehicles < 1 or args.secondaries < 0 or args.cycles < 1 or \
+      (args.processes is not None and args.processes < 1):
+    parser.error('--vehicles, --cycles and --processes must be positive, and '
+        '--secondaries must not be negative.')
+
+  # Thousands of simulated clients log far too much to show.
+  uptane.configure_logging(logging.WARNING)
+
+  results = run_benchmark(args.vehicles, args.secondaries, args.cycles,
+      args.processes, args.force_refresh, args.work_dir)
+
+  common.write_results(results, args.output)
+  if args.save_baseline:
+    common.write_results(results, args.save_baseline)
+
+  if args.baseline:
+    comparisons = common.compare_to_baseline(results,
+        common.load_results(args.baseline), KEY_FIELDS, args.tolerance)
+    common.print_comparisons(comparisons, KEY_FIELDS)
+    if any(comparison['regression'] for comparison in comparisons):
+      return 1
+
+  return 0
+
+
+
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,221 @@
+"""
+<Program Name>
+  common.py
+
+<Purpose>
+  Functions shared by the benchmarks in this directory: timing repeated calls,
+  summarizing the timings, writing results as JSON, and comparing results
+  against a stored baseline.
+
+  Results are dictionaries of the form:
+    {'meta': {<information about the run: Python version, platform, time>},
+     'results': [<one dictionary per measurement>, ...]}
+
+  Each measurement is identified by the values of the keys named in the
+  benchmark's key fields (e.g. datatype, number of ECUs, and operation), and
+  compared against the baseline measurement with the same key by its median
+  latency ('p50_us').
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import sys
+import json
+import time
+import platform
+import timeit
+
+try:
+  import tracemalloc # Python 3.4+
+except ImportError:
+  tracemalloc = None
+
+# Default greatest fraction by which a measurement's median latency may exceed
+# the baseline's before it is reported as a regression.
+DEFAULT_TOLERANCE = 0.2
+
+
+
+
+
+def percentile(sorted_values, fraction):
+  """
+  Returns the value at the given fraction (0 to 1) of the way through
+  sorted_values (a non-empty, sorted list), using the nearest rank.
+  """
+  index = int(round(fraction * (len(sorted_values) - 1)))
+  return sorted_values[index]
+
+
+
+
+
+def summarize_latencies(seconds):
+  """
+  Given a list of durations in seconds, returns a dictionary summarizing them
+  in microseconds: 'min_us', 'mean_us', 'p50_us', 'p90_us', 'p99_us', and
+  'max_us'.
+  """
+  microseconds = sorted([s * 1e6 for s in seconds])
+  return {
+      'min_us': microseconds[0],
+      'mean_us': sum(microseconds) / len(microseconds),
+      'p50_us': percentile(microseconds, 0.5),
+      'p90_us': percentile(microseconds, 0.9),
+      'p99_us': percentile(microseconds, 0.99),
+      'max_us': microseconds[-1]}
+
+
+
+
+
+def time_calls(function, repeat, warmup=1):
+  """
+  Calls function (with no arguments) warmup times, untimed, and then repeat
+  times, timing each call. Returns the list of durations, in seconds.
+  """
+  for i in range(warmup):
+    function()
+
+  timer = timeit.default_timer
+  durations = []
+  for i in range(repeat):
+    start = timer()
+    function()
+    durations.append(timer() - start)
+
+  return durations
+
+
+
+
+
+def measure_allocations(function):
+  """
+  Calls function (with no arguments) once, tracing memory allocations, and
+  returns a dictionary with the peak number of bytes allocated during the call
+  ('peak_alloc_bytes') and the number of those bytes still allocated when it
+  returns, including its result ('retained_alloc_bytes'). Both are None where
+  tracemalloc is unavailable (Python 2).
+  """
+  if tracemalloc is None:
+    return {'peak_alloc_bytes': None, 'retained_alloc_bytes': None}
+
+  tracemalloc.start()
+  try:
+    initial_bytes = tracemalloc.get_traced_memory()[0]
+    result = function()
+    current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+
+  return {
+      'peak_alloc_bytes': peak_bytes - initial_bytes,
+      'retained_alloc_bytes': current_bytes - initial_bytes}
+
+
+
+
+
+def run_metadata(**extra):
+  """
+  Returns a dictionary describing the current run (Python version, platform,
+  and time), updated with any keyword arguments given.
+  """
+  meta = {
+      'python': platform.python_version(),
+      'implementation': platform.python_implementation(),
+      'platform': platform.platform(),
+      'time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}
+  meta.update(extra)
+  return meta
+
+
+
+
+
+def write_results(results, filename):
+  """
+  Writes results as JSON to the file filename, or to standard output if
+  filename is '-'.
+  """
+  text = json.dumps(results, indent=1, sort_keys=True)
+  if filename == '-':
+    print(text)
+  else:
+    with open(filename, 'w') as fobj:
+      fobj.write(text + '\n')
+
+
+
+
+
+def load_results(filename):
+  """Returns the results stored as JSON in the file filename."""
+  with open(filename) as fobj:
+    return json.load(fobj)
+
+
+
+
+
+def compare_to_baseline(results, baseline, key_fields,
+    tolerance=DEFAULT_TOLERANCE):
+  """
+  <Purpose>
+    Compares each measurement in results to the measurement in baseline with
+    the same key (the values of key_fields), by median latency.
+
+  <Arguments>
+    results, baseline
+      Results dictionaries (see the module docstring).
+
+    key_fields
+      The names of the fields that identify a measurement.
+
+    tolerance   (optional)
+      The greatest fraction by which a median latency may exceed the
+      baseline's before the measurement is counted as a regression.
+
+  <Returns>
+    A list of dictionaries, one per measurement in results that has a
+    counterpart in baseline (and a median latency in both), each with the measurement's key fields and:
+      'baseline_p50_us', 'p50_us', 'ratio' (p50_us / baseline_p50_us), and
+      'regression' (True if ratio exceeds 1 + tolerance).
+  """
+  def key_of(measurement):
+    return tuple(measurement.get(field) for field in key_fields)
+
+  baseline_by_key = dict(
+      (key_of(measurement), measurement) for measurement in baseline['results'])
+
+  comparisons = []
+  for measurement in results['results']:
+    baseline_measurement = baseline_by_key.get(key_of(measurement))
+    if baseline_measurement is None or not baseline_measurement['p50_us'] \
+        or measurement['p50_us'] is None:
+      continue
+
+    ratio = measurement['p50_us'] / baseline_measurement['p50_us']
+    comparison = dict((field, measurement.get(field)) for field in key_fields)
+    comparison.update({
+        'baseline_p50_us': baseline_measurement['p50_us'],
+        'p50_us': measurement['p50_us'],
+        'ratio': ratio,
+        'regression': ratio > 1 + tolerance})
+    comparisons.append(comparison)
+
+  return comparisons
+
+
+
+
+
+def print_comparisons(comparisons, key_fields, stream=sys.stderr):
+  """Prints the comparisons made by compare_to_baseline, one per line."""
+  for comparison in comparisons:
+    print(' '.join([str(comparison[field]) for field in key_fields]) +
+        ': %.1f us (baseline %.1f us, x%.2f)%s' % (comparison['p50_us'],
+        comparison['baseline_p50_us'], comparison['ratio'],
+        '  REGRESSION' if comparison['regression'] else ''), file=stream)
@@ -61,6 +61,10 @@ import atexit # to kill server process on exit()
 # director.py, etc.) currently uses this setting, but it could.
 uptane.DEMO_MODE = True
 
+# Show the reference implementation's log messages during the demonstration,
+# and keep them in uptane.log.
+uptane.configure_logging(uptane.logging.DEBUG, log_to_file=True)
+
 LOG_PREFIX = uptane.TEAL_BG + 'Director:' + ENDCOLORS + ' '
 
 KNOWN_VINS = ['111', '112', '113', 'democar']
@@ -154,47 +158,31 @@ def clean_slate(use_new_keys=False):
 
 
 
-def write_to_live(vin_to_update=None):
+def write_to_live(vin_to_update=None, processes=None):
   # Release updated metadata.
 
-  # For each vehicle repository:
+  # For each vehicle repository that has changed since its metadata was last
+  # released:
   #   - write metadata.staged
-  #   - copy metadata.staged to the live metadata directory
-  for vin in director_service_instance.vehicle_repositories:
-    if vin_to_update is not None and vin != vin_to_update:
-      continue
-    repo = director_service_instance.vehicle_repositories[vin]
-    repo_dir = repo._repository_directory
-
-    repo.mark_dirty(['timestamp', 'snapshot'])
-    repo.write() # will be writeall() in most recent TUF branch
-
-    assert(os.path.exists(os.path.join(repo_dir, 'metadata.staged'))), \
-        'Programming error: a repository write just occurred; why is ' + \
-        'there no metadata.staged directory where it is expected?'
-
-    # This shouldn't exist, but just in case something was interrupted,
-    # warn and remove it.
-    if os.path.exists(os.path.join(repo_dir, 'metadata.livetemp')):
-      print(LOG_PREFIX + YELLOW + 'Warning: metadata.livetemp existed already. '
-          'Some previous process was interrupted, or there is a programming '
-          'error.' + ENDCOLORS)
-      shutil.rmtree(os.path.join(repo_dir, 'metadata.livetemp'))
-
-    # Copy the staged metadata to a temp directory we'll move into place
-    # atomically in a moment.
-    shutil.copytree(
-        os.path.join(repo_dir, 'metadata.staged'),
-        os.path.join(repo_dir, 'metadata.livetemp'))
+  #   - atomically make metadata.staged the live metadata directory
+  # Vehicles whose metadata is unchanged are not released again, so this does
+  # not issue new timestamp metadata for them; see
+  # prepare_replay_attack_nokeys for how to do that.
+  # If processes is given, vehicles are handled in that many worker processes.
+  # See Director.write_to_live.
+  if vin_to_update is None:
+    vins = None
+  else:
+    vins = [vin_to_update]
 
-    # Empty the existing (old) live metadata directory (relatively fast).
-    if os.path.exists(os.path.join(repo_dir, 'metadata')):
-      shutil.rmtree(os.path.join(repo_dir, 'metadata'))
+  published_vins = director_service_instance.write_to_live(
+      vins, processes=processes)
 
-    # Atomically move the new metadata into place.
-    os.rename(
-        os.path.join(repo_dir, 'metadata.livetemp'),
-        os.path.join(repo_dir, 'metadata'))
+  if published_vins:
+    report = director_service_instance.last_publication_report
+    print(LOG_PREFIX + 'Released updated metadata for ' +
+        str(len(published_vins)) + ' vehicle(s) in ' +
+        '%.3f' % report['seconds'] + ' seconds.')
 
 
 
@@ -252,8 +240,8 @@ def restore_repositories(vin=None):
   <Purpose>
     Restore the last backup of each Director repository.
 
-    Metadata is copied from '{repo_dir}/metadata.backup' to
-    '{repo_dir}/metadata.staged' and '{repo_dir}/metadata'
+    Metadata is moved from '{repo_dir}/metadata.backup' to
+    '{repo_dir}/metadata.staged' and then made live in '{repo_dir}/metadata'
 
   <Arguments>
     vin (optional)
@@ -312,20 +300,8 @@ def restore_repositories(vin=None):
     director_service_instance.vehicle_repositories[vin].root.load_signing_key(
         valid_root_private_key)
 
-    # Copy the staged metadata to a temp directory, which we'll move into place
-    # atomically in a moment.
-    shutil.copytree(os.path.join(repo_dir, 'metadata.staged'),
-        os.path.join(repo_dir, 'metadata.livetemp'))
-
-    # Empty the existing (old) live metadata directory (relatively fast).
-    print(LOG_PREFIX + 'Deleting live hosted dir:' +
-        os.path.join(repo_dir, 'metadata'))
-    if os.path.exists(os.path.join(repo_dir, 'metadata')):
-      shutil.rmtree(os.path.join(repo_dir, 'metadata'))
-
-    # Atomically move the new metadata into place in the hosted directory.
-    os.rename(os.path.join(repo_dir, 'metadata.livetemp'),
-        os.path.join(repo_dir, 'metadata'))
+    # Atomically make the restored metadata live in the hosted directory.
+    director_service_instance.publish_vehicle_repository(vin)
     print(LOG_PREFIX + 'Repository ' + repo_dir + ' restored and hosted.')
 
 
@@ -422,6 +398,8 @@ def revoke_compromised_keys():
     # TODO: Verify this behavior with the latest version of the TUF codebase.
     repository.mark_dirty(['root'])
 
+    director_service_instance.vehicle_repositories.mark_modified(vin)
+
 
   # Push the changes to "live".
   write_to_live()
@@ -507,20 +485,10 @@ def sign_with_compromised_keys_attack(vin=None):
     # Metadata must be partially written, otherwise write() will throw
     # a UnsignedMetadata exception due to the invalid signing keys (i.e.,
     # we are using the old signing keys, which have since been revoked.
-    repository.write(write_partial=True)
-
-    # Copy the staged metadata to a temp directory we'll move into place
-    # atomically in a moment.
-    shutil.copytree(os.path.join(repo_dir, 'metadata.staged'),
-        os.path.join(repo_dir, 'metadata.livetemp'))
-
-    # Empty the existing (old) live metadata directory (relatively fast).
-    if os.path.exists(os.path.join(repo_dir, 'metadata')):
-      shutil.rmtree(os.path.join(repo_dir, 'metadata'))
+    director_service_instance.write_vehicle_repository(vin, write_partial=True)
 
-    # Atomically move the new metadata into place.
-    os.rename(os.path.join(repo_dir, 'metadata.livetemp'),
-        os.path.join(repo_dir, 'metadata'))
+    # Atomically make the malicious metadata live.
+    director_service_instance.publish_vehicle_repository(vin)
 
   print(LOG_PREFIX + 'COMPLETED ATTACK')
 
@@ -625,15 +593,19 @@ def add_target_to_director(target_fname, filepath_in_repo, vin, ecu_serial):
     raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is not '
         'that of a vehicle known to this Director.')
 
-  repo = director_service_instance.vehicle_repositories[vin]
-  repo_dir = repo._repository_directory
+  repo_dir = director_service_instance.vehicle_repositories.\
+      get_repository_directory(vin)
 
   print(LOG_PREFIX + 'Copying target file into place.')
   destination_filepath = os.path.join(repo_dir, 'targets', filepath_in_repo)
 
   # TODO: This should probably place the file into a common targets directory
   # that is then softlinked to all repositories.
-  shutil.copy(target_fname, destination_filepath)
+  # The Director's fileinfo cache hashes the file as it is copied, so that
+  # writing the vehicle's metadata does not read it again. (It is not linked,
+  # as some of the attacks below overwrite target files in place.)
+  director_service_instance.fileinfo_cache.copy_file(
+      target_fname, destination_filepath)
 
   print(LOG_PREFIX + 'Adding target ' + repr(target_fname) + ' for ECU ' +
       repr(ecu_serial))
@@ -665,22 +637,18 @@ def host():
     print(LOG_PREFIX + 'Sorry: there is already a server process running.')
     return
 
-  # Prepare to host the director repo contents.
-
-  os.chdir(demo.DIRECTOR_REPO_DIR)
+  # Prepare to host the director repo contents, using the metadata server
+  # (see uptane/services/metadataserver.py), which caches metadata in memory
+  # and answers clients polling for unchanged metadata with 304 responses.
 
-  command = []
-  if sys.version_info.major < 3: # Python 2 compatibility
-    command = ['python', '-m', 'SimpleHTTPServer', str(demo.DIRECTOR_REPO_PORT)]
-  else:
-    command = ['python3', '-m', 'http.server', str(demo.DIRECTOR_REPO_PORT)]
+  command = [sys.executable, '-m', 'uptane.services.metadataserver',
+      str(demo.DIRECTOR_REPO_PORT), demo.DIRECTOR_REPO_DIR]
 
 
   # Begin hosting the director's repository.
 
-  repo_server_process = subprocess.Popen(command, stderr=subprocess.PIPE)
-
-  os.chdir(uptane.WORKING_DIR)
+  repo_server_process = subprocess.Popen(
+      command, stderr=subprocess.PIPE, cwd=uptane.WORKING_DIR)
 
   print(LOG_PREFIX + 'Director repo server process started, with pid ' +
       str(repo_server_process.pid) + ', serving on port ' +
@@ -1042,8 +1010,9 @@ def prepare_replay_attack_nokeys(vin):
 
   1. Back up the existing, soon-to-be-outdated timestamp file, so that it can
      be replayed in replay_attack_nokeys().
-  2. Call write_to_live to issue a new timestamp file, so that the backed-up
-     timestamp file is now outdated.
+  2. Refresh the vehicle's timestamp metadata and publish it, so that the
+     backed-up timestamp file is now outdated. (write_to_live would not do:
+     it does not re-release a vehicle whose metadata is unchanged.)
 
   After this is done, the Primary should update so that it has seen the new
   version of the timestamp data. Then, replay_attack_nokeys() should be run to
@@ -1053,7 +1022,8 @@ def prepare_replay_attack_nokeys(vin):
       repr(vin))
 
   backup_timestamp(vin=vin)
-  write_to_live(vin_to_update=vin)
+  director_service_instance.refresh_timestamp(vin)
+  director_service_instance.publish_vehicle_repository(vin)
 
   print(LOG_PREFIX + 'COMPLETED ATTACK PREPARATION')
 
@@ -1115,8 +1085,8 @@ def keyed_arbitrary_package_attack(vin, ecu_serial, target_filepath):
 
   # Determine the location the specified file would occupy in the repository.
   target_full_path = os.path.join(
-      director_service_instance.vehicle_repositories[vin]._repository_directory,
-      'targets', target_filepath)
+      director_service_instance.vehicle_repositories.get_repository_directory(
+      vin), 'targets', target_filepath)
 
   # Make sure it exists in the repository, or else abort this attack, which is
   # written to work on an existing target only.
@@ -1186,6 +1156,7 @@ def clear_vehicle_targets(vin):
   """
   print(LOG_PREFIX + 'CLEARING VEHICLE TARGETS for VIN ' + repr(vin))
   director_service_instance.vehicle_repositories[vin].targets.clear_targets()
+  director_service_instance.vehicle_repositories.mark_modified(vin)
 
 
 
@@ -1217,7 +1188,7 @@ def add_target_and_write_to_live(filename, file_content, vin, ecu_serial):
 def kill_server():
   """
   Kills the forked process that is hosting the Director repositories via
-  Python's simple HTTP server. This does not affect the Director service
+  the metadata server. This does not affect the Director service
   (which handles manifests and responds to requests from Primaries), nor does
   it affect the metadata in the repositories or the state of the repositories
   at all. host() can be run afterwards to begin hosting again.
@@ -26,6 +26,7 @@ from __future__ import unicode_literals
 import demo
 import uptane # Import before TUF modules; may change tuf.conf values.
 import uptane.formats
+import uptane.common # for FileinfoCache
 import tuf.formats
 
 import threading # for the interface for the demo website
@@ -47,16 +48,25 @@ import atexit # to kill server process on exit()
 # director.py, etc.) currently uses this setting, but it could.
 uptane.DEMO_MODE = True
 
+# Show the reference implementation's log messages during the demonstration,
+# and keep them in uptane.log.
+uptane.configure_logging(uptane.logging.DEBUG, log_to_file=True)
+
 LOG_PREFIX = uptane.PLUM_BG + 'ImageRepo:' + ENDCOLORS + ' '
 
 repo = None
 server_process = None
 xmlrpc_service_thread = None
 
+# Lengths and hashes of the Image Repository's target files, so that each write
+# of its metadata does not read every target again. See clean_slate.
+fileinfo_cache = None
+
 
 def clean_slate(use_new_keys=False):
 
   global repo
+  global fileinfo_cache
 
   print(LOG_PREFIX + 'Initializing repository')
 
@@ -79,6 +89,10 @@ def clean_slate(use_new_keys=False):
 
   repo = rt.create_new_repository(demo.IMAGE_REPO_NAME)
 
+  # Keep cached target lengths and hashes outside the hosted directory.
+  fileinfo_cache = uptane.common.FileinfoCache(
+      os.path.join(uptane.WORKING_DIR, 'imagerepo_fileinfo_cache.json'))
+
   print(LOG_PREFIX + 'Loading all keys')
 
   # Create keys and/or load keys into memory.
@@ -157,7 +171,9 @@ def write_to_live():
 
   # Write the metadata files out to the Image Repository's 'metadata.staged'
   repo.mark_dirty(['timestamp', 'snapshot'])
-  repo.write() # will be writeall() in most recent TUF branch
+  with uptane.common.use_fileinfo_cache(
+      fileinfo_cache, demo.IMAGE_REPO_TARGETS_DIR):
+    repo.write() # will be writeall() in most recent TUF branch
 
   # Move staged metadata (from the write above) to live metadata directory.
 
@@ -201,7 +217,9 @@ def add_target_to_imagerepo(target_fname, filepath_in_repo):
   repo_dir = repo._repository_directory
   destination_filepath = os.path.join(repo_dir, 'targets', filepath_in_repo)
 
-  shutil.copy(target_fname, destination_filepath)
+  # The fileinfo cache hashes the file as it is copied, so that writing the
+  # metadata does not read it again.
+  fileinfo_cache.copy_file(target_fname, destination_filepath)
 
   repo.targets.add_target(destination_filepath)
 
@@ -217,22 +235,17 @@ def host():
     print(LOG_PREFIX + 'Sorry: there is already a server process running.')
     return
 
-  # Prepare to host the main repo contents
+  # Prepare to host the main repo contents, using the metadata server (see
+  # uptane/services/metadataserver.py).
 
-  os.chdir(demo.IMAGE_REPO_DIR)
-
-  command = []
-  if sys.version_info.major < 3:  # Python 2 compatibility
-    command = ['python', '-m', 'SimpleHTTPServer', str(demo.IMAGE_REPO_PORT)]
-  else:
-    command = ['python3', '-m', 'http.server', str(demo.IMAGE_REPO_PORT)]
+  command = [sys.executable, '-m', 'uptane.services.metadataserver',
+      str(demo.IMAGE_REPO_PORT), demo.IMAGE_REPO_DIR]
 
 
   # Begin hosting Image Repository.
 
-  server_process = subprocess.Popen(command, stderr=subprocess.PIPE)
-
-  os.chdir(uptane.WORKING_DIR)
+  server_process = subprocess.Popen(
+      command, stderr=subprocess.PIPE, cwd=uptane.WORKING_DIR)
 
   print(LOG_PREFIX + 'Main Repo server process started, with pid ' +
       str(server_process.pid) + '; Main Repo serving on port: ' +
@@ -582,7 +595,7 @@ def revoke_compromised_keys():
 def kill_server():
   """
   Kills the forked process that is hosting the Image Repository via
-  Python's simple HTTP server. This does not affect anything in the repository
+  the metadata server. This does not affect anything in the repository
   at all. host() can be run afterwards to begin hosting again.
   """
   global server_process
@@ -23,6 +23,7 @@ import demo
 import uptane # Import before TUF modules; may change tuf.conf values.
 import uptane.common # for canonical key construction and signing
 import uptane.clients.primary as primary
+import uptane.clients.scheduler as scheduler
 import uptane.encoding.asn1_codec as asn1_codec
 from uptane import GREEN, RED, YELLOW, ENDCOLORS
 from demo.uptane_banners import *
@@ -35,6 +36,7 @@ import atexit
 
 import os # For paths and makedirs
 import shutil # For copyfile
+import copy # for comparing state before and after update cycles
 import threading # for the demo listener
 import time
 
@@ -56,6 +58,10 @@ readline.parse_and_bind('tab: complete')
 # image.)
 uptane.DEMO_MODE = True
 
+# Show the reference implementation's log messages during the demonstration,
+# and keep them in uptane.log.
+uptane.configure_logging(uptane.logging.DEBUG, log_to_file=True)
+
 
 # Globals
 CLIENT_DIRECTORY_PREFIX = 'temp_primary'
@@ -74,6 +80,10 @@ ecu_key = None
 director_proxy = None
 listener_thread = None
 most_recent_signed_vehicle_manifest = None
+update_scheduler = None # scheduler.UpdateScheduler used by looping_update()
+# ECU Serial -> the image (filepath and fileinfo) that each Secondary last
+# reported in an ECU Manifest as installed. See generate_signed_vehicle_manifest.
+installed_images = {}
 
 
 def clean_slate(
@@ -90,6 +100,7 @@ def clean_slate(
   global listener_thread
   _vin = vin
   _ecu_serial = ecu_serial
+  installed_images.clear()
 
   # if client_directory_name is not None:
   #   CLIENT_DIRECTORY = client_directory_name
@@ -322,6 +333,14 @@ def generate_signed_vehicle_manifest():
 
   global most_recent_signed_vehicle_manifest
 
+  # Note what each Secondary reports having installed before the Primary
+  # discards the ECU Manifests, so that looping_update() can tell when the
+  # Director's assignments have been delivered.
+  for ecu_serial, ecu_manifests in primary_ecu.ecu_manifests.items():
+    if ecu_manifests:
+      installed_images[ecu_serial] = \
+          ecu_manifests[-1]['signed']['installed_image']
+
   # Generate and sign a manifest indicating that this ECU has a particular
   # version/hash/size of file2.txt as its firmware.
   most_recent_signed_vehicle_manifest = \
@@ -688,9 +707,64 @@ def try_banners():
 
 
 def looping_update():
-  while True:
-    try:
-      update_cycle()
-    except Exception as e:
-      print(repr(e))
-    time.sleep(1)
+  """
+  Runs update cycles indefinitely, scheduled by an
+  uptane.clients.scheduler.UpdateScheduler (saved in update_scheduler, whose
+  get_metrics() reports the next and last cycles): frequently while the
+  Director has assigned updates to this vehicle that have not yet been
+  installed by the Secondaries, less and less often while cycles find nothing
+  new or fail. Errors are printed and do not stop the loop.
+  """
+  global update_scheduler
+
+  update_scheduler = scheduler.UpdateScheduler()
+  update_scheduler.run_forever(_scheduled_update_cycle)
+
+
+
+
+
+def _scheduled_update_cycle():
+  """
+  Runs update_cycle() for looping_update(), returning True if the targets the
+  Director has assigned to this vehicle's Secondaries, or the images they
+  report having installed, changed, and notes in update_scheduler whether an
+  update campaign is active for this vehicle: whether any Secondary has yet
+  to install the target assigned to it.
+  """
+  state_before = (copy.deepcopy(primary_ecu.assigned_targets),
+      copy.deepcopy(installed_images))
+
+  try:
+    update_cycle()
+  except Exception as e:
+    print(repr(e))
+    raise
+
+  update_scheduler.set_campaign_active(not all(
+      _is_installed(ecu_serial, target)
+      for ecu_serial, target in primary_ecu.assigned_targets.items()))
+
+  return state_before != (primary_ecu.assigned_targets, installed_images)
+
+
+
+
+
+def _is_installed(ecu_serial, target):
+  """
+  Returns True if the given Secondary last reported having installed the
+  given target (i.e. an image of the same length and hashes), else False.
+  """
+  if ecu_serial not in installed_images:
+    return False
+
+  installed_fileinfo = installed_images[ecu_serial]['fileinfo']
+  target_fileinfo = target['fileinfo']
+  hash_algorithms = set(installed_fileinfo['hashes']) & \
+      set(target_fileinfo['hashes'])
+
+  return bool(hash_algorithms) and \
+      installed_fileinfo['length'] == target_fileinfo['length'] and \
+      all(installed_fileinfo['hashes'][algorithm] ==
+      target_fileinfo['hashes'][algorithm] for algorithm in hash_algorithms)
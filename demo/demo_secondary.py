@@ -28,6 +28,7 @@ import demo
 import uptane # Import before TUF modules; may change tuf.conf values.
 import uptane.common # for canonical key construction and signing
 import uptane.clients.secondary as secondary
+import uptane.clients.scheduler as scheduler
 from uptane import GREEN, RED, YELLOW, ENDCOLORS
 from demo.uptane_banners import *
 import tuf.keys
@@ -55,6 +56,10 @@ readline.parse_and_bind('tab: complete')
 # director.py, etc.) currently uses this setting, but it could.
 uptane.DEMO_MODE = True
 
+# Show the reference implementation's log messages during the demonstration,
+# and keep them in uptane.log.
+uptane.configure_logging(uptane.logging.DEBUG, log_to_file=True)
+
 
 # Globals
 CLIENT_DIRECTORY_PREFIX = 'temp_secondary' # name for this secondary's directory
@@ -71,6 +76,7 @@ nonce = None
 attacks_detected = ''
 
 most_recent_signed_ecu_manifest = None
+update_scheduler = None # scheduler.UpdateScheduler used by looping_update()
 
 
 def clean_slate(
@@ -660,10 +666,41 @@ def try_banners():
 
 
 def looping_update():
-  while True:
-    try:
-      update_cycle()
-    except Exception as e:
-      print(repr(e))
-      pass
-    time.sleep(1)
+  """
+  Runs update cycles indefinitely, scheduled by an
+  uptane.clients.scheduler.UpdateScheduler (saved in update_scheduler, whose
+  get_metrics() reports the next and last cycles): frequently while a
+  validated update for this ECU has not yet been installed, less and less
+  often while cycles find nothing new or fail. Errors are printed and do not
+  stop the loop.
+  """
+  global update_scheduler
+
+  update_scheduler = scheduler.UpdateScheduler()
+  update_scheduler.run_forever(_scheduled_update_cycle)
+
+
+
+
+
+def _scheduled_update_cycle():
+  """
+  Runs update_cycle() for looping_update(), returning True if the validated
+  targets for this ECU or its installed firmware changed, and notes in
+  update_scheduler whether an update campaign is active for this ECU.
+  """
+  state_before = (copy.deepcopy(secondary_ecu.validated_targets_for_this_ecu),
+      copy.deepcopy(secondary_ecu.firmware_fileinfo))
+
+  try:
+    update_cycle()
+  except Exception as e:
+    print(repr(e))
+    raise
+
+  validated_targets = secondary_ecu.validated_targets_for_this_ecu
+  update_scheduler.set_campaign_active(bool(validated_targets) and
+      secondary_ecu.firmware_fileinfo != validated_targets[-1])
+
+  return state_before != (
+      validated_targets, secondary_ecu.firmware_fileinfo)
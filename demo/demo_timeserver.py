@@ -27,6 +27,7 @@ import tuf.formats
 
 import threading
 from six.moves import xmlrpc_server
+from six.moves import socketserver # for ThreadingMixIn, when batching
 from six.moves import xmlrpc_client # for Binary data encapsulation
 import uptane.services.timeserver as timeserver
 
@@ -43,10 +44,19 @@ from uptane.encoding.asn1_codec import DATATYPE_TIME_ATTESTATION
 # director.py, etc.) currently uses this setting, but it could.
 uptane.DEMO_MODE = True
 
+# Show the reference implementation's log messages during the demonstration,
+# and keep them in uptane.log.
+uptane.configure_logging(uptane.logging.DEBUG, log_to_file=True)
+
 LOG_PREFIX = uptane.WHITE + 'Timeserver:' + uptane.ENDCOLORS + ' '
 
 timeserver_listener_thread = None
 
+# If listen() is asked to batch requests, these hold the
+# timeserver.TimeAttestationBatcher objects answering JSON and DER requests.
+json_batcher = None
+der_batcher = None
+
 # Restrict director requests to a particular path.
 # Must specify RPC2 here for the XML-RPC interface to work.
 class RequestHandler(xmlrpc_server.SimpleXMLRPCRequestHandler):
@@ -54,6 +64,14 @@ class RequestHandler(xmlrpc_server.SimpleXMLRPCRequestHandler):
 
 
 
+# XML-RPC server that handles each request in its own thread, so that
+# concurrent requests can be answered together by a TimeAttestationBatcher.
+class ThreadingXMLRPCServer(
+    socketserver.ThreadingMixIn, xmlrpc_server.SimpleXMLRPCServer):
+  daemon_threads = True
+
+
+
 
 
 def load_timeserver_key(use_new_keys=False):
@@ -78,7 +96,10 @@ def get_signed_time_der_wrapper(nonces):
   Uptane Python dictionary format.
   """
 
-  der_attestation = timeserver.get_signed_time_der(nonces)
+  if der_batcher is not None:
+    der_attestation = der_batcher.get_signed_time(nonces)
+  else:
+    der_attestation = timeserver.get_signed_time_der(nonces)
 
   return xmlrpc_client.Binary(der_attestation)
 
@@ -86,13 +107,20 @@ def get_signed_time_der_wrapper(nonces):
 
 
 
-def listen(use_new_keys=False):
+def listen(use_new_keys=False, batch_window=None):
   """
   Listens on TIMESERVER_PORT for xml-rpc calls to functions:
    - get_signed_time(nonces)
+
+  If batch_window (a number of seconds) is provided, requests are handled
+  concurrently and answered in batches: requests arriving within batch_window
+  seconds of each other receive the same attestation, listing all of their
+  nonces. See timeserver.TimeAttestationBatcher.
   """
 
   global timeserver_listener_thread
+  global json_batcher
+  global der_batcher
 
   # Set the timeserver's signing key.
   print(LOG_PREFIX + 'Loading timeserver signing key.')
@@ -105,16 +133,32 @@ def listen(use_new_keys=False):
 
 
   # Create server
-  server = xmlrpc_server.SimpleXMLRPCServer(
-      (demo.TIMESERVER_HOST, demo.TIMESERVER_PORT),
-      requestHandler=RequestHandler)#, allow_none=True)
+  if batch_window is None:
+    server = xmlrpc_server.SimpleXMLRPCServer(
+        (demo.TIMESERVER_HOST, demo.TIMESERVER_PORT),
+        requestHandler=RequestHandler)#, allow_none=True)
+    json_batcher = der_batcher = None
+
+  else:
+    server = ThreadingXMLRPCServer(
+        (demo.TIMESERVER_HOST, demo.TIMESERVER_PORT),
+        requestHandler=RequestHandler)
+    json_batcher = timeserver.TimeAttestationBatcher(
+        timeserver.get_signed_time, window=batch_window)
+    der_batcher = timeserver.TimeAttestationBatcher(
+        timeserver.get_signed_time_der, window=batch_window)
+    print(LOG_PREFIX + 'Batching time requests over ' + str(batch_window) +
+        ' second windows.')
   #server.register_introspection_functions()
 
 
   # Add a function to the Timeserver's xml-rpc interface.
   # Register function that can be called via XML-RPC, allowing a Primary to
   # request the time for its Secondaries.
-  server.register_function(timeserver.get_signed_time, 'get_signed_time')
+  if json_batcher is not None:
+    server.register_function(json_batcher.get_signed_time, 'get_signed_time')
+  else:
+    server.register_function(timeserver.get_signed_time, 'get_signed_time')
   server.register_function(
       get_signed_time_der_wrapper, 'get_signed_time_der')
 
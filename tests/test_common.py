@@ -20,6 +20,7 @@ import json
 
 import tuf
 import tuf.formats
+import tuf.keys
 import tuf.conf
 
 import uptane.common as common
@@ -327,6 +328,52 @@ class TestCommon(unittest.TestCase):
 
 
 
+  def test_key_cache(self):
+    """
+    Tests the caching of parsed keys by sign_over_metadata() and
+    verify_signature_over_metadata().
+    """
+    common.clear_key_cache()
+
+    time_attestation = json.load(open(os.path.join(
+        SAMPLES_DIR, 'sample_timeserver_attestation.json')))['signed']
+    data = tuf.formats.encode_canonical(time_attestation).encode('utf-8')
+
+    key_pri = keys_pri['timeserver']
+    key_pub = keys_pub['timeserver']
+    other_key_pub = keys_pub['primary']
+
+    for i in range(2):
+      signature = common.sign_over_metadata(key_pri, time_attestation,
+          DATATYPE_TIME_ATTESTATION, metadata_format='json')
+
+      # The result is the same as that of tuf.keys, with or without the cache.
+      self.assertEqual(tuf.keys.create_signature(key_pri, data), signature)
+
+      self.assertTrue(common.verify_signature_over_metadata(key_pub, signature,
+          time_attestation, DATATYPE_TIME_ATTESTATION, metadata_format='json'))
+
+    # A different key listed under the same keyid is not mistaken for the
+    # cached key.
+    impostor_key_pub = copy.deepcopy(other_key_pub)
+    impostor_key_pub['keyid'] = key_pub['keyid']
+    self.assertFalse(common.verify_signature_over_metadata(impostor_key_pub,
+        signature, time_attestation, DATATYPE_TIME_ATTESTATION,
+        metadata_format='json'))
+
+    # Modified data does not verify.
+    modified_attestation = copy.deepcopy(time_attestation)
+    modified_attestation['nonces'].append(3)
+    self.assertFalse(common.verify_signature_over_metadata(key_pub, signature,
+        modified_attestation, DATATYPE_TIME_ATTESTATION,
+        metadata_format='json'))
+
+    common.clear_key_cache()
+
+
+
+
+
   def test_canonical_key_funcs(self):
     """
     Tests:
@@ -497,6 +544,135 @@ class TestCommon(unittest.TestCase):
 
 
 
+  def test_bounded_history(self):
+    """
+    Tests common.BoundedHistory, used to hold recent Timeserver times and
+    attestations in Primaries and Secondaries.
+    """
+    # Test argument format.
+    with self.assertRaises(tuf.FormatError):
+      common.BoundedHistory(0)
+    with self.assertRaises(tuf.FormatError):
+      common.BoundedHistory('2')
+
+    history = common.BoundedHistory(2, initial_items=['t0'])
+    self.assertEqual(['t0'], history)
+    self.assertEqual(1, len(history))
+
+    history.append('t1')
+    history.append('t2')
+
+    # Only the two most recent items are retained.
+    self.assertEqual(['t1', 't2'], history)
+    self.assertEqual('t2', history[-1])
+    self.assertEqual('t1', history[-2])
+    self.assertEqual('t1', history[0])
+    self.assertEqual(['t2'], history[1:])
+
+    # Every appended item, but not the initial items, is written to the audit
+    # log if one is provided.
+    if not os.path.exists(TEMP_CLIENT_DIR):
+      os.makedirs(TEMP_CLIENT_DIR)
+    audit_log_fname = os.path.join(TEMP_CLIENT_DIR, 'time_audit.log')
+    if os.path.exists(audit_log_fname):
+      os.remove(audit_log_fname)
+
+    history = common.BoundedHistory(
+        1, initial_items=['t0'], audit_log_fname=audit_log_fname)
+    history.append('t1')
+    history.append({'time': 't2', 'nonces': [1, 2]})
+    self.assertEqual([{'time': 't2', 'nonces': [1, 2]}], history)
+
+    with open(audit_log_fname) as fobj:
+      logged = [json.loads(line)['item'] for line in fobj]
+    self.assertEqual(['t1', {'time': 't2', 'nonces': [1, 2]}], logged)
+
+    shutil.rmtree(TEMP_CLIENT_DIR)
+
+
+
+
+
+  def test_fileinfo_cache(self):
+
+    import hashlib
+    import tuf.repository_lib
+
+    if not os.path.exists(TEMP_CLIENT_DIR):
+      os.makedirs(TEMP_CLIENT_DIR)
+    cache_fname = os.path.join(TEMP_CLIENT_DIR, 'fileinfo_cache.json')
+    target_fname = os.path.join(TEMP_CLIENT_DIR, 'image.img')
+    link_fname = os.path.join(TEMP_CLIENT_DIR, 'image_link.img')
+    with open(target_fname, 'wb') as fobj:
+      fobj.write(b'firmware image')
+
+    cache = common.FileinfoCache(cache_fname, hash_algorithms=['sha256'])
+
+    with self.assertRaises(tuf.Error):
+      cache.get_fileinfo(target_fname + '_nonexistent')
+
+    fileinfo = cache.get_fileinfo(target_fname, custom={'ecu_serial': 'e1'})
+    tuf.formats.FILEINFO_SCHEMA.check_match(fileinfo)
+    self.assertEqual(len(b'firmware image'), fileinfo['length'])
+    self.assertEqual(hashlib.sha256(b'firmware image').hexdigest(),
+        fileinfo['hashes']['sha256'])
+    self.assertEqual({'ecu_serial': 'e1'}, fileinfo['custom'])
+    self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+    # A hard link to the same file should use the same entry.
+    os.link(target_fname, link_fname)
+    self.assertEqual(fileinfo['hashes'],
+        cache.get_fileinfo(link_fname)['hashes'])
+    self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    # Entries should persist once saved.
+    cache.save()
+    cache = common.FileinfoCache(cache_fname, hash_algorithms=['sha256'])
+    cache.get_fileinfo(target_fname)
+    self.assertEqual((1, 0), (cache.hits, cache.misses))
+
+    # A copy made with copy_file should have an entry of its own, so that
+    # neither file is read again.
+    copy_fname = os.path.join(TEMP_CLIENT_DIR, 'image_copy.img')
+    cache.copy_file(target_fname, copy_fname)
+    with open(copy_fname, 'rb') as fobj:
+      self.assertEqual(b'firmware image', fobj.read())
+    self.assertEqual(fileinfo['hashes'],
+        cache.get_fileinfo(copy_fname)['hashes'])
+    self.assertEqual((2, 0), (cache.hits, cache.misses))
+
+    # Entries for files that no longer exist should be dropped when saving.
+    cache.save()
+    self.assertEqual(2, len(cache._entries))
+    os.remove(copy_fname)
+    cache.save()
+    cache = common.FileinfoCache(cache_fname, hash_algorithms=['sha256'])
+    self.assertEqual(1, len(cache._entries))
+
+    # Changing the file should result in new information.
+    os.remove(link_fname)
+    os.remove(target_fname)
+    with open(target_fname, 'wb') as fobj:
+      fobj.write(b'other firmware image')
+    self.assertEqual(hashlib.sha256(b'other firmware image').hexdigest(),
+        cache.get_fileinfo(target_fname)['hashes']['sha256'])
+
+    # While use_fileinfo_cache is active, TUF should use the cache for files
+    # in the given directory only.
+    original = tuf.repository_lib.get_metadata_fileinfo
+    with common.use_fileinfo_cache(cache, TEMP_CLIENT_DIR):
+      self.assertIsNot(original, tuf.repository_lib.get_metadata_fileinfo)
+      hits = cache.hits
+      tuf.repository_lib.get_metadata_fileinfo(target_fname)
+      self.assertEqual(hits + 1, cache.hits)
+    self.assertIs(original, tuf.repository_lib.get_metadata_fileinfo)
+
+    shutil.rmtree(TEMP_CLIENT_DIR)
+
+
+
+
+
 # Run unit test.
 if __name__ == '__main__':
   unittest.main()
@@ -414,6 +414,14 @@ class TestASN1(unittest.TestCase):
     # as the original.
     self.assertEqual(json_signed, SAMPLE_ECU_MANIFEST_SIGNABLE['signed'])
 
+    # A digest that is not valid hex cannot be converted.
+    bad_signed = copy.deepcopy(SAMPLE_ECU_MANIFEST_SIGNABLE['signed'])
+    hashes = bad_signed['installed_image']['fileinfo']['hashes']
+    for hash_function in hashes:
+      hashes[hash_function] = 'abc'
+    with self.assertRaises(uptane.FailedToEncodeASN1DER):
+      ecu_manifest_asn1_coder.get_asn_signed(bad_signed)
+
 
 
 
@@ -441,6 +449,33 @@ class TestASN1(unittest.TestCase):
 
 
 
+  def test_12_ecu_manifest_time_conversion(self):
+
+    for time_string, seconds in [
+        ('1970-01-01T00:00:00Z', 0),
+        ('2017-01-01T12:00:00Z', 1483272000),
+        ('2016-02-29T23:59:59Z', 1456790399)]:
+      self.assertEqual(
+          seconds, ecu_manifest_asn1_coder.time_to_seconds(time_string))
+      self.assertEqual(
+          time_string, ecu_manifest_asn1_coder.seconds_to_time(seconds))
+      # Again, from the memo.
+      self.assertEqual(
+          seconds, ecu_manifest_asn1_coder.time_to_seconds(time_string))
+
+    # Times that are not fixed-width are parsed as strptime would.
+    self.assertEqual(1483232400,
+        ecu_manifest_asn1_coder.time_to_seconds('2017-1-1T1:00:00Z'))
+
+    for bad_time in ['2017-02-30T00:00:00Z', '2017-01-01 00:00:00Z',
+        '2017-01-01T00:00:00', 'not a time']:
+      with self.assertRaises(ValueError):
+        ecu_manifest_asn1_coder.time_to_seconds(bad_time)
+
+
+
+
+
   def test_20_vehicle_manifest_der_conversion(self):
     uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.check_match(
         SAMPLE_VEHICLE_MANIFEST_SIGNABLE)
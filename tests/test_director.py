@@ -17,6 +17,7 @@ import os.path
 import shutil
 import copy
 import json
+import hashlib
 
 import tuf
 import tuf.formats
@@ -54,6 +55,48 @@ def destroy_temp_dir():
 
 
 
+def create_test_director(subdirectory, vins=(), **kwargs):
+  """
+  Creates a Director, separate from TestDirector.instance, with the test keys
+  and with its repositories in the given subdirectory of TEST_DIRECTOR_DIR,
+  and creates a repository for each of the given VINs. Any keyword arguments
+  are passed on to the Director constructor.
+  """
+  director_repos_dir = os.path.join(TEST_DIRECTOR_DIR, subdirectory)
+  os.makedirs(director_repos_dir)
+
+  d = director.Director(
+      director_repos_dir, keys_pri['root'], keys_pub['root'],
+      keys_pri['timestamp'], keys_pub['timestamp'], keys_pri['snapshot'],
+      keys_pub['snapshot'], keys_pri['targets'], keys_pub['targets'],
+      **kwargs)
+
+  for vin in vins:
+    d.create_director_repo_for_vehicle(vin)
+    # Creating a repository changes the working directory.
+    os.chdir(uptane.WORKING_DIR)
+
+  return d
+
+
+
+
+
+def create_test_target(d, vin, fname='image.txt'):
+  """
+  Creates a target file in the given Director's repository for the given
+  vehicle, and returns its path.
+  """
+  target_fname = os.path.join(
+      d.vehicle_repositories.get_repository_directory(vin), 'targets', fname)
+  with open(target_fname, 'w') as fobj:
+    fobj.write('firmware')
+  return target_fname
+
+
+
+
+
 class TestDirector(unittest.TestCase):
   """
   "unittest"-style test class for the Director module in the reference
@@ -213,7 +256,10 @@ class TestDirector(unittest.TestCase):
     # Check resulting contents of Director - specifically, the new repository
     # for the vehicle.
     self.assertIn(vin, TestDirector.instance.vehicle_repositories)
+    # The repository object itself is only created when first used.
+    self.assertFalse(TestDirector.instance.vehicle_repositories.is_loaded(vin))
     repo = TestDirector.instance.vehicle_repositories[vin]
+    self.assertTrue(TestDirector.instance.vehicle_repositories.is_loaded(vin))
     self.assertEqual(1, len(repo.root.keys))
     self.assertEqual(1, len(repo.timestamp.keys))
     self.assertEqual(1, len(repo.snapshot.keys))
@@ -745,6 +791,191 @@ class TestDirector(unittest.TestCase):
 
 
 
+  def test_36_shared_root_metadata(self):
+
+    d = create_test_director('shared', ['shared1', 'shared2'])
+    shared_test_dir = d.director_repos_dir
+    for vin in ['shared1', 'shared2']:
+      d.write_vehicle_repository(vin)
+
+    root_fname = 'root.' + tuf.conf.METADATA_FORMAT
+    root1_fname = os.path.join(
+        shared_test_dir, 'shared1', 'metadata.staged', root_fname)
+    root2_fname = os.path.join(
+        shared_test_dir, 'shared2', 'metadata.staged', root_fname)
+
+    # Identical root metadata is stored once, for staged and live metadata.
+    self.assertTrue(os.path.samefile(root1_fname, root2_fname))
+    with open(root2_fname, 'rb') as fobj:
+      root2 = fobj.read()
+
+    d.write_to_live()
+    live_root2_fname = os.path.join(
+        shared_test_dir, 'shared2', director.LIVE_METADATA_DIRNAME, root_fname)
+    self.assertTrue(os.path.samefile(root2_fname, live_root2_fname))
+    self.assertTrue(os.path.samefile(root1_fname, os.path.join(
+        shared_test_dir, 'shared1', director.LIVE_METADATA_DIRNAME,
+        root_fname)))
+
+    # Writing new root metadata for one vehicle leaves the other's, and the
+    # shared copy, unchanged.
+    d.vehicle_repositories['shared1'].mark_dirty(['root'])
+    d.write_vehicle_repository('shared1')
+
+    self.assertFalse(os.path.samefile(root1_fname, root2_fname))
+    with open(root1_fname, 'rb') as fobj:
+      self.assertNotEqual(root2, fobj.read())
+    with open(root2_fname, 'rb') as fobj:
+      self.assertEqual(root2, fobj.read())
+    with open(live_root2_fname, 'rb') as fobj:
+      self.assertEqual(root2, fobj.read())
+
+    shared_dir = os.path.join(shared_test_dir, director.SHARED_ROOT_DIRNAME)
+    for fname in os.listdir(shared_dir):
+      with open(os.path.join(shared_dir, fname), 'rb') as fobj:
+        self.assertEqual(fname.split('.')[0],
+            hashlib.sha256(fobj.read()).hexdigest())
+
+
+
+
+
+  def test_37_vehicle_repository_eviction(self):
+
+    # Use a Director that keeps only one vehicle repository loaded.
+    d = create_test_director(
+        'lru', ['lru1', 'lru2'], max_loaded_repositories=1)
+    lru_dir = d.director_repos_dir
+    repositories = d.vehicle_repositories
+
+    with self.assertRaises(tuf.FormatError):
+      director.VehicleRepositories(d, max_loaded=0)
+
+    # Give the first vehicle a target, then use the second vehicle's
+    # repository. The first has not been written, so it is not evicted, and
+    # nothing is written.
+    repositories['lru1'].targets.add_target(
+        create_test_target(d, 'lru1'), custom={'ecu_serial': 'ecu1'})
+    repositories.mark_modified('lru1')
+
+    repositories['lru2']
+    self.assertTrue(repositories.is_loaded('lru1'))
+    self.assertTrue(repositories.is_loaded('lru2'))
+    self.assertEqual(0, repositories.evictions)
+    self.assertFalse(os.path.exists(
+        os.path.join(lru_dir, 'lru1', 'metadata.staged')))
+
+    # Once written, the first vehicle's repository is evicted to make room for
+    # the second.
+    d.write_vehicle_repository('lru1')
+    self.assertEqual(0, repositories.evictions)
+    d.write_vehicle_repository('lru2')
+    self.assertEqual(1, repositories.evictions)
+    self.assertFalse(repositories.is_loaded('lru1'))
+
+    # Reloading the first vehicle's repository finds its target again, and
+    # evicts the second. Reading a repository does not mark it as modified.
+    repo = repositories['lru1']
+    self.assertEqual(1, len(repo.targets.target_files))
+    self.assertFalse(repositories.is_modified('lru1'))
+    self.assertFalse(repositories.is_loaded('lru2'))
+    self.assertEqual(2, repositories.evictions)
+    self.assertEqual(3, repositories.loads)
+
+
+
+
+
+  def test_38_write_to_live(self):
+
+    d = create_test_director('live', ['live1', 'live2'])
+    live_test_dir = d.director_repos_dir
+
+    with self.assertRaises(uptane.Error):
+      d.publish_vehicle_repository('live1') # nothing written yet
+    with self.assertRaises(uptane.UnknownVehicle):
+      d.write_to_live(['nosuchvehicle'])
+
+    # Every new vehicle is written and published.
+    self.assertEqual(['live1', 'live2'], sorted(d.write_to_live()))
+
+    live_dir = os.path.join(live_test_dir, 'live1', 'metadata')
+    self.assertTrue(os.path.islink(live_dir))
+    timestamp_fname = 'timestamp.' + tuf.conf.METADATA_FORMAT
+    live_timestamp_fname = os.path.join(live_dir, timestamp_fname)
+    staged_timestamp_fname = os.path.join(
+        live_test_dir, 'live1', 'metadata.staged', timestamp_fname)
+    with open(live_timestamp_fname, 'rb') as fobj:
+      live_timestamp = fobj.read()
+    with open(staged_timestamp_fname, 'rb') as fobj:
+      self.assertEqual(live_timestamp, fobj.read())
+    first_slot = os.readlink(live_dir)
+
+    # Nothing has changed, so nothing is written or published.
+    self.assertEqual([], d.write_to_live())
+
+    # Only the vehicle given a new target is.
+    d.add_target_for_ecu('live2', 'ecu1', create_test_target(d, 'live2'))
+    self.assertTrue(d.vehicle_repositories.is_modified('live2'))
+    self.assertFalse(d.vehicle_repositories.is_modified('live1'))
+    self.assertEqual(['live2'], d.write_to_live())
+    self.assertEqual(first_slot, os.readlink(live_dir))
+
+    # Publishing again alternates between the two live directories.
+    live_dir = os.path.join(live_test_dir, 'live2', 'metadata')
+    slot = os.readlink(live_dir)
+    d.publish_vehicle_repository('live2')
+    self.assertNotEqual(slot, os.readlink(live_dir))
+    self.assertIn(os.readlink(live_dir), director.LIVE_METADATA_SLOTS)
+    self.assertTrue(os.path.exists(os.path.join(live_dir, timestamp_fname)))
+
+    # Writing metadata.staged again does not change the live metadata until
+    # it is published.
+    d.write_vehicle_repository('live1')
+    with open(staged_timestamp_fname, 'rb') as fobj:
+      self.assertNotEqual(live_timestamp, fobj.read())
+    with open(live_timestamp_fname, 'rb') as fobj:
+      self.assertEqual(live_timestamp, fobj.read())
+
+
+
+
+
+  def test_39_write_to_live_in_worker_processes(self):
+
+    vins = ['parallel' + str(i) for i in range(3)]
+    d = create_test_director('parallel', vins)
+    parallel_dir = d.director_repos_dir
+
+    with self.assertRaises(tuf.FormatError):
+      d.write_to_live(processes=0)
+
+    # One vehicle's repository is loaded (and so must be written here before
+    # the workers can use it); the others are written by the workers.
+    d.vehicle_repositories['parallel0']
+
+    self.assertEqual(vins, sorted(d.write_to_live(processes=2)))
+
+    report = d.last_publication_report
+    self.assertEqual(3, report['vehicles'])
+    self.assertEqual(3, report['written'])
+    self.assertEqual(2, report['processes'])
+    self.assertEqual(
+        ['prepare', 'publish', 'write'], sorted(report['stage_seconds']))
+
+    for vin in vins:
+      self.assertTrue(d.vehicle_repositories.is_published(vin))
+      self.assertFalse(d.vehicle_repositories.is_modified(vin))
+      self.assertTrue(os.path.exists(os.path.join(parallel_dir, vin,
+          'metadata', 'timestamp.' + tuf.conf.METADATA_FORMAT)))
+
+    self.assertEqual([], d.write_to_live(processes=2))
+    self.assertEqual(0, d.last_publication_report['vehicles'])
+
+
+
+
+
   def test_40_add_target_for_ecu(self):
     pass
 
@@ -752,6 +983,151 @@ class TestDirector(unittest.TestCase):
 
 
 
+  def test_42_refresh_timestamps(self):
+
+    d = create_test_director('refresh', ['refresh1', 'refresh2'])
+    refresh_dir = d.director_repos_dir
+
+    # Neither vehicle's metadata has been written, so both are fully written.
+    self.assertEqual(0, d.refresh_timestamps())
+
+    staged_dir = os.path.join(refresh_dir, 'refresh1', 'metadata.staged')
+    snapshot_fname = os.path.join(
+        staged_dir, 'snapshot.' + tuf.conf.METADATA_FORMAT)
+    timestamp_fname = os.path.join(
+        staged_dir, 'timestamp.' + tuf.conf.METADATA_FORMAT)
+    with open(snapshot_fname, 'rb') as fobj:
+      snapshot = fobj.read()
+    with open(timestamp_fname, 'rb') as fobj:
+      timestamp = fobj.read()
+
+    # Now only the timestamp metadata is re-signed, and the result is live.
+    self.assertEqual(2, d.refresh_timestamps())
+
+    with open(snapshot_fname, 'rb') as fobj:
+      self.assertEqual(snapshot, fobj.read())
+    with open(timestamp_fname, 'rb') as fobj:
+      refreshed_timestamp = fobj.read()
+    self.assertNotEqual(timestamp, refreshed_timestamp)
+    timestamp = refreshed_timestamp
+    live_timestamp_fname = os.path.join(refresh_dir, 'refresh1', 'metadata',
+        'timestamp.' + tuf.conf.METADATA_FORMAT)
+    with open(live_timestamp_fname, 'rb') as fobj:
+      self.assertEqual(timestamp, fobj.read())
+    self.assertTrue(d.vehicle_repositories.is_published('refresh1'))
+    self.assertFalse(d.vehicle_repositories.is_modified('refresh1'))
+
+    # A vehicle with a new target is fully written.
+    d.add_target_for_ecu('refresh2', 'ecu1', create_test_target(d, 'refresh2'))
+    self.assertFalse(d.refresh_timestamp('refresh2'))
+    self.assertTrue(d.refresh_timestamp('refresh1'))
+
+    # The refreshed timestamp metadata is not live until published.
+    with open(timestamp_fname, 'rb') as fobj:
+      self.assertNotEqual(timestamp, fobj.read())
+    with open(live_timestamp_fname, 'rb') as fobj:
+      self.assertEqual(timestamp, fobj.read())
+
+    with self.assertRaises(uptane.UnknownVehicle):
+      d.refresh_timestamp('nosuchvehicle')
+
+
+
+
+
+  def test_43_prepare_replay_attack(self):
+
+    import demo.demo_director as demo_director
+
+    d = create_test_director('replay', ['replay1'])
+    replay_dir = d.director_repos_dir
+    d.write_to_live()
+    version = d.vehicle_repositories['replay1'].timestamp.version
+
+    # The demo's attack functions use its Director and repository directory.
+    original_director = demo_director.director_service_instance
+    original_repo_dir = demo.DIRECTOR_REPO_DIR
+    demo_director.director_service_instance = d
+    demo.DIRECTOR_REPO_DIR = replay_dir
+    try:
+      demo_director.prepare_replay_attack_nokeys('replay1')
+    finally:
+      demo_director.director_service_instance = original_director
+      demo.DIRECTOR_REPO_DIR = original_repo_dir
+
+    # Even though the vehicle's metadata was unchanged, a new version of its
+    # timestamp metadata should be live, so that the backup is outdated.
+    self.assertLess(
+        version, d.vehicle_repositories['replay1'].timestamp.version)
+    timestamp_fname = 'timestamp.' + tuf.conf.METADATA_FORMAT
+    with open(os.path.join(replay_dir, 'replay1', 'metadata.staged',
+        timestamp_fname), 'rb') as fobj:
+      staged_timestamp = fobj.read()
+    with open(os.path.join(replay_dir, 'replay1', 'metadata',
+        timestamp_fname), 'rb') as fobj:
+      self.assertEqual(staged_timestamp, fobj.read())
+    with open(os.path.join(replay_dir, 'replay1',
+        'backup_' + timestamp_fname), 'rb') as fobj:
+      self.assertNotEqual(staged_timestamp, fobj.read())
+
+
+
+
+
+  def test_45_assign_campaign(self):
+
+    d = create_test_director('campaign', ['camp1', 'camp2', 'camp3'])
+
+    image_fname = os.path.join(TEST_DIRECTOR_DIR, 'campaign_image.img')
+    with open(image_fname, 'w') as fobj:
+      fobj.write('new firmware')
+
+    # Bad arguments.
+    with self.assertRaises(uptane.UnknownVehicle):
+      d.assign_campaign(image_fname, [('unknown_vin', 'ecu1')])
+    with self.assertRaises(uptane.Error):
+      d.assign_campaign(image_fname + '_nonexistent', [('camp1', 'ecu1')])
+    with self.assertRaises(tuf.FormatError):
+      d.assign_campaign(image_fname, [('camp1', 'ecu1')], processes=0)
+
+    # A vehicle's targets metadata can assign the target to only one of its
+    # ECUs, so assigning it to two is rejected, without changing anything.
+    with self.assertRaises(uptane.Error):
+      d.assign_campaign(image_fname, [('camp1', 'ecu1'), ('camp1', 'ecu2')])
+    self.assertFalse(os.path.exists(os.path.join(
+        d.vehicle_repositories.get_repository_directory('camp1'), 'targets',
+        'campaign_image.img')))
+
+    # Assign in this process, then in worker processes.
+    report = d.assign_campaign(image_fname,
+        [('camp1', 'ecu1'), ('camp2', 'ecu2'), ('camp1', 'ecu1')])
+    self.assertEqual(2, report['vehicles'])
+    self.assertEqual(3, report['assignments'])
+
+    report = d.assign_campaign(
+        image_fname, [('camp3', 'ecu3')], filepath_in_repo='other.img',
+        processes=2)
+    self.assertEqual(1, report['vehicles'])
+    self.assertFalse(d.vehicle_repositories.is_loaded('camp3'))
+
+    for vin, ecu_serial, filepath_in_repo in [
+        ('camp1', 'ecu1', 'campaign_image.img'),
+        ('camp2', 'ecu2', 'campaign_image.img'),
+        ('camp3', 'ecu3', 'other.img')]:
+      repo_dir = d.vehicle_repositories.get_repository_directory(vin)
+      self.assertTrue(os.path.exists(
+          os.path.join(repo_dir, 'targets', filepath_in_repo)))
+      self.assertTrue(os.path.exists(
+          os.path.join(repo_dir, 'metadata.staged')))
+      target_files = d.vehicle_repositories[vin].targets.target_files
+      self.assertEqual(
+          {'ecu_serial': ecu_serial},
+          target_files['/' + filepath_in_repo])
+
+
+
+
+
   def test_60_register_vehicle(self):
     """Tests inventorydb.register_vehicle(), along with check_vin_registered()
     and helper function _check_registration_is_sane()."""
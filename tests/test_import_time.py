@@ -0,0 +1,120 @@
+"""
+<Program Name>
+  test_import_time.py
+
+<Purpose>
+  Guards against regressions in the time taken to import the Uptane clients
+  and services, and in the work done at import: importing them should not
+  build the ASN.1 data definitions, load the demo's banners, or write any
+  files.
+
+  Each import is timed in a fresh Python process, since modules already
+  imported by the test runner would otherwise not be imported again.
+
+<Copyright>
+  See LICENSE for licensing information.
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+# Greatest number of seconds that importing the modules below may take. This
+# is generous, to avoid failures on slow machines; the checks on the modules
+# loaded catch the usual regressions.
+IMPORT_SECONDS_LIMIT = 5.0
+
+MODULES_TO_IMPORT = [
+    'uptane.clients.secondary',
+    'uptane.clients.primary',
+    'uptane.services.director',
+    'uptane.services.timeserver']
+
+# Modules of this repository that should only be imported when they are first
+# used. (Third-party modules, such as pyasn1's DER codec, are not listed: TUF
+# may import them itself.)
+DEFERRED_MODULES = [
+    'uptane.encoding.asn1_definitions',
+    'uptane.encoding.timeserver_asn1_coder',
+    'uptane.encoding.ecu_manifest_asn1_coder',
+    'uptane.encoding.vehicle_manifest_asn1_coder',
+    'demo.uptane_banners']
+
+# Run in the child process: times the imports of the modules named in the
+# arguments and prints the time taken and the modules then loaded, as JSON.
+IMPORT_SCRIPT = '\n'.join([
+    'import sys, json, timeit, importlib',
+    'start = timeit.default_timer()',
+    'for name in sys.argv[1:]:',
+    '  importlib.import_module(name)',
+    'seconds = timeit.default_timer() - start',
+    'print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))'])
+
+
+
+def time_imports(module_names, working_dir):
+  """
+  Imports the named modules in a new Python process running in working_dir,
+  able to import the same modules as this one. Returns the number of seconds
+  the imports took and the names of the modules then loaded.
+  """
+  env = dict(os.environ)
+  # An empty entry in sys.path is the current directory.
+  env['PYTHONPATH'] = os.pathsep.join(
+      [os.path.abspath(path) for path in sys.path])
+
+  output = subprocess.check_output(
+      [sys.executable, '-c', IMPORT_SCRIPT] + module_names,
+      cwd=working_dir, env=env)
+
+  result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+  return result['seconds'], result['modules']
+
+
+
+
+
+class TestImportTime(unittest.TestCase):
+  """
+  "unittest"-style test class for the work done when importing the reference
+  implementation
+  """
+
+  def setUp(self):
+    self.working_dir = tempfile.mkdtemp()
+
+
+
+  def tearDown(self):
+    shutil.rmtree(self.working_dir)
+
+
+
+
+
+  def test_01_import(self):
+
+    seconds, modules = time_imports(MODULES_TO_IMPORT, self.working_dir)
+
+    for name in DEFERRED_MODULES:
+      self.assertNotIn(name, modules)
+
+    # Nothing (such as a log file) has been written.
+    self.assertEqual([], os.listdir(self.working_dir))
+
+    self.assertLess(seconds, IMPORT_SECONDS_LIMIT)
+
+
+
+
+
+# Run unit tests.
+if __name__ == '__main__':
+  unittest.main()
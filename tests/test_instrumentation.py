@@ -0,0 +1,191 @@
+"""
+<Program Name>
+  test_instrumentation.py
+
+<Purpose>
+  Unit testing for uptane/instrumentation.py
+
+<Copyright>
+  See LICENSE for licensing information.
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import unittest
+import socket
+
+import uptane.instrumentation as instrumentation
+
+
+
+class TestInstrumentation(unittest.TestCase):
+  """
+  "unittest"-style test class for the instrumentation module in the reference
+  implementation
+  """
+
+  def setUp(self):
+    instrumentation.clear_sinks()
+    self.sink = instrumentation.HistogramSink(buckets=[0.001, 0.01, 1])
+
+
+
+  def tearDown(self):
+    instrumentation.clear_sinks()
+
+
+
+
+
+  def test_01_disabled(self):
+
+    self.assertFalse(instrumentation.is_enabled())
+
+    # With no sinks, spans are a shared no-op, and timed functions are called
+    # directly.
+    self.assertIs(instrumentation.span('a'), instrumentation.span('b'))
+    with instrumentation.span('a'):
+      pass
+
+    @instrumentation.timed('f')
+    def f(x):
+      return x * 2
+
+    self.assertEqual(4, f(2))
+    self.assertEqual('f', f.__name__)
+
+    # Nothing recorded while disabled reaches a sink added later.
+    instrumentation.add_sink(self.sink)
+    self.assertTrue(instrumentation.is_enabled())
+    self.assertEqual([], self.sink.get_names())
+
+    instrumentation.remove_sink(self.sink)
+    self.assertFalse(instrumentation.is_enabled())
+
+
+
+
+
+  def test_02_spans(self):
+
+    instrumentation.add_sink(self.sink)
+
+    with instrumentation.span('block') as span:
+      pass
+    self.assertGreaterEqual(span.seconds, 0)
+
+    @instrumentation.timed('function')
+    def fail():
+      raise uptane.Error('expected')
+
+    with self.assertRaises(uptane.Error):
+      fail()
+
+    self.assertEqual(['block', 'function'], self.sink.get_names())
+    self.assertEqual(0, self.sink.get_histogram('block')['errors'])
+    self.assertEqual(1, self.sink.get_histogram('function')['errors'])
+
+    # A failing sink does not affect the code being timed or other sinks.
+    class BrokenSink(object):
+      def record(self, name, seconds, error=False):
+        raise ValueError('broken')
+
+    instrumentation.add_sink(BrokenSink())
+    with instrumentation.span('block'):
+      pass
+    self.assertEqual(2, self.sink.get_histogram('block')['count'])
+
+
+
+
+
+  def test_03_histogram_sink(self):
+
+    with self.assertRaises(uptane.Error):
+      instrumentation.HistogramSink(buckets=[])
+    with self.assertRaises(uptane.Error):
+      instrumentation.HistogramSink(buckets=[1, 0.5])
+
+    self.assertIsNone(self.sink.get_histogram('x'))
+    self.assertIsNone(self.sink.percentile('x', 0.5))
+
+    for seconds in [0.0005, 0.005, 0.005, 0.5, 2]:
+      self.sink.record('x', seconds)
+    self.sink.record('x', 0.005, error=True)
+
+    histogram = self.sink.get_histogram('x')
+    self.assertEqual(6, histogram['count'])
+    self.assertEqual(1, histogram['errors'])
+    self.assertEqual(0.0005, histogram['min'])
+    self.assertEqual(2, histogram['max'])
+    self.assertEqual(
+        [(0.001, 1), (0.01, 4), (1, 5), (float('inf'), 6)],
+        histogram['buckets'])
+
+    self.assertEqual(0.01, self.sink.percentile('x', 0.5))
+    self.assertEqual(2, self.sink.percentile('x', 1))
+
+    summary = self.sink.get_summary()
+    self.assertEqual(['x'], list(summary))
+    self.assertEqual(6, summary['x']['count'])
+    self.assertEqual(0.01, summary['x']['p50'])
+
+    self.sink.reset()
+    self.assertEqual([], self.sink.get_names())
+
+
+
+
+
+  def test_04_prometheus_sink(self):
+
+    sink = instrumentation.PrometheusSink(buckets=[0.1], prefix='test')
+    sink.record('primary.update_cycle', 0.05)
+    sink.record('primary.update_cycle', 0.5, error=True)
+
+    lines = sink.get_exposition().splitlines()
+
+    self.assertIn('# TYPE test_span_duration_seconds histogram', lines)
+    self.assertIn('test_span_duration_seconds_bucket{'
+        'span="primary.update_cycle",le="0.1"} 1', lines)
+    self.assertIn('test_span_duration_seconds_bucket{'
+        'span="primary.update_cycle",le="+Inf"} 2', lines)
+    self.assertIn('test_span_duration_seconds_count{'
+        'span="primary.update_cycle"} 2', lines)
+    self.assertIn('# TYPE test_span_errors_total counter', lines)
+    self.assertIn('test_span_errors_total{span="primary.update_cycle"} 1',
+        lines)
+
+
+
+
+
+  def test_05_statsd_sink(self):
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    server.bind(('127.0.0.1', 0))
+    server.settimeout(5)
+
+    sink = instrumentation.StatsdSink(port=server.getsockname()[1],
+        prefix='test')
+    try:
+      sink.record('secondary.validate_image', 0.25)
+      self.assertEqual(b'test.secondary.validate_image:250.000|ms',
+          server.recv(1024))
+
+      sink.record('a:b', 0.001, error=True)
+      self.assertEqual(b'test.a_b:1.000|ms\ntest.a_b.errors:1|c',
+          server.recv(1024))
+
+    finally:
+      sink.close()
+      server.close()
+
+
+
+
+
+# Run unit tests.
+if __name__ == '__main__':
+  unittest.main()
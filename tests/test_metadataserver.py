@@ -0,0 +1,186 @@
+"""
+<Program Name>
+  test_metadataserver.py
+
+<Purpose>
+  Unit testing for uptane/services/metadataserver.py
+
+<Copyright>
+  See LICENSE for licensing information.
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import unittest
+import os.path
+import shutil
+import threading
+import time
+
+from six.moves.urllib import request as urllib_request
+from six.moves.urllib.error import HTTPError
+
+import uptane.services.metadataserver as metadataserver
+
+TEST_DATA_DIR = os.path.join(uptane.WORKING_DIR, 'tests', 'test_data')
+TEST_SERVER_DIR = os.path.join(TEST_DATA_DIR, 'temp_test_metadataserver')
+
+METADATA_FNAME = os.path.join(TEST_SERVER_DIR, 'metadata', 'timestamp.der')
+TARGET_FNAME = os.path.join(TEST_SERVER_DIR, 'targets', 'image.img')
+
+
+
+class TestMetadataServer(unittest.TestCase):
+  """
+  "unittest"-style test class for the metadata server module in the reference
+  implementation
+  """
+
+  @classmethod
+  def setUpClass(cls):
+    """
+    This is run once for the full class (and so the full module, which contains
+    only one class), before all tests. It creates a directory with a metadata
+    file and a target file and serves it on an arbitrary free port.
+    """
+    if os.path.exists(TEST_SERVER_DIR):
+      shutil.rmtree(TEST_SERVER_DIR)
+    os.makedirs(os.path.dirname(METADATA_FNAME))
+    os.makedirs(os.path.dirname(TARGET_FNAME))
+
+    _replace_file(METADATA_FNAME, b'first timestamp')
+    _replace_file(TARGET_FNAME, b'\x00firmware' * 10000)
+
+    cls.server = metadataserver.MetadataServer(
+        TEST_SERVER_DIR, ('127.0.0.1', 0), cache_ttl=0.2)
+    cls.url = 'http://127.0.0.1:' + str(cls.server.server_address[1]) + '/'
+
+    cls.server_thread = threading.Thread(target=cls.server.serve_forever)
+    cls.server_thread.daemon = True
+    cls.server_thread.start()
+
+
+
+
+
+  @classmethod
+  def tearDownClass(cls):
+    cls.server.shutdown()
+    cls.server.server_close()
+    shutil.rmtree(TEST_SERVER_DIR)
+
+
+
+
+
+  def _get(self, url_path, etag=None):
+    """Returns (status, headers, body) for a GET request for url_path."""
+    req = urllib_request.Request(self.url + url_path)
+    if etag is not None:
+      req.add_header('If-None-Match', etag)
+
+    try:
+      response = urllib_request.urlopen(req)
+    except HTTPError as e:
+      return e.code, e.headers, b''
+
+    return response.getcode(), response.headers, response.read()
+
+
+
+
+
+  def test_01_metadata(self):
+
+    status, headers, body = self._get('metadata/timestamp.der')
+    self.assertEqual(200, status)
+    self.assertEqual(b'first timestamp', body)
+    etag = headers['ETag']
+
+    # Requested again, the file is served from memory.
+    hits = self.server.cache.hits
+    self.assertEqual(body, self._get('metadata/timestamp.der')[2])
+    self.assertEqual(hits + 1, self.server.cache.hits)
+
+    # A client that has the file already is told it has not changed.
+    status, headers, body = self._get('metadata/timestamp.der', etag)
+    self.assertEqual(304, status)
+    self.assertEqual(b'', body)
+
+    # Once the file is replaced (and the cache TTL has passed), the new file
+    # is served, with a new ETag.
+    _replace_file(METADATA_FNAME, b'second timestamp')
+    time.sleep(0.3)
+    status, headers, body = self._get('metadata/timestamp.der', etag)
+    self.assertEqual(200, status)
+    self.assertEqual(b'second timestamp', body)
+    self.assertNotEqual(etag, headers['ETag'])
+
+
+
+
+
+  def test_02_target(self):
+
+    status, headers, body = self._get('targets/image.img')
+    self.assertEqual(200, status)
+    self.assertEqual(b'\x00firmware' * 10000, body)
+    self.assertEqual(str(len(body)), headers['Content-Length'])
+
+    self.assertEqual(304, self._get('targets/image.img', headers['ETag'])[0])
+
+    # Targets are not kept in memory.
+    self.assertEqual(1, len(self.server.cache))
+
+
+
+
+
+  def test_03_bad_paths(self):
+
+    for url_path in ['nosuchfile', 'metadata', 'metadata/',
+        '../test_metadataserver.py', 'metadata/%2e%2e/%2e%2e/x']:
+      self.assertEqual(404, self._get(url_path)[0])
+
+    self.assertEqual((None, False), self.server.translate_path('/a/../b'))
+    self.assertEqual(
+        (METADATA_FNAME, True),
+        self.server.translate_path('/metadata/timestamp.der?x=1'))
+
+    with self.assertRaises(uptane.Error):
+      metadataserver.MetadataServer(TARGET_FNAME, ('127.0.0.1', 0))
+
+
+
+
+
+  def test_04_cache_size_limit(self):
+
+    cache = metadataserver.MetadataCache(ttl=60, max_bytes=20)
+
+    self.assertEqual(b'second timestamp', cache.get(METADATA_FNAME)[1])
+    self.assertEqual(1, len(cache))
+    cache.get(METADATA_FNAME)
+    self.assertEqual(1, cache.hits)
+
+    # Too large to keep.
+    cache.get(TARGET_FNAME)
+    self.assertEqual(1, len(cache))
+    self.assertEqual(2, cache.misses)
+
+
+
+
+
+def _replace_file(fname, content):
+  """Replaces a file as published files are replaced: by renaming over it."""
+  with open(fname + '.new', 'wb') as fobj:
+    fobj.write(content)
+  os.rename(fname + '.new', fname)
+
+
+
+# Run unit tests.
+if __name__ == '__main__':
+  unittest.main()
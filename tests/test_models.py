@@ -0,0 +1,122 @@
+"""
+<Program Name>
+  test_models.py
+
+<Purpose>
+  Unit testing for uptane/models.py
+
+<Copyright>
+  See LICENSE for licensing information.
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import os
+import copy
+import json
+import unittest
+
+import uptane.models as models
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'samples')
+
+
+
+def load_sample(fname):
+  with open(os.path.join(SAMPLES_DIR, fname)) as fobj:
+    return json.load(fobj)
+
+
+
+class TestModels(unittest.TestCase):
+  """
+  "unittest"-style test class for the manifest classes in the reference
+  implementation
+  """
+
+  def test_01_ecu_manifest(self):
+
+    sample = load_sample('sample_ecu_manifest_TCUdemocar.json')
+    manifest = models.ECUManifest.from_dict(sample)
+
+    self.assertEqual('TCUdemocar', manifest.ecu_serial)
+    self.assertEqual(
+        sample['signed']['installed_image']['filepath'],
+        manifest.installed_image.filepath)
+    self.assertEqual(sample, manifest.to_dict())
+
+    # The data is not copied.
+    self.assertIs(sample['signed']['installed_image']['fileinfo']['hashes'],
+        manifest.installed_image.hashes)
+
+    # Instances use __slots__ rather than a __dict__.
+    self.assertFalse(hasattr(manifest, '__dict__'))
+    self.assertFalse(hasattr(manifest.installed_image, '__dict__'))
+    self.assertFalse(hasattr(manifest.signatures[0], '__dict__'))
+
+    # Instances compare by value.
+    self.assertEqual(manifest, models.ECUManifest.from_dict(sample))
+    other = copy.deepcopy(sample)
+    other['signed']['attacks_detected'] = 'attack'
+    self.assertNotEqual(manifest, models.ECUManifest.from_dict(other))
+
+    # Custom fileinfo, when present, is kept.
+    other['signed']['installed_image']['fileinfo']['custom'] = {'type': 'x'}
+    self.assertEqual(other, models.ECUManifest.from_dict(other).to_dict())
+
+
+
+
+
+  def test_02_vehicle_manifest(self):
+
+    sample = load_sample('sample_vehicle_manifest.json')
+    manifest = models.VehicleManifest.from_dict(sample)
+
+    self.assertEqual(sample['signed']['vin'], manifest.vin)
+    self.assertEqual(sorted(sample['signed']['ecu_version_manifests']),
+        sorted(manifest.ecu_manifests))
+    for ecu_serial in manifest.ecu_manifests:
+      for ecu_manifest in manifest.ecu_manifests[ecu_serial]:
+        self.assertIsInstance(ecu_manifest, models.ECUManifest)
+
+    self.assertEqual(sample, manifest.to_dict())
+
+
+
+
+
+  def test_03_unknown_keys(self):
+
+    # The schemas allow keys they do not list. These are kept at every level.
+    sample = load_sample('sample_vehicle_manifest.json')
+    sample['note'] = 'top level'
+    sample['signed']['note'] = 'signed'
+    sample['signatures'][0]['note'] = 'signature'
+    for manifests in sample['signed']['ecu_version_manifests'].values():
+      for ecu_manifest in manifests:
+        ecu_manifest['note'] = 'ECU Manifest'
+        ecu_manifest['signed']['note'] = 'signed ECU Manifest'
+        ecu_manifest['signed']['installed_image']['note'] = 'image'
+        ecu_manifest['signed']['installed_image']['fileinfo']['version'] = 1
+
+    manifest = models.VehicleManifest.from_dict(sample)
+    self.assertEqual({'note': 'top level'}, manifest.extra)
+    self.assertEqual(sample, manifest.to_dict())
+
+    # Without unknown keys, nothing extra is kept.
+    sample = load_sample('sample_ecu_manifest_TCUdemocar.json')
+    manifest = models.ECUManifest.from_dict(sample)
+    self.assertIsNone(manifest.extra)
+    self.assertIsNone(manifest.signed_extra)
+    self.assertIsNone(manifest.installed_image.fileinfo_extra)
+
+
+
+
+
+# Run unit tests.
+if __name__ == '__main__':
+  unittest.main()
@@ -248,6 +248,18 @@ class TestPrimary(unittest.TestCase):
           timeserver_public_key = TestPrimary.key_timeserver_pub,
           my_secondaries=[])
 
+    # Invalid full refresh interval
+    with self.assertRaises(tuf.FormatError):
+      primary.Primary(
+          full_client_dir=TEMP_CLIENT_DIR,
+          director_repo_name=demo.DIRECTOR_REPO_NAME,
+          vin=VIN,
+          ecu_serial=PRIMARY_ECU_SERIAL,
+          primary_key=TestPrimary.ecu_key, time=TestPrimary.initial_time,
+          timeserver_public_key = TestPrimary.key_timeserver_pub,
+          my_secondaries=[],
+          full_refresh_interval=-1) # INVALID
+
 
 
     # Try creating a Primary, expecting it to work.
@@ -555,6 +567,46 @@ class TestPrimary(unittest.TestCase):
 
 
 
+  def test_17_nonce_manager(self):
+
+    # Test the NonceManager class directly, using a separate instance so as not
+    # to affect the state of the Primary instance used in the other tests.
+    with self.assertRaises(tuf.FormatError):
+      primary.NonceManager(max_batch_size=0)
+    with self.assertRaises(tuf.FormatError):
+      primary.NonceManager(max_age='a while')
+
+    nonces = primary.NonceManager(max_batch_size=3)
+
+    # Duplicates are discarded and order of receipt is preserved.
+    for nonce in [7, 3, 7, 12, 3, 40, 2]:
+      nonces.add(nonce)
+    self.assertEqual([7, 3, 12, 40, 2], nonces.get_nonces_to_send())
+
+    # Rotation sends the oldest nonces first, no more than the batch size.
+    self.assertEqual([7, 3, 12], nonces.rotate())
+    self.assertEqual([7, 3, 12], nonces.get_nonces_sent())
+    self.assertEqual([40, 2], nonces.get_nonces_to_send())
+
+    self.assertEqual([], nonces.get_missing_nonces([1, 12, 3, 7]))
+    self.assertEqual([3], nonces.get_missing_nonces([12, 7]))
+
+    self.assertEqual([40, 2], nonces.rotate())
+    self.assertEqual([], nonces.get_nonces_to_send())
+    self.assertEqual([], nonces.rotate())
+    self.assertEqual([], nonces.get_missing_nonces([]))
+
+    # Nonces that have waited longer than max_age are discarded on rotation.
+    nonces = primary.NonceManager(max_age=0.5)
+    nonces.add(1)
+    time.sleep(1)
+    nonces.add(2)
+    self.assertEqual([2], nonces.rotate())
+
+
+
+
+
   def test_20_validate_time_attestation(self):
 
     # First, confirm that we've never validated a timeserver attestation, and/or
@@ -601,6 +653,13 @@ class TestPrimary(unittest.TestCase):
         time_attestation,
         TestPrimary.instance.get_last_timeserver_attestation())
 
+    # In DER mode, the Primary should hand back the very bytes it received
+    # rather than a re-encoding of them.
+    if tuf.conf.METADATA_FORMAT == 'der':
+      self.assertIs(
+          time_attestation,
+          TestPrimary.instance.get_last_timeserver_attestation())
+
 
 
     # Prepare to try again with a bad signature.
@@ -821,6 +880,20 @@ class TestPrimary(unittest.TestCase):
     # update cycle has already occurred.
     TestPrimary.instance.primary_update_cycle()
 
+    # Cycles are skipped only if full_refresh_interval is set. Then, once the
+    # Director's timestamp metadata is known to be unchanged since the last
+    # complete cycle, the next cycle is skipped.
+    self.assertEqual(0, TestPrimary.instance.update_cycles_skipped)
+    TestPrimary.instance.full_refresh_interval = 60
+    try:
+      self.assertTrue(TestPrimary.instance.primary_update_cycle())
+      self.assertFalse(TestPrimary.instance.primary_update_cycle())
+      self.assertEqual(1, TestPrimary.instance.update_cycles_skipped)
+      self.assertTrue(
+          TestPrimary.instance.primary_update_cycle(force_refresh=True))
+    finally:
+      TestPrimary.instance.full_refresh_interval = 0
+
 
 
 
@@ -0,0 +1,172 @@
+"""
+<Program Name>
+  test_scheduler.py
+
+<Purpose>
+  Unit testing for uptane/clients/scheduler.py
+
+<Copyright>
+  See LICENSE for licensing information.
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import unittest
+import threading
+
+import tuf
+
+import uptane.clients.scheduler as scheduler
+
+
+
+class FakeClock(object):
+  """A clock for the scheduler that only moves when told to."""
+  def __init__(self):
+    self.now = 1000.0
+
+  def time(self):
+    return self.now
+
+
+
+class TestUpdateScheduler(unittest.TestCase):
+  """
+  "unittest"-style test class for the update scheduler module in the
+  reference implementation
+  """
+
+  def setUp(self):
+    self.clock = FakeClock()
+
+    # With random_function always returning 0.5, there is no jitter.
+    self.scheduler = scheduler.UpdateScheduler(
+        min_interval=1, max_interval=10, campaign_interval=0.5,
+        backoff_factor=2, jitter=0.1, random_function=lambda: 0.5,
+        time_function=self.clock.time)
+
+
+
+
+
+  def test_01_init(self):
+
+    self.assertEqual(0, self.scheduler.seconds_until_next_run())
+    self.assertIsNone(self.scheduler.last_result)
+
+    for kwargs in [{'min_interval': -1}, {'min_interval': '1'},
+        {'min_interval': 5, 'max_interval': 2}, {'backoff_factor': 0.5},
+        {'jitter': 2}]:
+      with self.assertRaises(tuf.FormatError):
+        scheduler.UpdateScheduler(**kwargs)
+
+
+
+
+
+  def test_05_backoff(self):
+    s = self.scheduler
+
+    # Cycles that find nothing new back off exponentially, to a maximum.
+    delays = [s.record_result(scheduler.RESULT_UNCHANGED) for i in range(5)]
+    self.assertEqual([2, 4, 8, 10, 10], delays)
+
+    # Finding something new resets the interval.
+    self.assertEqual(1, s.record_result(scheduler.RESULT_CHANGED))
+
+    # Errors back off too, and are counted.
+    self.assertEqual(2, s.record_result(scheduler.RESULT_ERROR, ValueError()))
+    self.assertEqual(4, s.record_result(scheduler.RESULT_ERROR))
+    self.assertEqual(2, s.consecutive_errors)
+    self.assertEqual(8, s.runs)
+
+    with self.assertRaises(tuf.FormatError):
+      s.record_result('unknown')
+
+
+
+
+
+  def test_10_campaign(self):
+    s = self.scheduler
+    s.record_result(scheduler.RESULT_UNCHANGED)
+    s.record_result(scheduler.RESULT_UNCHANGED)
+    self.assertEqual(4, s.seconds_until_next_run())
+
+    # Starting a campaign brings the next cycle forward, and cycles continue
+    # at the campaign interval until it ends.
+    s.set_campaign_active(True)
+    self.assertEqual(0.5, s.seconds_until_next_run())
+    self.assertEqual(0.5, s.record_result(scheduler.RESULT_UNCHANGED))
+
+    # Errors still back off during a campaign.
+    self.assertEqual(2, s.record_result(scheduler.RESULT_ERROR))
+
+    s.set_campaign_active(False)
+    self.assertEqual(4, s.record_result(scheduler.RESULT_UNCHANGED))
+
+
+
+
+
+  def test_15_jitter(self):
+    s = scheduler.UpdateScheduler(min_interval=10, max_interval=10,
+        jitter=0.1, random_function=lambda: 0.0, time_function=self.clock.time)
+    self.assertAlmostEqual(9, s.record_result(scheduler.RESULT_CHANGED))
+
+    s = scheduler.UpdateScheduler(min_interval=10, max_interval=10,
+        jitter=0.1, random_function=lambda: 0.999999,
+        time_function=self.clock.time)
+    self.assertAlmostEqual(11, s.record_result(scheduler.RESULT_CHANGED), 4)
+
+
+
+
+
+  def test_20_run_and_metrics(self):
+    s = self.scheduler
+
+    self.assertEqual(scheduler.RESULT_CHANGED, s.run(lambda: True))
+    self.assertEqual(scheduler.RESULT_UNCHANGED, s.run(lambda: None))
+
+    def failing_cycle():
+      raise uptane.Error('repository unreachable')
+
+    self.assertEqual(scheduler.RESULT_ERROR, s.run(failing_cycle))
+
+    metrics = s.get_metrics()
+    self.assertEqual(scheduler.RESULT_ERROR, metrics['last_result'])
+    self.assertIn('repository unreachable', metrics['last_error'])
+    self.assertEqual(3, metrics['runs'])
+    self.assertEqual(1, metrics['errors'])
+    self.assertEqual(self.clock.now + 4, metrics['next_run_time'])
+    self.assertEqual(4, metrics['seconds_until_next_run'])
+    self.assertEqual(0, metrics['last_duration'])
+
+
+
+
+
+  def test_25_run_forever(self):
+    # A real clock, with intervals short enough to run several cycles.
+    s = scheduler.UpdateScheduler(
+        min_interval=0.01, max_interval=0.01, campaign_interval=0.01)
+    stop_event = threading.Event()
+    cycles = []
+
+    def cycle():
+      cycles.append(1)
+      if len(cycles) == 3:
+        stop_event.set()
+      return False
+
+    s.run_forever(cycle, stop_event)
+    self.assertEqual(3, len(cycles))
+    self.assertEqual(3, s.runs)
+
+
+
+# Run unit tests.
+if __name__ == '__main__':
+  unittest.main()
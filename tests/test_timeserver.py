@@ -14,6 +14,7 @@ import uptane # Import before TUF modules; may change tuf.conf values.
 
 import unittest
 import time
+import threading
 
 import tuf
 import tuf.formats
@@ -120,6 +121,119 @@ class TestTimeserver(unittest.TestCase):
 
 
 
+  def test_timeserver_class(self):
+
+    # Bad arguments.
+    with self.assertRaises(tuf.FormatError):
+      timeserver.Timeserver(private_key='not a key')
+    with self.assertRaises(tuf.FormatError):
+      timeserver.Timeserver(processes=0)
+
+    # Two Timeservers with different keys in the same process.
+    other_key = uptane.common.canonical_key_from_pub_and_pri(
+        demo.import_public_key('directorsnapshot'),
+        demo.import_private_key('directorsnapshot'))
+
+    ts1 = timeserver.Timeserver(self.timeserver_key)
+    ts2 = timeserver.Timeserver(other_key, processes=2)
+
+    self.assertEqual(self.timeserver_key['keyid'], ts1.keyid)
+    self.assertEqual(other_key['keyid'], ts2.keyid)
+    self.assertNotIn('private', ts2.public_key['keyval'])
+
+    try:
+      for ts in [ts1, ts2]:
+        basic_time_tests(ts.get_time,
+            uptane.formats.TIMESERVER_ATTESTATION_SCHEMA, self)
+        basic_time_tests(ts.get_signed_time,
+            uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA, self)
+
+        attestation = ts.get_signed_time([1, 2])
+        self.assertEqual(ts.keyid, attestation['signatures'][0]['keyid'])
+        self.assertTrue(uptane.common.verify_signature_over_metadata(
+            ts.public_key, attestation['signatures'][0],
+            attestation['signed'], asn1_codec.DATATYPE_TIME_ATTESTATION,
+            metadata_format='json'))
+
+        if timeserver.PYASN1_EXISTS:
+          basic_time_tests(ts.get_signed_time_der,
+              uptane.formats.DER_DATA_SCHEMA, self)
+
+      # Signing from several threads at once, using the worker pool.
+      results = []
+      threads = [threading.Thread(
+          target=lambda n=n: results.append(ts2.get_signed_time([n])))
+          for n in range(8)]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+      self.assertEqual(
+          list(range(8)),
+          sorted(r['signed']['nonces'][0] for r in results))
+
+    finally:
+      ts2.close()
+
+
+
+
+
+  def test_time_attestation_batcher(self):
+
+    # Bad arguments.
+    with self.assertRaises(tuf.FormatError):
+      timeserver.TimeAttestationBatcher('not a function')
+    with self.assertRaises(tuf.FormatError):
+      timeserver.TimeAttestationBatcher(timeserver.get_signed_time, window=-1)
+    with self.assertRaises(tuf.FormatError):
+      timeserver.TimeAttestationBatcher(
+          timeserver.get_signed_time, max_nonces=0)
+
+    # A batcher should behave like the function it wraps when used serially.
+    batcher = timeserver.TimeAttestationBatcher(
+        timeserver.get_signed_time, window=0.01)
+    basic_time_tests(
+        batcher.get_signed_time,
+        uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA, self)
+
+    # Concurrent requests arriving within the window should all receive the
+    # same attestation, listing all of their nonces once each.
+    batcher = timeserver.TimeAttestationBatcher(
+        timeserver.get_signed_time, window=0.5)
+    results = {}
+
+    def request(nonces):
+      results[tuple(nonces)] = batcher.get_signed_time(nonces)
+
+    threads = [threading.Thread(target=request, args=(nonces,))
+        for nonces in [[1, 2], [3], [2, 4]]]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(1, batcher.attestations_signed)
+    self.assertEqual(3, batcher.requests_served)
+    attestations = list(results.values())
+    self.assertEqual(3, len(attestations))
+    for attestation in attestations:
+      self.assertEqual(attestations[0], attestation)
+    self.assertEqual(
+        [1, 2, 3, 4], sorted(attestations[0]['signed']['nonces']))
+
+    # A full batch should be signed without waiting for the window to end.
+    batcher = timeserver.TimeAttestationBatcher(
+        timeserver.get_signed_time, window=30, max_nonces=2)
+    start = time.time()
+    attestation = batcher.get_signed_time([5, 6])
+    self.assertLess(time.time() - start, 30)
+    self.assertEqual([5, 6], attestation['signed']['nonces'])
+
+
+
+
+
 def basic_time_tests(func, output_schema, cls): # cls: clunky
   """
   This non-class helper function takes as a third parameter the
@@ -77,29 +77,101 @@ class FailedToEncodeASN1DER(Error):
 
 
 # Logging configuration
+#
+# Importing uptane configures no logging handlers and opens no files. The
+# 'uptane' logger, parent of the loggers of every module in this package,
+# defaults to level WARNING, so that debug and info messages are discarded
+# before they are formatted. Call configure_logging() to see more, or to log
+# to a file.
 
 ## General logging configuration:
 _FORMAT_STRING = '[%(asctime)sUTC] [%(name)s] %(levelname)s '+\
     '[%(filename)s:%(funcName)s():%(lineno)s]\n%(message)s\n'
 _TIME_STRING = "%Y.%m.%d %H:%M:%S"
 
-## File logging configuration:
-LOG_FILENAME = 'uptane.log'
-file_handler = logging.FileHandler(LOG_FILENAME)
-file_handler.setLevel(logging.DEBUG)
-logging.Formatter.converter = time.gmtime
-file_handler.setFormatter(logging.Formatter(_FORMAT_STRING, _TIME_STRING))
+DEFAULT_LOG_LEVEL = logging.WARNING
 
-## Console logging configuration:
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-console_handler.setFormatter(logging.Formatter(_FORMAT_STRING, _TIME_STRING))
+## Default file name for configure_logging(log_to_file=True):
+LOG_FILENAME = 'uptane.log'
 
 ## Logger instantiation
 logger = logging.getLogger('uptane')
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
-logger.setLevel(logging.DEBUG)
+logger.setLevel(DEFAULT_LOG_LEVEL)
+
+## The handlers added by configure_logging(), if any.
+file_handler = None
+console_handler = None
+
+
+
+def configure_logging(level=DEFAULT_LOG_LEVEL, log_to_console=True,
+    log_to_file=False, log_filename=LOG_FILENAME):
+  """
+  <Purpose>
+    Sets the level of the 'uptane' logger (and so of every module's logger in
+    this package) and replaces the handlers added by any earlier call with a
+    console handler and/or a file handler using the Uptane log format, with
+    times in UTC.
+
+    Importing uptane does not call this; until it is called, messages at level
+    WARNING and above go to Python's default handling (standard error).
+
+  <Arguments>
+    level   (optional)
+      The logging level, e.g. logging.DEBUG. Default DEFAULT_LOG_LEVEL
+      (logging.WARNING).
+
+    log_to_console   (optional)
+      Whether or not to log to standard error. Default True.
+
+    log_to_file   (optional)
+      Whether or not to log to the file log_filename. Default False.
+
+    log_filename   (optional)
+      The file to log to if log_to_file is True, opened for appending.
+      Default LOG_FILENAME, in the current working directory.
+
+  <Exceptions>
+    IOError or OSError if the log file cannot be opened.
+
+  <Side Effects>
+    Sets uptane.console_handler and uptane.file_handler to the handlers added
+    (or None).
+
+  <Returns>
+    None
+  """
+  global file_handler
+  global console_handler
+
+  formatter = logging.Formatter(_FORMAT_STRING, _TIME_STRING)
+  formatter.converter = time.gmtime
+
+  new_file_handler = None
+  if log_to_file:
+    new_file_handler = logging.FileHandler(log_filename)
+    new_file_handler.setFormatter(formatter)
+
+  new_console_handler = None
+  if log_to_console:
+    new_console_handler = logging.StreamHandler()
+    new_console_handler.setFormatter(formatter)
+
+  for handler in (file_handler, console_handler):
+    if handler is not None:
+      logger.removeHandler(handler)
+      handler.close()
+
+  file_handler = new_file_handler
+  console_handler = new_console_handler
+
+  for handler in (file_handler, console_handler):
+    if handler is not None:
+      logger.addHandler(handler)
+
+  logger.setLevel(level)
+
+
 
 # Colorful printing for the logger for now.
 # Background colors
@@ -25,6 +25,9 @@ import shutil # For copyfile
 import random # for nonces
 import zipfile
 import hashlib # if we're using DER encoding
+import collections # for NonceManager
+from six.moves.urllib import request as urllib_request # for conditional
+from six.moves.urllib.error import HTTPError           # metadata requests
 
 import tuf.formats
 import tuf.conf
@@ -34,6 +37,7 @@ import tuf.repository_tool as rt
 
 import uptane.formats
 import uptane.common
+import uptane.instrumentation as instrumentation
 import uptane.services.director as director
 import uptane.services.timeserver as timeserver
 import uptane.encoding.asn1_codec as asn1_codec
@@ -44,18 +48,23 @@ from uptane.encoding.asn1_codec import DATATYPE_VEHICLE_MANIFEST
 
 from uptane import GREEN, RED, YELLOW, ENDCOLORS
 
-# The following two imports are only used for the Uptane demonstration, where
-# they enable delays and the display of splash banners indicating metadata
-# rejection during sequential metadata checks. These should be pulled out of
-# the reference implementation when possible.
 import time
-from demo.uptane_banners import *
 
+# The splash banners indicating metadata rejection during the Uptane
+# demonstration (demo.uptane_banners) are imported only when they are shown,
+# since loading them reads files. They should be pulled out of the reference
+# implementation when possible.
 
-log = uptane.logging.getLogger('primary')
-log.addHandler(uptane.file_handler)
-log.addHandler(uptane.console_handler)
-log.setLevel(uptane.logging.DEBUG)
+
+log = uptane.logging.getLogger('uptane.primary')
+
+# Default greatest number of seconds for which primary_update_cycle may skip
+# refreshing metadata because the Director's timestamp metadata has not
+# changed. After this long, a full update cycle is performed regardless, so
+# that (e.g.) expired metadata is still detected. 0: cycles are never skipped
+# unless a Primary is created with a positive full_refresh_interval. See
+# Primary.
+DEFAULT_FULL_REFRESH_INTERVAL = 0
 
 
 
@@ -131,24 +140,40 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
       A dict mapping ECU Serial to the target file info that the Director has
       instructed that ECU to install.
 
+    self.nonces:
+      A NonceManager object (see below) tracking the nonces sent to us by
+      Secondaries, both those not yet sent to the Timeserver and those sent
+      in the most recent request to the Timeserver.
+
     self.nonces_to_send:
       The list of nonces sent to us from Secondaries and not yet sent to the
-      Timeserver.
+      Timeserver. (A view of self.nonces, in the order received.)
 
     self.nonces_sent:
       The list of nonces sent to the Timeserver by our Secondaries, which we
       have already sent to the Timeserver. Will be checked against the
-      Timeserver's response.
+      Timeserver's response. (A view of self.nonces.)
 
     self.all_valid_timeserver_attestations:
-      A list of all attestations received from Timeservers that have been
-      validated by validate_time_attestation.
-      Items are appended to the end.
+      The most recent attestations received from Timeservers that have been
+      validated by validate_time_attestation, in an
+      uptane.common.BoundedHistory. Items are appended to the end, and only
+      the most recent few (time_history_capacity) are retained. If a
+      time_audit_log_fname was provided, every validated attestation is also
+      written to that file.
 
     self.all_valid_timeserver_times:
-      A list of all times extracted from all Timeserver attestations that have
-      been validated by validate_time_attestation.
-      Items are appended to the end.
+      The most recent times extracted from Timeserver attestations that have
+      been validated by validate_time_attestation, in an
+      uptane.common.BoundedHistory. Items are appended to the end, and only
+      the most recent few (time_history_capacity) are retained.
+
+    self.last_timeserver_attestation_der:
+      If tuf.conf.METADATA_FORMAT is 'der', the most recent validated
+      Timeserver attestation exactly as received from the Timeserver, in
+      ASN.1/DER (uptane.formats.DER_DATA_SCHEMA), else None. This is what is
+      provided to Secondaries, so that the attestation need not be re-encoded
+      for each Secondary that asks for it.
 
     self.distributable_full_metadata_archive_fname:
       The filename at which the full metadata archive is stored after each
@@ -161,6 +186,20 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
       each update cycle, once it is safe to use. This is atomically moved into
       place (renamed) after it has been fully written, to avoid race conditions.
 
+    self.full_refresh_interval:
+      The greatest number of seconds for which primary_update_cycle may skip
+      a cycle because the Director's timestamp metadata has not changed since
+      the last complete cycle. 0 (the default) if cycles are never skipped.
+      Skipping is opt-in: the timestamp metadata on which the decision rests
+      is fetched without being validated, so a party able to tamper with the
+      connection to the Director can delay the next full cycle (and with it
+      the detection of changes and attacks on either repository) by up to
+      this long.
+
+    self.update_cycles_skipped:
+      The number of calls to primary_update_cycle that were skipped because
+      the Director's timestamp metadata had not changed.
+
 
   Methods organized by purpose: ("self" arguments excluded)
 
@@ -227,7 +266,12 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     primary_key,
     time,
     timeserver_public_key,
-    my_secondaries=None):
+    my_secondaries=None,
+    nonce_batch_size=None,
+    nonce_max_age=None,
+    time_history_capacity=uptane.common.DEFAULT_TIME_HISTORY_CAPACITY,
+    time_audit_log_fname=None,
+    full_refresh_interval=DEFAULT_FULL_REFRESH_INTERVAL):
 
     """
     <Purpose>
@@ -253,6 +297,26 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         An initial time to set the Primary's "clock" to, conforming to
         tuf.formats.ISO8601_DATETIME_SCHEMA.
 
+      nonce_batch_size (optional)
+        The maximum number of nonces to include in a single request to the
+        Timeserver. See NonceManager. Default None (no limit).
+
+      nonce_max_age (optional)
+        The number of seconds after which a nonce received from a Secondary
+        and not yet sent to the Timeserver is discarded. See NonceManager.
+        Default None (nonces do not expire).
+
+      time_history_capacity (optional)
+        The number of validated Timeserver times and attestations to retain
+        in memory. Default uptane.common.DEFAULT_TIME_HISTORY_CAPACITY.
+
+      time_audit_log_fname (optional)
+        If provided, the name of a file to which every validated Timeserver
+        attestation is appended. See uptane.common.BoundedHistory.
+
+      full_refresh_interval (optional)
+        See class docstring above. Default DEFAULT_FULL_REFRESH_INTERVAL.
+
 
     <Exceptions>
 
@@ -275,14 +339,18 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     uptane.formats.ECU_SERIAL_SCHEMA.check_match(ecu_serial)
     tuf.formats.ANYKEY_SCHEMA.check_match(timeserver_public_key)
     tuf.formats.ANYKEY_SCHEMA.check_match(primary_key)
+    tuf.formats.LENGTH_SCHEMA.check_match(full_refresh_interval)
     # TODO: Should also check that primary_key is a private key, not a
     # public key.
 
     self.vin = vin
     self.ecu_serial = ecu_serial
     self.full_client_dir = full_client_dir
-    self.all_valid_timeserver_times = [time]
-    self.all_valid_timeserver_attestations = []
+    self.all_valid_timeserver_times = uptane.common.BoundedHistory(
+        time_history_capacity, initial_items=[time])
+    self.all_valid_timeserver_attestations = uptane.common.BoundedHistory(
+        time_history_capacity, audit_log_fname=time_audit_log_fname)
+    self.last_timeserver_attestation_der = None
     self.timeserver_public_key = timeserver_public_key
     self.primary_key = primary_key
     self.my_secondaries = my_secondaries
@@ -304,10 +372,19 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         tuf.conf.METADATA_FORMAT)
 
     # Initializations not directly related to arguments.
-    self.nonces_to_send = []
-    self.nonces_sent = []
+    self.nonces = NonceManager(
+        max_batch_size=nonce_batch_size, max_age=nonce_max_age)
     self.assigned_targets = dict()
 
+    self.full_refresh_interval = full_refresh_interval
+    self.update_cycles_skipped = 0
+
+    # What identifies the Director's timestamp metadata as of the start of the
+    # last complete update cycle (see _get_director_timestamp_key), and when
+    # that cycle started. Until a cycle completes, both are None.
+    self._director_timestamp_key = None
+    self._last_full_update_cycle_time = None
+
     # Initialize the dictionary of manifests. This is a dictionary indexed
     # by ECU serial and with value being a list of manifests from that ECU, to
     # support the case in which multiple manifests have come from that ECU.
@@ -327,6 +404,33 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
+  @property
+  def nonces_to_send(self):
+    """
+    The nonces received from Secondaries and not yet sent to the Timeserver,
+    as a list in the order received. See NonceManager.
+    """
+    return self.nonces.get_nonces_to_send()
+
+
+  @nonces_to_send.setter
+  def nonces_to_send(self, nonces):
+    uptane.formats.NONCE_LIST_SCHEMA.check_match(nonces)
+    self.nonces.set_nonces_to_send(nonces)
+
+
+  @property
+  def nonces_sent(self):
+    """
+    The nonces included in the most recent request to the Timeserver, as a
+    list. See NonceManager.
+    """
+    return self.nonces.get_nonces_sent()
+
+
+
+
+
   def refresh_toplevel_metadata_from_repositories(self):
     """
     Refreshes client's metadata for the top-level roles:
@@ -361,6 +465,7 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
+  @instrumentation.timed('primary.validate_target_info')
   def get_validated_target_info(self, target_filepath):
     """
     (Could be called: get Director's version of the fully validated target info)
@@ -461,11 +566,20 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
-  def primary_update_cycle(self):
+  @instrumentation.timed('primary.update_cycle')
+  def primary_update_cycle(self, force_refresh=False):
     """
     Download fresh metadata and images for this vehicle, as instructed by the
     Director and validated by the Image Repository.
 
+    Begin with a cheap conditional request for the Director's timestamp
+    metadata. If it has not changed since the start of the last update cycle
+    that completed (validating and downloading every target the Director
+    listed), and that cycle was less than self.full_refresh_interval seconds
+    ago, nothing else can have changed that would affect this vehicle, and
+    the rest of the cycle is skipped. (Otherwise, or if force_refresh is
+    True, the full cycle below is performed.)
+
     Begin by obtaining trustworthy target file metadata from the repositories,
     then instruct TUF to download matching files.
 
@@ -485,22 +599,48 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         - If a file exists in the metadata directory in which validated files
           are deposited by TUF that does not have an extension that befits a
           file of type tuf.conf.METADATA_FORMAT.
+
+    <Returns>
+      True if a full update cycle was performed, False if it was skipped.
     """
+    tuf.formats.BOOLEAN_SCHEMA.check_match(force_refresh)
+
+    cycle_start_time = time.time()
+    director_timestamp_key = None
+
+    if self.full_refresh_interval:
+      director_timestamp_key = self._get_director_timestamp_key()
+
+      if not force_refresh and director_timestamp_key is not None and \
+          director_timestamp_key == self._director_timestamp_key and \
+          cycle_start_time - self._last_full_update_cycle_time < \
+          self.full_refresh_interval:
+        self.update_cycles_skipped += 1
+        log.debug('The Director\'s timestamp metadata has not changed. '
+            'Skipping update cycle.')
+        return False
+
+    # Until this cycle completes, the next must not be skipped.
+    self._director_timestamp_key = None
+    cycle_complete = True
+
     log.debug('Refreshing top level metadata from all repositories.')
-    self.refresh_toplevel_metadata_from_repositories()
+    with instrumentation.span('primary.refresh_metadata'):
+      self.refresh_toplevel_metadata_from_repositories()
 
-    # Get the list of targets the director expects us to download and update to.
-    # Note that at this line, this target info is not yet validated with the
-    # Image Repository: that is done a few lines down.
-    directed_targets = self.get_target_list_from_director()
+      # Get the list of targets the director expects us to download and update
+      # to. Note that at this line, this target info is not yet validated with
+      # the Image Repository: that is done a few lines down.
+      directed_targets = self.get_target_list_from_director()
 
     if not directed_targets:
       log.info('A correctly signed statement from the Director indicates that '
           'this vehicle has NO updates to install.')
     else:
-      log.info('A correctly signed statement from the Director indicates that '
-          'this vehicle has updates to install:' +
-          repr([targ['filepath'] for targ in directed_targets]))
+      if log.isEnabledFor(uptane.logging.INFO):
+        log.info('A correctly signed statement from the Director indicates '
+            'that this vehicle has updates to install:' +
+            repr([targ['filepath'] for targ in directed_targets]))
 
 
     log.debug('Retrieving validated image file metadata from Image and '
@@ -529,6 +669,7 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         verified_targets.append(self.get_validated_target_info(target_filepath))
 
       except tuf.UnknownTargetError:
+        cycle_complete = False
         log.warning(RED + 'Director has instructed us to download a target (' +
             target_filepath + ') that is not validated by the combination of '
             'Image + Director Repositories. That update IS BEING SKIPPED. It '
@@ -542,10 +683,12 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         # This clause should be pulled out of the reference implementation when
         # possible.
         if uptane.DEMO_MODE: # pragma: no cover
-          print_banner(BANNER_DEFENDED, color=WHITE+DARK_BLUE_BG,
+          import demo.uptane_banners as banners
+          banners.print_banner(banners.BANNER_DEFENDED,
+              color=banners.WHITE + banners.DARK_BLUE_BG,
               text='The Director has instructed us to download a file that '
               'does not exactly match the Image Repository metadata. '
-              'File: ' + repr(target_filepath), sound=TADA)
+              'File: ' + repr(target_filepath), sound=banners.TADA)
           time.sleep(3)
 
 
@@ -564,9 +707,10 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
-    log.info('Metadata for the following Targets has been validated by both '
-        'the Director and the Image repository. They will now be downloaded:' +
-        repr(verified_target_filepaths))
+    if log.isEnabledFor(uptane.logging.INFO):
+      log.info('Metadata for the following Targets has been validated by both '
+          'the Director and the Image repository. They will now be '
+          'downloaded:' + repr(verified_target_filepaths))
 
 
     # For each target for which we have verified metadata:
@@ -618,9 +762,11 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
       # still has it). (The second argument here is just where to put the
       # files.)
       try:
-        self.updater.download_target(target, full_targets_directory)
+        with instrumentation.span('primary.download_target'):
+          self.updater.download_target(target, full_targets_directory)
 
       except tuf.NoWorkingMirrorError as e:
+        cycle_complete = False
         error_report = ''
         for mirror in e.mirror_errors:
           error_report += \
@@ -634,10 +780,13 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
         # This clause should be pulled out of the reference implementation when
         # possible.
         if uptane.DEMO_MODE: # pragma: no cover
-          print_banner(BANNER_DEFENDED, color=WHITE+DARK_BLUE_BG,
+          import demo.uptane_banners as banners
+          banners.print_banner(banners.BANNER_DEFENDED,
+              color=banners.WHITE + banners.DARK_BLUE_BG,
               text='No image was found that exactly matches the signed metadata '
               'from the Director and Image Repositories. Not keeping '
-              'untrustworthy files. ' + repr(target_filepath), sound=TADA)
+              'untrustworthy files. ' + repr(target_filepath),
+              sound=banners.TADA)
           time.sleep(3)
 
 
@@ -697,6 +846,69 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     # may be requesting these files live.
     self.save_distributable_metadata_files()
 
+    if cycle_complete:
+      self._director_timestamp_key = director_timestamp_key
+      self._last_full_update_cycle_time = cycle_start_time
+
+    return True
+
+
+
+
+
+  @instrumentation.timed('primary.check_director_timestamp')
+  def _get_director_timestamp_key(self):
+    """
+    Makes a conditional request to the Director repository for its timestamp
+    metadata, and returns what identifies the version of it currently served:
+    the ETag provided by the server, or else a hash of the file's contents.
+    If the server responds that the file has not changed since the last
+    complete update cycle, the value saved then is returned. Returns None if
+    the file cannot be retrieved from any mirror.
+
+    The metadata is not validated: it is used only to decide whether or not
+    the full (validating) update cycle can be skipped.
+    """
+    timestamp_fname = 'timestamp.' + tuf.conf.METADATA_FORMAT
+    mirrors = self.updater.pinned_metadata['repositories'][
+        self.director_repo_name]['mirrors']
+
+    for mirror in mirrors:
+      if isinstance(mirror, dict):
+        url = mirror['url_prefix'].rstrip('/') + '/' + \
+            mirror.get('metadata_path', 'metadata').strip('/') + '/' + \
+            timestamp_fname
+      else:
+        url = mirror.rstrip('/') + '/metadata/' + timestamp_fname
+
+      request = urllib_request.Request(url)
+      if self._director_timestamp_key is not None and \
+          not self._director_timestamp_key.startswith('sha256:'):
+        request.add_header('If-None-Match', self._director_timestamp_key)
+
+      try:
+        response = urllib_request.urlopen(
+            request, timeout=tuf.conf.SOCKET_TIMEOUT)
+        try:
+          etag = response.headers.get('ETag')
+          if etag is not None:
+            return etag
+          return 'sha256:' + hashlib.sha256(response.read()).hexdigest()
+        finally:
+          response.close()
+
+      except HTTPError as e:
+        if e.code == 304:
+          return self._director_timestamp_key
+        log.debug('Conditional request for ' + repr(url) + ' failed: ' +
+            repr(e))
+
+      except (IOError, OSError, ValueError) as e:
+        log.debug('Conditional request for ' + repr(url) + ' failed: ' +
+            repr(e))
+
+    return None
+
 
 
 
@@ -813,11 +1025,19 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
     most_recent_attestation = self.all_valid_timeserver_attestations[-1]
 
-    # We've been storing the time attestation as a simple JSON-compatible
-    # dictionary. If the format of transfered metadata is expected to be
-    # ASN.1/DER, we convert the time attestation back to DER and return it in
-    # that form.
-    if tuf.conf.METADATA_FORMAT == 'der':
+    # If the format of transfered metadata is expected to be ASN.1/DER, we
+    # return the attestation as the DER we received from the Timeserver and
+    # kept when validating it. (The signature is over the DER encoding, so
+    # there is no reason to re-encode it for every Secondary that asks.)
+    if tuf.conf.METADATA_FORMAT == 'der' and \
+        self.last_timeserver_attestation_der is not None:
+      return self.last_timeserver_attestation_der
+
+    # Otherwise, we've been storing the time attestation as a simple
+    # JSON-compatible dictionary. If the format of transfered metadata is
+    # expected to be ASN.1/DER, we convert the time attestation back to DER
+    # and return it in that form.
+    elif tuf.conf.METADATA_FORMAT == 'der':
       converted_attestation = asn1_codec.convert_signed_metadata_to_der(
           most_recent_attestation, DATATYPE_TIME_ATTESTATION)
       uptane.formats.DER_DATA_SCHEMA.check_match(converted_attestation)
@@ -841,6 +1061,7 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
+  @instrumentation.timed('primary.sign_vehicle_manifest')
   def generate_signed_vehicle_manifest(self):
     """
     Put ECU manifests into a vehicle manifest and sign it.
@@ -939,6 +1160,7 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
+  @instrumentation.timed('primary.register_ecu_manifest')
   def register_ecu_manifest(
       self, vin, ecu_serial, nonce, signed_ecu_manifest, force_pydict=False):
     """
@@ -1055,12 +1277,12 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
     # And add the nonce the Secondary provided to the list of nonces to send
     # in the next Timeserver request.
-    if nonce not in self.nonces_to_send:
-      self.nonces_to_send.append(nonce)
+    self.nonces.add(nonce)
 
 
-    log.debug(GREEN + ' Primary received an ECU manifest from ECU ' +
-        repr(ecu_serial) + ', along with nonce ' + repr(nonce) + ENDCOLORS)
+    if log.isEnabledFor(uptane.logging.DEBUG):
+      log.debug(GREEN + ' Primary received an ECU manifest from ECU ' +
+          repr(ecu_serial) + ', along with nonce ' + repr(nonce) + ENDCOLORS)
 
     # Alert if there's been a detected attack.
     if signed_ecu_manifest['signed']['attacks_detected']:
@@ -1079,17 +1301,19 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     It:
      - returns the set of nonces to include in that request
      - registers those as sent (replaces self.nonces_sent with them)
-     - empties self.nonces_to_send, to be populated from new messages from
-       Secondaries.
+     - removes them from self.nonces_to_send, which is populated from new
+       messages from Secondaries. (If this Primary was configured with a
+       nonce_batch_size, nonces beyond that number remain to be sent in the
+       next request, and if it was configured with a nonce_max_age, nonces
+       older than that are discarded. See NonceManager.)
     """
-    self.nonces_sent = self.nonces_to_send
-    self.nonces_to_send = []
-    return self.nonces_sent
+    return self.nonces.rotate()
 
 
 
 
 
+  @instrumentation.timed('primary.validate_time_attestation')
   def validate_time_attestation(self, timeserver_attestation):
     """
     This should be called after get_nonces_to_send_and_rotate has been called
@@ -1112,8 +1336,12 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     """
 
     # If we're using DER format, convert the attestation into something
-    # comprehensible instead.
+    # comprehensible instead, keeping the original DER to provide to
+    # Secondaries if it is valid.
+    der_attestation = None
     if tuf.conf.METADATA_FORMAT == 'der':
+      uptane.formats.DER_DATA_SCHEMA.check_match(timeserver_attestation)
+      der_attestation = timeserver_attestation
       timeserver_attestation = asn1_codec.convert_signed_der_to_dersigned_json(
           timeserver_attestation, DATATYPE_TIME_ATTESTATION)
 
@@ -1138,17 +1366,17 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
           'Time is questionable, so not saved. If you see this persistently, '
           'it is possible that there is a Man in the Middle attack underway.')
 
-    for nonce in self.nonces_sent:
-      if nonce not in timeserver_attestation['signed']['nonces']:
-        # TODO: Determine whether or not to add something to self.attacks_detected
-        # to indicate this problem. It's probably not certain enough? But perhaps
-        # we should err on the side of reporting.
-        # TODO: Create a new class for this Exception in this file.
-        raise uptane.BadTimeAttestation('Timeserver returned a time attestation'
-            ' that did not include one of the expected nonces. This time is '
-            'questionable and will not be registered. If you see this '
-            'persistently, it is possible that there is a Man in the Middle '
-            'attack underway.')
+    if self.nonces.get_missing_nonces(
+        timeserver_attestation['signed']['nonces']):
+      # TODO: Determine whether or not to add something to self.attacks_detected
+      # to indicate this problem. It's probably not certain enough? But perhaps
+      # we should err on the side of reporting.
+      # TODO: Create a new class for this Exception in this file.
+      raise uptane.BadTimeAttestation('Timeserver returned a time attestation'
+          ' that did not include one of the expected nonces. This time is '
+          'questionable and will not be registered. If you see this '
+          'persistently, it is possible that there is a Man in the Middle '
+          'attack underway.')
 
 
     # Extract actual time from the timeserver's signed attestation.
@@ -1160,11 +1388,13 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
     # Save the attestation itself as well, to provide to Secondaries (who need
     # not trust us).
     self.all_valid_timeserver_attestations.append(timeserver_attestation)
+    self.last_timeserver_attestation_der = der_attestation
 
 
 
 
 
+  @instrumentation.timed('primary.build_metadata_archive')
   def save_distributable_metadata_files(self):
     """
     Generates two metadata files, all validated by this Primary, placing them
@@ -1259,6 +1489,158 @@ class Primary(object): # Consider inheriting from Secondary and refactoring.
 
 
 
+class NonceManager(object):
+  """
+  <Purpose>
+    Tracks the nonces a Primary receives from its Secondaries, for inclusion
+    in requests to the Timeserver, and the nonces it has most recently sent to
+    the Timeserver, against which the Timeserver's attestation is checked.
+
+    Nonces are held with set semantics (a nonce is only ever listed once, and
+    membership checks are constant-time) while preserving the order in which
+    they were received, which is the order in which they are sent to the
+    Timeserver. This keeps the cost of registering ECU Manifests and of
+    validating time attestations linear in the number of Secondaries.
+
+  <Fields>
+
+    self.max_batch_size
+      The maximum number of nonces returned by a single call to rotate(). If
+      more nonces than this are waiting to be sent, the oldest are sent first
+      and the rest remain to be sent in the next request. None means no limit.
+
+    self.max_age
+      The number of seconds a nonce may wait to be sent before it is
+      discarded during rotate(). A Secondary that has not had its nonce
+      included in a time attestation for that long will have sent a new one
+      along with its next ECU Manifest. None means nonces do not expire.
+
+  <Use>
+    nonces = NonceManager()
+    nonces.add(5)
+    nonces.add(18)
+    nonces_for_timeserver = nonces.rotate()   # [5, 18]
+    <request a time attestation listing those nonces>
+    if nonces.get_missing_nonces(<nonces listed in the attestation>):
+      <the attestation is not trustworthy>
+  """
+
+  def __init__(self, max_batch_size=None, max_age=None):
+
+    if max_batch_size is not None:
+      tuf.formats.LENGTH_SCHEMA.check_match(max_batch_size)
+      if max_batch_size < 1:
+        raise tuf.FormatError('max_batch_size must be at least 1, or None. '
+            'Given: ' + repr(max_batch_size))
+
+    if max_age is not None and not isinstance(max_age, (int, float)):
+      raise tuf.FormatError('max_age must be a number of seconds, or None. '
+          'Given: ' + repr(max_age))
+
+    self.max_batch_size = max_batch_size
+    self.max_age = max_age
+
+    # Nonces not yet sent to the Timeserver, mapped to the time at which each
+    # was most recently received from a Secondary.
+    self._to_send = collections.OrderedDict()
+
+    # Nonces sent in the most recent request to the Timeserver. Only the keys
+    # are used; an OrderedDict serves as an ordered set.
+    self._sent = collections.OrderedDict()
+
+
+
+
+
+  def add(self, nonce):
+    """
+    Registers a nonce received from a Secondary, to be sent in a future
+    request to the Timeserver. If the nonce is already waiting to be sent, it
+    keeps its place in line, but its age is reset.
+    """
+    self._to_send[nonce] = time.time()
+
+
+
+
+
+  def get_nonces_to_send(self):
+    """
+    Returns a list of the nonces waiting to be sent, in the order received.
+    """
+    return list(self._to_send)
+
+
+
+
+
+  def get_nonces_sent(self):
+    """
+    Returns a list of the nonces sent in the most recent request to the
+    Timeserver, in the order they were sent.
+    """
+    return list(self._sent)
+
+
+
+
+
+  def set_nonces_to_send(self, nonces):
+    """
+    Replaces the nonces waiting to be sent with the given list of nonces.
+    Duplicates are discarded.
+    """
+    now = time.time()
+    self._to_send = collections.OrderedDict(
+        (nonce, now) for nonce in nonces)
+
+
+
+
+
+  def rotate(self):
+    """
+    Moves nonces from those waiting to be sent to those sent, and returns the
+    list of nonces to include in a request to the Timeserver.
+
+    Nonces older than self.max_age are discarded first, and no more than
+    self.max_batch_size nonces are moved (the oldest first).
+    """
+    if self.max_age is not None:
+      cutoff = time.time() - self.max_age
+      for nonce in [n for n, t in self._to_send.items() if t < cutoff]:
+        del self._to_send[nonce]
+
+    if self.max_batch_size is None or \
+        len(self._to_send) <= self.max_batch_size:
+      self._sent = self._to_send
+      self._to_send = collections.OrderedDict()
+
+    else:
+      self._sent = collections.OrderedDict()
+      for nonce in list(self._to_send)[:self.max_batch_size]:
+        self._sent[nonce] = self._to_send.pop(nonce)
+
+    return list(self._sent)
+
+
+
+
+
+  def get_missing_nonces(self, attested_nonces):
+    """
+    Given the list of nonces in a Timeserver attestation, returns the list of
+    nonces sent in the most recent request to the Timeserver that do not
+    appear in it. An empty list means that the attestation lists every nonce
+    expected.
+    """
+    attested_nonces = set(attested_nonces)
+    return [nonce for nonce in self._sent if nonce not in attested_nonces]
+
+
+
+
+
 def enforce_jail(fname, expected_containing_dir):
   """
   DO NOT ASSUME THAT THIS FUNCTION IS SECURE.
@@ -0,0 +1,374 @@
+"""
+<Program Name>
+  scheduler.py
+
+<Purpose>
+  Provides UpdateScheduler, which decides when a client (e.g. a Primary or
+  Secondary) should next run its update cycle, adapting the polling interval
+  to what recent cycles found:
+
+   -When a cycle finds nothing new, or fails, the interval grows
+    exponentially, up to a maximum, so that idle or unreachable clients poll
+    rarely.
+   -When a cycle finds something new, the interval returns to its minimum.
+   -While an update campaign is active (e.g. an update has been assigned to
+    the vehicle but not yet installed), cycles run at the campaign interval.
+   -Every delay is randomly varied (jittered) by a fraction of itself, so that
+    a fleet of clients started together do not all poll at the same moments.
+
+  The scheduler also keeps metrics on the cycles it has run: when the next
+  will run, and the result, time and duration of the last.
+
+  Use:
+    import uptane.clients.scheduler as scheduler
+    s = scheduler.UpdateScheduler()
+    s.run_forever(<function running one update cycle; returns True if
+        something changed, else False>)
+
+"""
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+import tuf
+import tuf.formats
+
+import time
+import random
+import threading
+
+log = uptane.logging.getLogger('uptane.scheduler')
+
+# Default intervals, in seconds, between update cycles: after a cycle that
+# found something new, at most (after cycles that found nothing new, or
+# failed), and while an update campaign is active.
+DEFAULT_MIN_INTERVAL = 1
+DEFAULT_MAX_INTERVAL = 300
+DEFAULT_CAMPAIGN_INTERVAL = 1
+
+# Default factor by which the interval grows after each cycle that finds
+# nothing new or fails.
+DEFAULT_BACKOFF_FACTOR = 2
+
+# Default greatest fraction of a delay by which it is randomly lengthened or
+# shortened.
+DEFAULT_JITTER = 0.1
+
+# Results of update cycles, as recorded by UpdateScheduler.record_result.
+RESULT_CHANGED = 'changed'
+RESULT_UNCHANGED = 'unchanged'
+RESULT_ERROR = 'error'
+RESULTS = [RESULT_CHANGED, RESULT_UNCHANGED, RESULT_ERROR]
+
+
+
+
+
+class UpdateScheduler(object):
+  """
+  <Purpose>
+    Schedules a client's update cycles. See the module docstring.
+
+    Each cycle's result is recorded with record_result (or by run, which runs
+    a cycle and records its result), which schedules the next cycle.
+    run_forever runs cycles as scheduled until stopped.
+
+  <Arguments>
+    min_interval   (optional)
+      The interval, in seconds, after a cycle that found something new.
+
+    max_interval   (optional)
+      The greatest interval, in seconds, after cycles that found nothing new
+      or failed.
+
+    campaign_interval   (optional)
+      The interval, in seconds, while an update campaign is active (see
+      set_campaign_active), unless cycles are failing.
+
+    backoff_factor   (optional)
+      The factor (at least 1) by which the interval grows after each cycle
+      that finds nothing new or fails.
+
+    jitter   (optional)
+      The greatest fraction (from 0 to 1) of a delay by which it is randomly
+      lengthened or shortened.
+
+    random_function   (optional)
+      Function returning a random number in [0, 1). Default random.random.
+
+    time_function   (optional)
+      Function returning the current time in seconds. Default time.time.
+
+  <Exceptions>
+    tuf.FormatError if any of the arguments is not correctly formatted or out
+    of range.
+
+  <Fields>
+    self.interval
+      The current interval between cycles, in seconds, before jitter.
+
+    self.campaign_active
+      Whether or not an update campaign is active.
+
+    self.next_run_time
+      When (per time_function) the next cycle is due.
+
+    self.last_result
+      The result of the last cycle (one of RESULTS), or None.
+
+    self.last_error
+      The exception raised by the last cycle, or None if it did not fail.
+
+    self.last_run_time
+      When (per time_function) the last cycle was recorded, or None.
+
+    self.last_duration
+      How long the last cycle run by run() took, in seconds, or None.
+
+    self.runs
+      Number of cycles recorded.
+
+    self.errors
+      Number of cycles that failed.
+
+    self.consecutive_errors
+      Number of cycles that have failed since the last that did not.
+
+  <Methods>
+    record_result(result, error=None)
+    set_campaign_active(active)
+    seconds_until_next_run()
+    get_metrics()
+    run(cycle_function)
+    run_forever(cycle_function, stop_event=None)
+  """
+
+  def __init__(self,
+      min_interval=DEFAULT_MIN_INTERVAL,
+      max_interval=DEFAULT_MAX_INTERVAL,
+      campaign_interval=DEFAULT_CAMPAIGN_INTERVAL,
+      backoff_factor=DEFAULT_BACKOFF_FACTOR,
+      jitter=DEFAULT_JITTER,
+      random_function=random.random,
+      time_function=time.time):
+
+    for name, value in [('min_interval', min_interval),
+        ('max_interval', max_interval),
+        ('campaign_interval', campaign_interval),
+        ('backoff_factor', backoff_factor), ('jitter', jitter)]:
+      if isinstance(value, bool) or not isinstance(value, (int, float)) or \
+          value < 0:
+        raise tuf.FormatError('Expected ' + name + ' to be a non-negative '
+            'number; received ' + repr(value))
+
+    if max_interval < min_interval:
+      raise tuf.FormatError('Expected max_interval (' + repr(max_interval) +
+          ') to be at least min_interval (' + repr(min_interval) + ')')
+    if backoff_factor < 1:
+      raise tuf.FormatError('Expected backoff_factor to be at least 1; '
+          'received ' + repr(backoff_factor))
+    if jitter > 1:
+      raise tuf.FormatError('Expected jitter to be at most 1; received ' +
+          repr(jitter))
+
+    self.min_interval = min_interval
+    self.max_interval = max_interval
+    self.campaign_interval = campaign_interval
+    self.backoff_factor = backoff_factor
+    self.jitter = jitter
+    self._random = random_function
+    self._time = time_function
+
+    self.interval = min_interval
+    self.campaign_active = False
+
+    # The first cycle is due immediately.
+    self.next_run_time = self._time()
+
+    self.last_result = None
+    self.last_error = None
+    self.last_run_time = None
+    self.last_duration = None
+    self.runs = 0
+    self.errors = 0
+    self.consecutive_errors = 0
+
+
+
+
+
+  def record_result(self, result, error=None):
+    """
+    <Purpose>
+      Records the result of an update cycle that has just finished, and
+      schedules the next.
+
+    <Arguments>
+      result
+        One of RESULTS: RESULT_CHANGED if the cycle found something new (e.g.
+        new metadata), RESULT_UNCHANGED if it did not, or RESULT_ERROR if it
+        failed.
+
+      error   (optional)
+        The exception that caused the cycle to fail.
+
+    <Exceptions>
+      tuf.FormatError if result is not one of RESULTS.
+
+    <Returns>
+      The number of seconds until the next cycle.
+    """
+    if result not in RESULTS:
+      raise tuf.FormatError('Expected one of ' + repr(RESULTS) + '; received '
+          + repr(result))
+
+    now = self._time()
+
+    self.runs += 1
+    self.last_result = result
+    self.last_error = error
+    self.last_run_time = now
+
+    if result == RESULT_ERROR:
+      self.errors += 1
+      self.consecutive_errors += 1
+      self.interval = self._backed_off_interval()
+
+    else:
+      self.consecutive_errors = 0
+
+      if self.campaign_active:
+        self.interval = self.campaign_interval
+      elif result == RESULT_CHANGED:
+        self.interval = self.min_interval
+      else:
+        self.interval = self._backed_off_interval()
+
+    delay = self._jittered(self.interval)
+    self.next_run_time = now + delay
+
+    return delay
+
+
+
+
+
+  def set_campaign_active(self, active):
+    """
+    Notes whether or not an update campaign is active. When a campaign
+    starts, the next cycle is brought forward to within campaign_interval.
+    """
+    tuf.formats.BOOLEAN_SCHEMA.check_match(active)
+
+    if active and not self.campaign_active:
+      self.interval = min(self.interval, self.campaign_interval)
+      self.next_run_time = min(
+          self.next_run_time, self._time() + self._jittered(self.interval))
+
+    self.campaign_active = active
+
+
+
+
+
+  def seconds_until_next_run(self):
+    """Returns the number of seconds until the next cycle is due (at least 0)."""
+    return max(0.0, self.next_run_time - self._time())
+
+
+
+
+
+  def get_metrics(self):
+    """
+    Returns a dictionary of the scheduler's current state and of the results
+    of the cycles it has recorded:
+      'next_run_time', 'seconds_until_next_run', 'interval', 'campaign_active',
+      'last_result', 'last_error' (a string, or None), 'last_run_time',
+      'last_duration', 'runs', 'errors', and 'consecutive_errors'.
+    """
+    return {
+        'next_run_time': self.next_run_time,
+        'seconds_until_next_run': self.seconds_until_next_run(),
+        'interval': self.interval,
+        'campaign_active': self.campaign_active,
+        'last_result': self.last_result,
+        'last_error':
+            None if self.last_error is None else repr(self.last_error),
+        'last_run_time': self.last_run_time,
+        'last_duration': self.last_duration,
+        'runs': self.runs,
+        'errors': self.errors,
+        'consecutive_errors': self.consecutive_errors}
+
+
+
+
+
+  def run(self, cycle_function):
+    """
+    <Purpose>
+      Runs one update cycle now by calling cycle_function, and records its
+      result: RESULT_CHANGED if cycle_function returns a true value,
+      RESULT_UNCHANGED if it returns a false value, and RESULT_ERROR if it
+      raises an exception (which is logged, not raised).
+
+    <Returns>
+      The result recorded.
+    """
+    start_time = self._time()
+
+    try:
+      changed = cycle_function()
+
+    except Exception as e:
+      self.last_duration = self._time() - start_time
+      log.warning('Update cycle failed: ' + repr(e))
+      delay = self.record_result(RESULT_ERROR, e)
+      result = RESULT_ERROR
+
+    else:
+      self.last_duration = self._time() - start_time
+      result = RESULT_CHANGED if changed else RESULT_UNCHANGED
+      delay = self.record_result(result)
+
+    log.debug('Update cycle result: ' + result + '. Next cycle in ' +
+        '%.2f' % delay + ' seconds.')
+
+    return result
+
+
+
+
+
+  def run_forever(self, cycle_function, stop_event=None):
+    """
+    Runs update cycles (see run) as scheduled, until stop_event (a
+    threading.Event), if provided, is set.
+    """
+    if stop_event is None:
+      stop_event = threading.Event()
+
+    while not stop_event.is_set():
+      delay = self.seconds_until_next_run()
+      if delay > 0:
+        # Wakes early if stop_event is set.
+        stop_event.wait(delay)
+        continue
+
+      self.run(cycle_function)
+
+
+
+
+
+  def _backed_off_interval(self):
+    return min(self.max_interval,
+        max(self.interval, self.min_interval) * self.backoff_factor)
+
+
+
+
+
+  def _jittered(self, interval):
+    return max(0.0,
+        interval * (1 + self.jitter * (2 * self._random() - 1)))
@@ -37,6 +37,7 @@ import tuf.repository_tool as rt
 
 import uptane.formats
 import uptane.common
+import uptane.instrumentation as instrumentation
 import uptane.encoding.asn1_codec as asn1_codec
 
 from uptane.encoding.asn1_codec import DATATYPE_TIME_ATTESTATION
@@ -46,10 +47,7 @@ from uptane.encoding.asn1_codec import DATATYPE_VEHICLE_MANIFEST
 from uptane import GREEN, RED, YELLOW, ENDCOLORS
 
 
-log = uptane.logging.getLogger('secondary')
-log.addHandler(uptane.file_handler)
-log.addHandler(uptane.console_handler)
-log.setLevel(uptane.logging.DEBUG)
+log = uptane.logging.getLogger('uptane.secondary')
 
 
 
@@ -132,9 +130,12 @@ class Secondary(object):
       The latest nonce this ECU sent to the Timeserver (via the Primary).
 
     self.all_valid_timeserver_times:
-      A list of all times extracted from all Timeserver attestations that have
-      been validated by validate_time_attestation.
-      Items are appended to the end.
+      The most recent times extracted from Timeserver attestations that have
+      been validated by validate_time_attestation, in an
+      uptane.common.BoundedHistory. Items are appended to the end, and only
+      the most recent few (time_history_capacity, at least two) are retained.
+      If a time_audit_log_fname was provided, every validated time is also
+      written to that file.
 
     self.validated_targets_for_this_ecu:
       A list of the targets validated for this ECU, populated in method
@@ -178,7 +179,9 @@ class Secondary(object):
     timeserver_public_key,
     firmware_fileinfo=None,
     director_public_key=None,
-    partial_verifying=False):
+    partial_verifying=False,
+    time_history_capacity=uptane.common.DEFAULT_TIME_HISTORY_CAPACITY,
+    time_audit_log_fname=None):
 
     """
     <Purpose>
@@ -211,6 +214,15 @@ class Secondary(object):
         value, which will be provided in ECU Manifests generated for the
         Director's consumption until the firmware is updated.
 
+      time_history_capacity (optional)
+        The number of validated Timeserver times to retain in memory. ECU
+        Manifests list the current and previous times, so this must be at
+        least 2. Default uptane.common.DEFAULT_TIME_HISTORY_CAPACITY.
+
+      time_audit_log_fname (optional)
+        If provided, the name of a file to which every validated Timeserver
+        time is appended. See uptane.common.BoundedHistory.
+
 
     <Exceptions>
 
@@ -223,6 +235,7 @@ class Secondary(object):
            partial_verifying False requires no director_public_key)
         if director_repo_name is not a known repository based on the
         map/pinning file (pinned.json)
+        if time_history_capacity is less than 2
 
     <Side Effects>
       None.
@@ -238,6 +251,7 @@ class Secondary(object):
     tuf.formats.ANYKEY_SCHEMA.check_match(ecu_key)
     if director_public_key is not None:
         tuf.formats.ANYKEY_SCHEMA.check_match(director_public_key)
+    tuf.formats.LENGTH_SCHEMA.check_match(time_history_capacity)
 
     self.director_repo_name = director_repo_name
     self.ecu_key = ecu_key
@@ -260,6 +274,11 @@ class Secondary(object):
           'key was not provided. Partial verification Secondaries validate '
           'only the ')
 
+    if time_history_capacity < 2:
+      raise uptane.Error('Secondary must retain at least two Timeserver times '
+          '(the current and previous times listed in ECU Manifests), but was '
+          'given a time_history_capacity of ' + repr(time_history_capacity))
+
 
     # Create a TAP-4-compliant updater object. This will read pinned.json
     # and create single-repository updaters within it to handle connections to
@@ -271,7 +290,9 @@ class Secondary(object):
           'known repository, according to the pinned metadata from pinned.json')
 
     # We load the given time twice for simplicity in later code.
-    self.all_valid_timeserver_times = [time, time]
+    self.all_valid_timeserver_times = uptane.common.BoundedHistory(
+        time_history_capacity, initial_items=[time, time],
+        audit_log_fname=time_audit_log_fname)
 
     self.last_nonce_sent = None
     self.nonce_next = self._create_nonce()
@@ -325,6 +346,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.sign_ecu_manifest')
   def generate_signed_ecu_manifest(self, description_of_attacks_observed=''):
     """
     Returns a signed ECU manifest indicating self.firmware_fileinfo.
@@ -382,6 +404,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.validate_time_attestation')
   def validate_time_attestation(self, timeserver_attestation):
     """
     Given a timeserver attestation, validate it (checking that the signature is
@@ -451,6 +474,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.validate_metadata')
   def fully_validate_metadata(self):
     """
     Treats the unvalidated metadata obtained from the Primary (which the
@@ -547,6 +571,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.process_metadata')
   def process_metadata(self, metadata_archive_fname):
     """
     Expand the metadata archive using _expand_metadata_archive()
@@ -566,6 +591,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.expand_metadata_archive')
   def _expand_metadata_archive(self, metadata_archive_fname):
     """
     Given the filename of an archive of metadata files validated and zipped by
@@ -593,6 +619,7 @@ class Secondary(object):
 
 
 
+  @instrumentation.timed('secondary.validate_image')
   def validate_image(self, image_fname):
     """
     Determines if the image with filename provided matches the expected file
@@ -681,6 +708,7 @@ class Secondary(object):
 
     # If no error has been raised at this point, the image file is fully
     # validated and we can return.
-    log.debug('Delivered target file has been fully validated: ' +
-        repr(full_image_fname))
+    if log.isEnabledFor(uptane.logging.DEBUG):
+      log.debug('Delivered target file has been fully validated: ' +
+          repr(full_image_fname))
 
@@ -8,11 +8,16 @@ from __future__ import unicode_literals
 import uptane # Import before TUF modules; may change tuf.conf values.
 import tuf
 import tuf.formats
+import tuf.conf
 import json
 import os
 import shutil
 import copy
 import hashlib
+import collections # for BoundedHistory
+import time # for BoundedHistory audit log entries
+import contextlib # for use_fileinfo_cache
+import binascii # for the ed25519 key cache
 
 # TODO: This import is not ideal at this level. Common should probably not
 # import anything from other Uptane modules. Consider putting the
@@ -20,12 +25,155 @@ import hashlib
 # imports asn1_codec.
 import uptane.encoding.asn1_codec as asn1_codec
 import uptane.formats
+import uptane.instrumentation as instrumentation
 
 # Both key types below are supported, but issues may be encountered with RSA
 # if tuf.conf.METADATA_FORMAT is 'der' (rather than 'json').
 # TODO: Ensure RSA support in ASN.1/DER conversion.
 SUPPORTED_KEY_TYPES = ['ed25519', 'rsa']
 
+# The number of validated Timeserver times (and attestations) that Primaries
+# and Secondaries retain in memory by default. ECU Manifests list the current
+# and previous times, so two suffice. See BoundedHistory.
+DEFAULT_TIME_HISTORY_CAPACITY = 2
+
+# The greatest number of keys of each kind (signing and verifying) whose
+# parsed key objects are kept by the key cache below before it is emptied.
+# Directors verify with one key per ECU, so this should exceed the number of
+# ECUs a Director expects to hear from regularly.
+MAX_CACHED_KEYS = 4096
+
+# The key cache: keyid -> (key material, parsed key object). ed25519 keys are
+# parsed into PyNaCl key objects once, rather than tuf.keys decoding the key
+# material again for every signature. The key material is kept to be compared
+# against the key dictionary on every lookup, so that a different key listed
+# under the same keyid is never mistaken for the cached one. RSA keys are still
+# handled by tuf.keys, which chooses the library and signature scheme to use
+# based on tuf.conf.
+_signing_keys = {}
+_verify_keys = {}
+
+# PyNaCl's signing and exceptions modules, imported on first use. False if
+# PyNaCl is not available, in which case all keys are left to tuf.keys.
+_nacl_signing = None
+_nacl_exceptions = None
+
+# The length of ed25519 keys (public keys and private seeds) in hex.
+_ED25519_KEY_HEX_LENGTH = 64
+
+# The length of ed25519 signatures in hex.
+_ED25519_SIG_HEX_LENGTH = 128
+
+
+
+
+
+def clear_key_cache():
+  """
+  Empties the cache of parsed key objects used by sign_over_metadata and
+  verify_signature_over_metadata.
+  """
+  _signing_keys.clear()
+  _verify_keys.clear()
+
+
+
+
+
+def _get_nacl_signing():
+  global _nacl_signing, _nacl_exceptions
+  if _nacl_signing is None:
+    try:
+      import nacl.signing
+      import nacl.exceptions
+    except ImportError: # pragma: no cover
+      _nacl_signing = _nacl_exceptions = False
+    else:
+      _nacl_signing = nacl.signing
+      _nacl_exceptions = nacl.exceptions
+  return _nacl_signing
+
+
+
+
+
+def _get_cached_key(cache, keyid, key_material, parse):
+  """
+  Returns the parsed key object for the given keyid and key material from the
+  given cache, calling parse(key_material) to create and cache it if it is not
+  already there.
+  """
+  cached = cache.get(keyid)
+  if cached is not None and cached[0] == key_material:
+    return cached[1]
+
+  key_object = parse(key_material)
+  if len(cache) >= MAX_CACHED_KEYS:
+    cache.clear()
+  cache[keyid] = (key_material, key_object)
+  return key_object
+
+
+
+
+
+def _create_signature(key_dict, data):
+  """
+  Equivalent to tuf.keys.create_signature(key_dict, data), using a cached
+  PyNaCl signing key for ed25519 keys. ed25519 signatures are deterministic,
+  so the result is the same. Other keys, and ed25519 keys with malformed
+  private keys (for which tuf.keys raises the appropriate errors), are passed
+  to tuf.keys.
+  """
+  nacl_signing = _get_nacl_signing()
+
+  if not nacl_signing or key_dict['keytype'] != 'ed25519' or \
+      len(key_dict['keyval']['private']) != _ED25519_KEY_HEX_LENGTH:
+    return tuf.keys.create_signature(key_dict, data)
+
+  signing_key = _get_cached_key(_signing_keys, key_dict['keyid'],
+      key_dict['keyval']['private'],
+      lambda private: nacl_signing.SigningKey(binascii.unhexlify(private)))
+
+  return {
+      'keyid': key_dict['keyid'],
+      'method': 'ed25519',
+      'sig': binascii.hexlify(signing_key.sign(data).signature).decode('utf-8')}
+
+
+
+
+
+def _verify_signature(key_dict, signature, data):
+  """
+  Equivalent to tuf.keys.verify_signature(key_dict, signature, data), using a
+  cached PyNaCl verify key for well-formed ed25519 signatures from ed25519
+  keys. Anything else, including malformed keys and signatures (for which
+  tuf.keys raises the appropriate errors), is passed to tuf.keys.
+  """
+  nacl_signing = _get_nacl_signing()
+
+  if not nacl_signing or key_dict['keytype'] != 'ed25519' or \
+      signature['method'] != 'ed25519' or \
+      len(key_dict['keyval']['public']) != _ED25519_KEY_HEX_LENGTH or \
+      len(signature['sig']) != _ED25519_SIG_HEX_LENGTH:
+    return tuf.keys.verify_signature(key_dict, signature, data)
+
+  verify_key = _get_cached_key(_verify_keys, key_dict['keyid'],
+      key_dict['keyval']['public'],
+      lambda public: nacl_signing.VerifyKey(binascii.unhexlify(public)))
+
+  try:
+    verify_key.verify(data, binascii.unhexlify(signature['sig']))
+  except _nacl_exceptions.BadSignatureError:
+    return False
+
+  return True
+
+
+
+
+
 def sign_signable(
   signable, keys_to_sign_with, datatype,
   metadata_format=tuf.conf.METADATA_FORMAT):
@@ -140,6 +288,7 @@ def sign_signable(
 
 
 
+@instrumentation.timed('signature.sign')
 def sign_over_metadata(
     key_dict, data, datatype, metadata_format=tuf.conf.METADATA_FORMAT):
   """
@@ -243,6 +392,9 @@ def sign_over_metadata(
     verification. When in 'der' mode, argument data is converted into ASN.1/DER
     in order to verify it. (Argument object is unchanged.)
 
+    For ed25519 keys, PyNaCl is used directly if available, and the parsed key
+    is kept in the key cache (see clear_key_cache()).
+
   <Returns>
     A signature dictionary conformant to 'tuf.format.SIGNATURE_SCHEMA'. e.g.:
     {'keyid': 'f30a0870d026980100c0573bd557394f8c1bbd6...',
@@ -271,12 +423,13 @@ def sign_over_metadata(
         '; the supported formats are: "der" and "json".')
 
 
-  return tuf.keys.create_signature(key_dict, data)
+  return _create_signature(key_dict, data)
 
 
 
 
 
+@instrumentation.timed('signature.verify')
 def verify_signature_over_metadata(
     key_dict, signature, data, datatype,
     metadata_format=tuf.conf.METADATA_FORMAT):
@@ -376,6 +529,9 @@ def verify_signature_over_metadata(
     verification. When in 'der' mode, argument data is converted into ASN.1/DER
     in order to verify it. (Argument object is unchanged.)
 
+    For ed25519 keys, PyNaCl is used directly if available, and the parsed key
+    is kept in the key cache (see clear_key_cache()).
+
   <Returns>
     Boolean.  True if the signature is valid, False otherwise.
   """
@@ -401,7 +557,7 @@ def verify_signature_over_metadata(
         '; the supported formats are: "der" and "json".')
 
 
-  return tuf.keys.verify_signature(key_dict, signature, data)
+  return _verify_signature(key_dict, signature, data)
 
 
 
@@ -546,3 +702,371 @@ def scrub_filename(fname, expected_containing_dir):
         'Filename was: ' + fname)
 
   return abs_fname
+
+
+
+
+
+class BoundedHistory(object):
+  """
+  <Purpose>
+    A fixed-capacity, append-only history (a ring buffer), used by Primaries
+    and Secondaries to retain the most recent validated Timeserver times and
+    attestations without accumulating every one they have ever received.
+
+    Once the history is full, appending an item discards the oldest item.
+    Items are indexed as in a list, so history[-1] is the most recent item and
+    history[-2] the one before it.
+
+    If an audit log filename is provided, every appended item is also written
+    to that file, one JSON object per line, along with the (local) time at
+    which it was recorded. The audit log is never read back, so its size does
+    not affect memory use.
+
+  <Fields>
+
+    self.capacity
+      The maximum number of items retained in memory.
+
+    self.audit_log_fname
+      The name of the file to which appended items are written, or None.
+
+  <Use>
+    times = BoundedHistory(capacity=2, initial_items=[t0])
+    times.append(t1)
+    times.append(t2)    # t0 is discarded
+    times[-1], times[-2]   # t2, t1
+  """
+
+  def __init__(self, capacity, initial_items=None, audit_log_fname=None):
+
+    tuf.formats.LENGTH_SCHEMA.check_match(capacity)
+    if capacity < 1:
+      raise tuf.FormatError('The capacity of a BoundedHistory must be at '
+          'least 1. Given: ' + repr(capacity))
+
+    if audit_log_fname is not None:
+      tuf.formats.PATH_SCHEMA.check_match(audit_log_fname)
+
+    self.capacity = capacity
+    self.audit_log_fname = audit_log_fname
+    self._items = collections.deque(maxlen=capacity)
+
+    # Initial items are not written to the audit log: they were not received
+    # and validated, merely provided (e.g. an initial clock value).
+    if initial_items is not None:
+      self._items.extend(initial_items)
+
+
+
+
+
+  def append(self, item):
+    """
+    Adds an item to the end of the history, discarding the oldest item if the
+    history is full, and writes it to the audit log if there is one.
+    Items to be written to the audit log must be JSON-compatible.
+    """
+    self._items.append(item)
+
+    if self.audit_log_fname is not None:
+      with open(self.audit_log_fname, 'a') as fobj:
+        fobj.write(json.dumps(
+            {'recorded': time.time(), 'item': item}, sort_keys=True) + '\n')
+
+
+
+
+
+  def __getitem__(self, index):
+    # deque supports integer indexing (including negative indices) but not
+    # slices, so slices produce a list instead.
+    if isinstance(index, slice):
+      return list(self._items)[index]
+    return self._items[index]
+
+
+
+  def __len__(self):
+    return len(self._items)
+
+
+
+  def __iter__(self):
+    return iter(self._items)
+
+
+
+  def __eq__(self, other):
+    return list(self._items) == list(other)
+
+
+
+  def __ne__(self, other):
+    return not self == other
+
+
+
+  def __repr__(self):
+    return 'BoundedHistory(' + repr(list(self._items)) + ')'
+
+
+
+
+
+class FileinfoCache(object):
+  """
+  <Purpose>
+    Remembers the length and hashes of files (e.g. target images), so that
+    adding the same file to many repositories, or writing a repository's
+    metadata again, does not require reading the file again each time.
+
+    Entries are keyed by the file's device, inode, size, and modification time
+    (to the nanosecond, where the platform provides it), so an entry is used
+    only while the file is unchanged. The path is deliberately not part of the
+    key: hard links to the same file (e.g. the same image linked into many
+    vehicle repositories' targets directories) share one entry. Any change to
+    a file's contents changes its size or modification time, and replacing a
+    file gives it a new inode.
+
+    A copy of a file is a new inode, so it would not share the original's
+    entry. Files should therefore be copied with copy_file, which hashes the
+    data as it copies it and so adds an entry for the copy (and the
+    original) without reading the file again.
+
+    Each entry also records the path at which it was made. When the cache is
+    saved, entries whose path no longer refers to the same unchanged file are
+    dropped, so that entries for deleted or replaced files do not accumulate.
+    (If that path was removed but another hard link to the file remains, the
+    file is simply hashed again when next needed.)
+
+    If a cache filename is given, entries are loaded from that file, and
+    save() writes them back to it (as JSON), so that the cache persists
+    across processes and restarts.
+
+  <Fields>
+    self.cache_fname
+      The name of the file in which entries persist, or None.
+
+    self.hash_algorithms
+      The hash algorithms used, defaulting to
+      tuf.conf.REPOSITORY_HASH_ALGORITHMS, so that the file information
+      produced matches what TUF would compute itself.
+
+    self.hits, self.misses
+      Counts of the times get_fileinfo found, or did not find, an entry.
+
+  <Methods>
+    get_fileinfo(filepath, custom=None)
+    copy_file(source_filepath, destination_filepath)
+    save()
+  """
+
+  def __init__(self, cache_fname=None, hash_algorithms=None):
+
+    if cache_fname is not None:
+      tuf.formats.PATH_SCHEMA.check_match(cache_fname)
+
+    if hash_algorithms is None:
+      hash_algorithms = tuf.conf.REPOSITORY_HASH_ALGORITHMS
+
+    self.cache_fname = cache_fname
+    self.hash_algorithms = list(hash_algorithms)
+    self.hits = 0
+    self.misses = 0
+
+    # Key string -> {'length': ..., 'hashes': {...}, 'path': ...}
+    self._entries = {}
+    self._modified = False
+
+    if cache_fname is not None and os.path.exists(cache_fname):
+      with open(cache_fname, 'r') as fobj:
+        cached = json.load(fobj)
+      # Entries made with different hash algorithms are of no use.
+      if cached.get('hash_algorithms') == self.hash_algorithms:
+        self._entries = cached['entries']
+
+
+
+
+
+  def get_fileinfo(self, filepath, custom=None):
+    """
+    Returns file information for the given file, conforming to
+    tuf.formats.FILEINFO_SCHEMA, including the given custom data (if any),
+    computing its length and hashes only if they are not already cached.
+
+    Raises tuf.Error if the file does not exist.
+    """
+    tuf.formats.PATH_SCHEMA.check_match(filepath)
+
+    if not os.path.isfile(filepath):
+      raise tuf.Error(repr(filepath) + ' is not a file.')
+
+    key = self._key(os.stat(filepath))
+    entry = self._entries.get(key)
+
+    if entry is not None:
+      self.hits += 1
+
+    else:
+      self.misses += 1
+      with open(filepath, 'rb') as fobj:
+        entry = self._hash_chunks(iter(lambda: fobj.read(65536), b''))
+      self._add_entry(key, entry, filepath)
+
+    return tuf.formats.make_fileinfo(
+        entry['length'], dict(entry['hashes']), custom=custom)
+
+
+
+
+
+  def copy_file(self, source_filepath, destination_filepath):
+    """
+    Copies the file at source_filepath to destination_filepath, along with its
+    permissions and modification time (as shutil.copy2 does), and adds
+    entries for both files, so that neither need be read again by
+    get_fileinfo. The file's length and hashes are computed from the data as
+    it is copied.
+
+    Raises tuf.Error if the source file does not exist.
+    """
+    tuf.formats.PATH_SCHEMA.check_match(source_filepath)
+    tuf.formats.PATH_SCHEMA.check_match(destination_filepath)
+
+    if not os.path.isfile(source_filepath):
+      raise tuf.Error(repr(source_filepath) + ' is not a file.')
+
+    source_key = self._key(os.stat(source_filepath))
+
+    def copied_chunks(source_fobj, destination_fobj):
+      for chunk in iter(lambda: source_fobj.read(65536), b''):
+        destination_fobj.write(chunk)
+        yield chunk
+
+    with open(source_filepath, 'rb') as source_fobj:
+      with open(destination_filepath, 'wb') as destination_fobj:
+        entry = self._hash_chunks(copied_chunks(source_fobj, destination_fobj))
+    shutil.copystat(source_filepath, destination_filepath)
+
+    self._add_entry(
+        self._key(os.stat(destination_filepath)), entry, destination_filepath)
+
+    # The source's entry is only valid if it did not change during the copy.
+    if self._key(os.stat(source_filepath)) == source_key:
+      self._add_entry(source_key, entry, source_filepath)
+
+
+
+
+
+  def save(self):
+    """
+    Drops entries for files that no longer exist or have changed (see the
+    class docstring), then writes the cache to self.cache_fname (atomically,
+    via a temporary file), if there is one and its entries have changed since
+    it was loaded or saved.
+    """
+    if self.cache_fname is None:
+      return
+
+    for key, entry in list(self._entries.items()):
+      path = entry.get('path')
+      if path is None or not os.path.isfile(path) or \
+          self._key(os.stat(path)) != key:
+        del self._entries[key]
+        self._modified = True
+
+    if not self._modified:
+      return
+
+    temp_fname = self.cache_fname + '.' + str(os.getpid()) + '.tmp'
+    with open(temp_fname, 'w') as fobj:
+      json.dump({'hash_algorithms': self.hash_algorithms,
+          'entries': self._entries}, fobj)
+    os.rename(temp_fname, self.cache_fname)
+
+    self._modified = False
+
+
+
+
+
+  def _hash_chunks(self, chunks):
+    """
+    Returns a new entry (without a path) for the file whose data is the
+    concatenation of the given chunks.
+    """
+    digest_objects = [hashlib.new(algorithm)
+        for algorithm in self.hash_algorithms]
+    length = 0
+    for chunk in chunks:
+      length += len(chunk)
+      for digest_object in digest_objects:
+        digest_object.update(chunk)
+
+    return {'length': length, 'hashes': dict(
+        (algorithm, digest_object.hexdigest()) for algorithm, digest_object
+        in zip(self.hash_algorithms, digest_objects))}
+
+
+
+
+
+  def _add_entry(self, key, entry, filepath):
+    entry = dict(entry, path=os.path.abspath(filepath))
+    if self._entries.get(key) != entry:
+      self._entries[key] = entry
+      self._modified = True
+
+
+
+
+
+  def _key(self, stat_result):
+    mtime = getattr(stat_result, 'st_mtime_ns', None) # Not in Python 2
+    if mtime is None:
+      mtime = repr(stat_result.st_mtime)
+    return '{0}:{1}:{2}:{3}'.format(stat_result.st_dev, stat_result.st_ino,
+        stat_result.st_size, mtime)
+
+
+
+
+
+@contextlib.contextmanager
+def use_fileinfo_cache(fileinfo_cache, targets_directory):
+  """
+  <Purpose>
+    Context manager: while active, when TUF's repository tool computes file
+    information for files in the given targets directory (as it does for every
+    target each time targets metadata is written), the information is taken
+    from the given FileinfoCache instead. Other files (i.e. metadata files,
+    which change with every write) are handled by TUF as usual. On exit, the
+    cache is saved.
+
+    This replaces tuf.repository_lib.get_metadata_fileinfo while active, so it
+    must not be used concurrently by multiple threads.
+
+  <Use>
+    with uptane.common.use_fileinfo_cache(cache, repo_dir + '/targets'):
+      repository.write()
+  """
+  import tuf.repository_lib as repo_lib
+
+  targets_directory = os.path.abspath(targets_directory) + os.sep
+  original_get_metadata_fileinfo = repo_lib.get_metadata_fileinfo
+
+  def get_metadata_fileinfo(filename, custom=None):
+    if os.path.abspath(filename).startswith(targets_directory):
+      return fileinfo_cache.get_fileinfo(filename, custom)
+    return original_get_metadata_fileinfo(filename, custom)
+
+  repo_lib.get_metadata_fileinfo = get_metadata_fileinfo
+  try:
+    yield fileinfo_cache
+
+  finally:
+    repo_lib.get_metadata_fileinfo = original_get_metadata_fileinfo
+    fileinfo_cache.save()
@@ -22,8 +22,11 @@ import tuf
 import tuf.conf
 import tuf.formats
 import uptane.formats
+import uptane.instrumentation as instrumentation
 import logging
 import hashlib
+import binascii
+import importlib
 
 logger = logging.getLogger('uptane.asn1_codec')
 
@@ -31,7 +34,72 @@ DATATYPE_TIME_ATTESTATION = 'type__time_attestation'
 DATATYPE_ECU_MANIFEST = 'type__ecu_manifest'
 DATATYPE_VEHICLE_MANIFEST = 'type__vehicle_manifest'
 
+# The modules that convert each type of metadata between ASN.1 and JSON,
+# keyed by metadata type.
+_ASN1_METADATA_MODULE_NAMES = {
+    DATATYPE_TIME_ATTESTATION: 'uptane.encoding.timeserver_asn1_coder',
+    DATATYPE_ECU_MANIFEST: 'uptane.encoding.ecu_manifest_asn1_coder',
+    DATATYPE_VEHICLE_MANIFEST: 'uptane.encoding.vehicle_manifest_asn1_coder'}
+
+# This maps metadata type to the module that lays out the ASN.1 format for
+# that type. Importing those modules builds every class in asn1_definitions,
+# which makes up most of the time taken to import Uptane, so they (and the
+# pyasn1 codec modules below) are only imported, by _load_asn1_modules(), the
+# first time metadata is converted. Until then, this is empty.
+SUPPORTED_ASN1_METADATA_MODULES = {}
+
+# pyasn1 modules and the ASN.1 data specification module, set by
+# _load_asn1_modules().
+p_der_encoder = None
+p_der_decoder = None
+p_type_tag = None
+p_type_univ = None
+asn1_spec = None
+
+# Prebuilt, subtyped templates for the parts of signatures that
+# convert_signatures_to_asn() builds for every signature, set by
+# _load_asn1_modules(). Each call to subtype() builds a new tag set as well as
+# a new object; cloning a template builds only the object.
+_signatures_template = None
+_keyid_template = None
+_sig_value_template = None
+_octet_string_template = None
+
 try:
+  # Only the top-level package is imported here, to check that pyasn1 is
+  # available.
+  import pyasn1
+
+except ImportError:
+  logger.warning('Minor: pyasn1 library not found. Proceeding using JSON only.')
+  PYASN1_EXISTS = False
+
+else:
+  PYASN1_EXISTS = True
+
+
+
+
+
+def _load_asn1_modules():
+  """
+  Imports the pyasn1 codec modules and the ASN.1 data specification modules
+  that convert ASN.1 to JSON and back, and fills in
+  SUPPORTED_ASN1_METADATA_MODULES, if that has not already been done.
+  """
+  global p_der_encoder
+  global p_der_decoder
+  global p_type_tag
+  global p_type_univ
+  global asn1_spec
+  global _signatures_template
+  global _keyid_template
+  global _sig_value_template
+  global _octet_string_template
+
+  if SUPPORTED_ASN1_METADATA_MODULES:
+    return
+
   # pyasn1 modules
   import pyasn1.codec.der.encoder as p_der_encoder
   import pyasn1.codec.der.decoder as p_der_decoder
@@ -40,42 +108,45 @@ try:
   import pyasn1.error
 
   # ASN.1 data specification modules that convert ASN.1 to JSON and back.
-  import uptane.encoding.timeserver_asn1_coder as timeserver_asn1_coder
-  import uptane.encoding.ecu_manifest_asn1_coder as ecu_manifest_asn1_coder
-  import uptane.encoding.vehicle_manifest_asn1_coder as vehicle_manifest_asn1_coder
   import uptane.encoding.asn1_definitions as asn1_spec
 
-  # This maps metadata type to the module that lays out the
-  # ASN.1 format for that type.
-  SUPPORTED_ASN1_METADATA_MODULES = {
-      DATATYPE_TIME_ATTESTATION: timeserver_asn1_coder,
-      DATATYPE_ECU_MANIFEST: ecu_manifest_asn1_coder,
-      DATATYPE_VEHICLE_MANIFEST: vehicle_manifest_asn1_coder}
+  _signatures_template = asn1_spec.Signatures().subtype(
+      implicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
+      p_type_tag.tagFormatSimple, 2))
+  _keyid_template = asn1_spec.Keyid().subtype(
+      explicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
+      p_type_tag.tagFormatConstructed, 0))
+  _sig_value_template = asn1_spec.BinaryData().subtype(
+      explicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
+      p_type_tag.tagFormatConstructed, 2))
+  _octet_string_template = p_type_univ.OctetString().subtype(
+      implicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
+      p_type_tag.tagFormatSimple, 1))
 
+  modules = dict(
+      (datatype, importlib.import_module(module_name))
+      for datatype, module_name in _ASN1_METADATA_MODULE_NAMES.items())
 
-except ImportError:
-  logger.warning('Minor: pyasn1 library not found. Proceeding using JSON only.')
-  PYASN1_EXISTS = False
-
-else:
-  PYASN1_EXISTS = True
+  # Filled in last: once it is not empty, everything above has been imported.
+  SUPPORTED_ASN1_METADATA_MODULES.update(modules)
 
 
 
 
 
 def ensure_valid_metadata_type_for_asn1(metadata_type):
-  if metadata_type not in SUPPORTED_ASN1_METADATA_MODULES:
+  if metadata_type not in _ASN1_METADATA_MODULE_NAMES:
     # TODO: Choose/make better exception class.
     raise uptane.Error('This is not one of the metadata types configured for '
         'translation from JSON to DER-encoded ASN1. Type of given metadata: ' +
         repr(metadata_type) + '; types accepted: ' +
-        repr(list(SUPPORTED_ASN1_METADATA_MODULES)))
+        repr(list(_ASN1_METADATA_MODULE_NAMES)))
 
 
 
 
 
+@instrumentation.timed('asn1.der_decode')
 def convert_signed_der_to_dersigned_json(der_data, datatype):
   """
   Convert the given der_data to a Python dictionary representation consistent
@@ -133,6 +204,8 @@ def convert_signed_der_to_dersigned_json(der_data, datatype):
   # translation. (Throw an exception if not.)
   ensure_valid_metadata_type_for_asn1(datatype)
 
+  _load_asn1_modules()
+
 
   # "_signed" here refers to the portion of the metadata that will be signed.
   # The metadata is divided into "signed" and "signature" portions. The
@@ -221,6 +294,7 @@ def convert_signed_der_to_dersigned_json(der_data, datatype):
 
 
 
+@instrumentation.timed('asn1.der_encode')
 def convert_signed_metadata_to_der(signed_metadata, datatype,
     private_key=None, resign=False, only_signed=False):
   """
@@ -329,6 +403,8 @@ def convert_signed_metadata_to_der(signed_metadata, datatype,
   # a module exists that translates it to and from an ASN.1 format.
   ensure_valid_metadata_type_for_asn1(datatype)
 
+  _load_asn1_modules()
+
   # Handle for the corresponding module.
   relevant_asn_module = SUPPORTED_ASN1_METADATA_MODULES[datatype]
 
@@ -409,6 +485,8 @@ def convert_signatures_to_json(asn_signatures):
   more familiar TUF and Uptane compliant tuf.formats.SIGNATURES_SCHEMA.
 
   The data contained (the signature values, keyids, and method) are not changed.
+  Keyids and signature values are held as raw bytes in ASN.1, and are
+  hexlified here, as TUF expects.
 
   This is the exact reverse of convert_signatures_to_asn(); providing the
   output of this function as input to that function should reproduce the initial
@@ -418,14 +496,12 @@ def convert_signatures_to_json(asn_signatures):
 
   for asn_signature in asn_signatures:
     json_signatures.append({
-        # Next lines are not ideal: prettyPrint and having to manually skip the
-        # first two characters (which we expect to be '0x' indicating a hex
-        # string). See if there's a better method of converting from the
-        # octetString to what TUF expects.
-        'keyid': asn_signature['keyid']['octetString'].prettyPrint()[2:],
+        'keyid': binascii.hexlify(
+            asn_signature['keyid']['octetString'].asOctets()).decode('ascii'),
         # TODO: See if it's possible to tweak the definition of 'method' so that str(method) returns what we want rather here than the enum, so that we don't have to do make this weird enum translation call?
         'method': asn_signature['method'].namedValues[asn_signature['method']._value][0], #str(asn_signature['method']),
-        'sig': asn_signature['value']['octetString'].prettyPrint()[2:]})
+        'sig': binascii.hexlify(
+            asn_signature['value']['octetString'].asOctets()).decode('ascii')})
 
 
   return json_signatures
@@ -441,12 +517,16 @@ def convert_signatures_to_asn(pydict_signatures):
   that conforms to the uptane.encoding.asn1_definitions.Signatures() class.
 
   The data contained (the signature values, keyids, and method) are not changed.
+  Keyids and signature values are unhexlified here, and held as raw bytes in
+  ASN.1.
 
   This is the exact reverse of convert_signatures_to_json(); providing the
   output of this function as input to that function should reproduce the initial
   input to this function. Also vice versa.
   """
 
+  _load_asn1_modules()
+
   # Create a pyASN.1 object of custom class Signatures, containing some
   # unknown pyasn1 sorcery to specify types.
   # Because this Signatures() object is going to be a member of the Metadata()
@@ -454,9 +534,9 @@ def convert_signatures_to_asn(pydict_signatures):
   # expected by the parent object that must contain it.
   # The following documents tagging in pyasn1:
   #   http://www.red-bean.com/doc/python-pyasn1/pyasn1-tutorial.html#1.2
-  asn_signatures_list = asn1_spec.Signatures().subtype(
-      implicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
-      p_type_tag.tagFormatSimple, 2))
+  # The subtyped types used here are built once, in _load_asn1_modules(), and
+  # cloned for each signature.
+  asn_signatures_list = _signatures_template.clone()
 
   # Now convert each Python dictionary-style signature into an ASN.1 signature
   # and stick those into the ASN.1 list just created.
@@ -475,12 +555,9 @@ def convert_signatures_to_asn(pydict_signatures):
     # to use a class that inherits from that auto-generated class... but that's
     # quite confusing to a reader, too.
     # asn_sig['keyid'] = pydict_sig['keyid'] # <- used to just be this
-    asn_sig['keyid'] = asn1_spec.Keyid().subtype(
-        explicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
-        p_type_tag.tagFormatConstructed, 0))
-    asn_sig['keyid']['octetString'] = p_type_univ.OctetString(
-        hexValue=pydict_sig['keyid']).subtype(implicitTag=p_type_tag.Tag(
-        p_type_tag.tagClassContext, p_type_tag.tagFormatSimple, 1))
+    asn_sig['keyid'] = _keyid_template.clone()
+    asn_sig['keyid']['octetString'] = _octet_string_template.clone(
+        _unhexlify(pydict_sig['keyid']))
 
 
     # Because 'method' is an enum, extracting the string value is a bit messy.
@@ -493,12 +570,9 @@ def convert_signatures_to_asn(pydict_signatures):
     # the way to do this might be to use a class that inherits from that
     # auto-generated class... but that's quite confusing to a reader, too.
     #asn_sig['value'] = pydict_sig['sig'] # <- used to just be this
-    asn_sig['value'] = asn1_spec.BinaryData().subtype(
-        explicitTag=p_type_tag.Tag(p_type_tag.tagClassContext,
-        p_type_tag.tagFormatConstructed, 2))
-    asn_sig['value']['octetString'] = p_type_univ.OctetString(
-        hexValue=pydict_sig['sig']).subtype(implicitTag=p_type_tag.Tag(
-        p_type_tag.tagClassContext, p_type_tag.tagFormatSimple, 1))
+    asn_sig['value'] = _sig_value_template.clone()
+    asn_sig['value']['octetString'] = _octet_string_template.clone(
+        _unhexlify(pydict_sig['sig']))
 
 
     # Add to the Signatures() list.
@@ -506,3 +580,20 @@ def convert_signatures_to_asn(pydict_signatures):
     i += 1
 
   return asn_signatures_list
+
+
+
+
+
+def _unhexlify(hex_string):
+  """
+  Returns the bytes represented by hex_string, for a keyid, signature value or
+  hash digest. Raises uptane.FailedToEncodeASN1DER if it is not an even number
+  of hex digits.
+  """
+  try:
+    return binascii.unhexlify(hex_string)
+
+  except (binascii.Error, TypeError, ValueError) as e:
+    raise uptane.FailedToEncodeASN1DER('Unable to convert ' +
+        repr(hex_string) + ' from hex to bytes: ' + repr(e))
@@ -11,6 +11,8 @@
 <Functions>
   get_asn_signed(pydict_signed)
   get_json_signed(asn_signed)    # TODO: Rename to get_pydict_signed in all mods
+  time_to_seconds(time_string)
+  seconds_to_time(seconds)
 
 """
 from __future__ import print_function
@@ -21,19 +23,97 @@ from pyasn1.type import univ, tag
 from uptane.encoding.asn1_definitions import *
 
 import calendar
-from datetime import datetime
+import binascii
+from datetime import datetime, timedelta
+
+# Subtyped types built once and cloned for each manifest, hash, etc., since
+# subtype() builds a new tag set as well as a new object.
+_SIGNED_TEMPLATE = ECUVersionManifestSigned()\
+                   .subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                tag.tagFormatConstructed, 0))
+_TARGET_TEMPLATE = Target().subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                        tag.tagFormatConstructed,
+                                                        4))
+_HASHES_TEMPLATE = Hashes().subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                        tag.tagFormatSimple, 3))
+_DIGEST_TEMPLATE = BinaryData()\
+                   .subtype(explicitTag=tag.Tag(tag.tagClassContext,
+                                                tag.tagFormatConstructed, 1))
+_OCTET_STRING_TEMPLATE = univ.OctetString()\
+                         .subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                      tag.tagFormatSimple, 1))
+
+# The format of the times in ECU Manifests.
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+_EPOCH = datetime(1970, 1, 1)
+
+# Bounded memos of conversions between times in _TIME_FORMAT and seconds since
+# the epoch, in each direction. The ECU Manifests in a Vehicle Manifest mostly
+# share the same two Timeserver times, so these are usually hit. Each memo is
+# emptied when it reaches _MAX_MEMOIZED_TIMES entries.
+_MAX_MEMOIZED_TIMES = 256
+_seconds_by_time = {}
+_times_by_seconds = {}
+
+
+def _parse_time(time_string):
+  """
+  Returns the number of seconds since the epoch at time_string, a UTC time in
+  _TIME_FORMAT (e.g. '2017-01-01T12:00:00Z'). Fixed-width times are sliced
+  directly; anything else (e.g. unpadded fields) is left to strptime, which
+  also raises ValueError for malformed times.
+  """
+  digits = time_string[0:4] + time_string[5:7] + time_string[8:10] + \
+      time_string[11:13] + time_string[14:16] + time_string[17:19]
+
+  if len(time_string) == 20 and digits.isdigit() and \
+      time_string[4] + time_string[7] + time_string[10] + time_string[13] + \
+      time_string[16] + time_string[19] == '--T::Z':
+    # Constructing the datetime checks the ranges of the fields.
+    delta = datetime(int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+        int(digits[8:10]), int(digits[10:12]), int(digits[12:14])) - _EPOCH
+    return delta.days * 86400 + delta.seconds
+
+  return calendar.timegm(
+      datetime.strptime(time_string, _TIME_FORMAT).timetuple())
+
+
+def time_to_seconds(time_string):
+  """
+  Returns the number of seconds since the epoch at time_string, a UTC time in
+  the format '2017-01-01T12:00:00Z'. Memoized.
+  """
+  seconds = _seconds_by_time.get(time_string)
+  if seconds is None:
+    seconds = _parse_time(time_string)
+    if len(_seconds_by_time) >= _MAX_MEMOIZED_TIMES:
+      _seconds_by_time.clear()
+    _seconds_by_time[time_string] = seconds
+  return seconds
+
+
+def seconds_to_time(seconds):
+  """
+  Returns the UTC time the given number of seconds after the epoch, in the
+  format '2017-01-01T12:00:00Z'. Memoized.
+  """
+  seconds = int(seconds)
+  time_string = _times_by_seconds.get(seconds)
+  if time_string is None:
+    time_string = (_EPOCH + timedelta(seconds=seconds)).isoformat() + 'Z'
+    if len(_times_by_seconds) >= _MAX_MEMOIZED_TIMES:
+      _times_by_seconds.clear()
+    _times_by_seconds[seconds] = time_string
+  return time_string
 
 
 def get_asn_signed(json_signed):
-  signed = ECUVersionManifestSigned()\
-           .subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                        tag.tagFormatConstructed, 0))
+  signed = _SIGNED_TEMPLATE.clone()
 
   signed['ecuIdentifier'] = json_signed['ecu_serial']
-  signed['previousTime'] = calendar.timegm(datetime.strptime(
-      json_signed['previous_timeserver_time'], "%Y-%m-%dT%H:%M:%SZ").timetuple())
-  signed['currentTime'] = calendar.timegm(datetime.strptime(
-      json_signed['timeserver_time'], "%Y-%m-%dT%H:%M:%SZ").timetuple())
+  signed['previousTime'] = time_to_seconds(
+      json_signed['previous_timeserver_time'])
+  signed['currentTime'] = time_to_seconds(json_signed['timeserver_time'])
 
   # Optional bit.
   if 'attacks_detected' in json_signed and json_signed['attacks_detected']:
@@ -42,15 +122,13 @@ def get_asn_signed(json_signed):
            'attacks_detected cannot be an empty string!'
     signed['securityAttack'] = attacks_detected
 
-  target = Target().subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                                tag.tagFormatConstructed, 4))
+  target = _TARGET_TEMPLATE.clone()
   filename = json_signed['installed_image']['filepath']
   filemeta = json_signed['installed_image']['fileinfo']
   target['filename'] = filename
   target['length'] = filemeta['length']
 
-  hashes = Hashes().subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                                tag.tagFormatSimple, 3))
+  hashes = _HASHES_TEMPLATE.clone()
   numberOfHashes = 0
 
   # We're going to generate a list of hashes from the dictionary of hashes.
@@ -59,16 +137,17 @@ def get_asn_signed(json_signed):
   # We have to make the order deterministic.
   sorted_hash_functions = sorted(filemeta['hashes'])
 
+  # Imported here, as asn1_codec imports this module.
+  import uptane.encoding.asn1_codec as asn1_codec
+
   for hash_function in sorted_hash_functions:
     hash_value = filemeta['hashes'][hash_function]
     hash = Hash()
     hash['function'] = int(HashFunction(hash_function))
-    digest = BinaryData()\
-             .subtype(explicitTag=tag.Tag(tag.tagClassContext,
-                                          tag.tagFormatConstructed, 1))
-    octetString = univ.OctetString(hexValue=hash_value)\
-                  .subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                               tag.tagFormatSimple, 1))
+    digest = _DIGEST_TEMPLATE.clone()
+    # Digests are held as raw bytes in ASN.1, and as hex strings in JSON.
+    octetString = _OCTET_STRING_TEMPLATE.clone(
+        asn1_codec._unhexlify(hash_value))
     digest['octetString'] = octetString
     hash['digest'] = digest
     hashes[numberOfHashes] = hash
@@ -86,10 +165,8 @@ def get_json_signed(asn_metadata):
   # of asn_metadata['signed'].
   asn_signed = asn_metadata['signed']
 
-  timeserver_time = datetime.utcfromtimestamp(
-      asn_signed['currentTime']).isoformat() + 'Z'
-  previous_timeserver_time = datetime.utcfromtimestamp(
-      asn_signed['previousTime']).isoformat() + 'Z'
+  timeserver_time = seconds_to_time(asn_signed['currentTime'])
+  previous_timeserver_time = seconds_to_time(asn_signed['previousTime'])
   ecu_serial = str(asn_signed['ecuIdentifier'])
 
   target = asn_signed['installedImage']
@@ -107,10 +184,8 @@ def get_json_signed(asn_metadata):
   for j in range(numberOfHashes):
     hash = hashes[j]
     hash_function = hashenum_to_hashfunction[int(hash['function'])]
-    hash_value = hash['digest']['octetString'].prettyPrint()
-    assert hash_value.startswith('0x')
-    hash_value = hash_value[2:]
-    json_hashes[hash_function] = hash_value
+    json_hashes[hash_function] = binascii.hexlify(
+        hash['digest']['octetString'].asOctets()).decode('ascii')
   fileinfo['hashes'] = json_hashes
 
   installed_image = {
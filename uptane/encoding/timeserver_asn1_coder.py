@@ -23,14 +23,19 @@ from uptane.encoding.asn1_definitions import *
 import calendar
 from datetime import datetime
 
+# Subtyped types built once and cloned for each attestation, since subtype()
+# builds a new tag set as well as a new object.
+_SIGNED_TEMPLATE = TokensAndTimestamp()\
+                   .subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                tag.tagFormatConstructed, 0))
+_TOKENS_TEMPLATE = Tokens().subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                        tag.tagFormatSimple, 1))
+
 
 def get_asn_signed(json_signed):
-  signed = TokensAndTimestamp()\
-           .subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                        tag.tagFormatConstructed, 0))
+  signed = _SIGNED_TEMPLATE.clone()
   numberOfTokens = 0
-  tokens = Tokens().subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                                tag.tagFormatSimple, 1))
+  tokens = _TOKENS_TEMPLATE.clone()
   for token in json_signed['nonces']:
     # Some damned bug in pyasn1 I could not care less to fix right now.
     tokens.setComponentByPosition(numberOfTokens, token, False)
@@ -22,18 +22,22 @@ from uptane.encoding.asn1_definitions import *
 
 import uptane.encoding.ecu_manifest_asn1_coder as ecu_manifest_asn1_coder
 
+# Subtyped types built once and cloned for each manifest, since subtype()
+# builds a new tag set as well as a new object.
+_SIGNED_TEMPLATE = VehicleVersionManifestSigned()\
+                   .subtype(implicitTag=tag.Tag(tag.tagClassContext,
+                                                tag.tagFormatConstructed, 0))
+_ECU_VERSION_MANIFESTS_TEMPLATE = ECUVersionManifests()\
+    .subtype(implicitTag=tag.Tag(tag.tagClassContext, tag.tagFormatSimple, 3))
+
 
 def get_asn_signed(json_signed):
-  signed = VehicleVersionManifestSigned()\
-           .subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                        tag.tagFormatConstructed, 0))
+  signed = _SIGNED_TEMPLATE.clone()
 
   signed['vehicleIdentifier'] = json_signed['vin']
   signed['primaryIdentifier'] = json_signed['primary_ecu_serial']
 
-  ecuVersionManifests = ECUVersionManifests()\
-                        .subtype(implicitTag=tag.Tag(tag.tagClassContext,
-                                                     tag.tagFormatSimple, 3))
+  ecuVersionManifests = _ECU_VERSION_MANIFESTS_TEMPLATE.clone()
   numberOfECUVersionManifests = 0
 
   # We're going to generate a list of ECU Manifests from the dictionary of lists
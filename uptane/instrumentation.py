@@ -0,0 +1,525 @@
+"""
+<Program Name>
+  instrumentation.py
+
+<Purpose>
+  Lightweight timing instrumentation for the stages of the Uptane clients'
+  and services' work (e.g. DER encoding and decoding, signature verification,
+  metadata refreshes, downloads, and metadata archive construction).
+
+  Code is instrumented with named spans:
+
+    with instrumentation.span('primary.refresh_metadata'):
+      ...
+
+  or, for whole functions, with a decorator:
+
+    @instrumentation.timed('asn1.der_decode')
+    def convert_signed_der_to_dersigned_json(...):
+      ...
+
+  The time taken by each span is passed to each registered sink. Three sinks
+  are provided:
+
+   -HistogramSink keeps a histogram of the durations of each span in memory.
+   -PrometheusSink is a HistogramSink that can also produce its histograms in
+    the Prometheus text exposition format, to be served to a Prometheus
+    server.
+   -StatsdSink sends each duration to a statsd server over UDP.
+
+  Instrumentation is disabled until a sink is added, and while it is
+  disabled, spans cost only a check of the (empty) sink list: no time is
+  taken and nothing is recorded.
+
+  Use:
+    import uptane.instrumentation as instrumentation
+    histograms = instrumentation.HistogramSink()
+    instrumentation.add_sink(histograms)
+    ...
+    print(histograms.get_summary())
+
+  Span names are dotted, beginning with the component (e.g. 'primary.',
+  'secondary.', 'director.', 'asn1.', 'signature.').
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import uptane
+
+import math
+import socket
+import bisect
+import timeit
+import functools
+import threading
+
+log = uptane.logging.getLogger('uptane.instrumentation')
+
+# Default upper bounds, in seconds, of the buckets of the histograms kept by
+# HistogramSink. Durations above the last bound are counted in a final
+# unbounded bucket.
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Default address of the statsd server to which StatsdSink sends durations.
+DEFAULT_STATSD_HOST = '127.0.0.1'
+DEFAULT_STATSD_PORT = 8125
+
+# Default prefix for the names of the metrics sent to statsd or exposed to
+# Prometheus.
+DEFAULT_METRIC_PREFIX = 'uptane'
+
+_timer = timeit.default_timer
+
+# The registered sinks. This tuple is replaced, never modified, so that it can
+# be read without holding _sinks_lock.
+_sinks = ()
+_sinks_lock = threading.Lock()
+
+
+
+
+
+def add_sink(sink):
+  """
+  Registers a sink: an object with a method record(name, seconds, error),
+  which is called with the name of each span that ends, its duration in
+  seconds, and whether or not it ended with an exception. Enables
+  instrumentation.
+  """
+  global _sinks
+
+  with _sinks_lock:
+    if sink not in _sinks:
+      _sinks = _sinks + (sink,)
+
+
+
+
+
+def remove_sink(sink):
+  """
+  Unregisters the given sink, if registered. Once no sinks remain,
+  instrumentation is disabled.
+  """
+  global _sinks
+
+  with _sinks_lock:
+    _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+
+
+
+def clear_sinks():
+  """Unregisters every sink, disabling instrumentation."""
+  global _sinks
+
+  with _sinks_lock:
+    _sinks = ()
+
+
+
+
+
+def is_enabled():
+  """Returns True if any sinks are registered."""
+  return bool(_sinks)
+
+
+
+
+
+def record(name, seconds, error=False):
+  """
+  Passes a duration, in seconds, for the span with the given name to every
+  registered sink. Errors raised by sinks are logged, not raised.
+  """
+  for sink in _sinks:
+    try:
+      sink.record(name, seconds, error)
+    except Exception as e:
+      log.debug('Instrumentation sink ' + repr(sink) + ' failed to record ' +
+          repr(name) + ': ' + repr(e))
+
+
+
+
+
+class Span(object):
+  """
+  A context manager that times the code it encloses and records the duration
+  under its name (see record) when it exits. After it exits, self.seconds
+  holds the duration.
+  """
+  __slots__ = ('name', 'start_time', 'seconds')
+
+  def __init__(self, name):
+    self.name = name
+    self.start_time = None
+    self.seconds = None
+
+
+
+  def __enter__(self):
+    self.start_time = _timer()
+    return self
+
+
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    self.seconds = _timer() - self.start_time
+    record(self.name, self.seconds, exc_type is not None)
+    return False
+
+
+
+
+
+class _NullSpan(object):
+  """The span returned while instrumentation is disabled. Does nothing."""
+  __slots__ = ()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    return False
+
+
+
+_NULL_SPAN = _NullSpan()
+
+
+
+
+
+def span(name):
+  """
+  Returns a context manager timing the code it encloses as a span with the
+  given name. While instrumentation is disabled, this returns a shared
+  context manager that does nothing.
+  """
+  if not _sinks:
+    return _NULL_SPAN
+  return Span(name)
+
+
+
+
+
+def timed(name):
+  """
+  Decorator timing each call to the decorated function as a span with the
+  given name. While instrumentation is disabled, the function is called
+  directly.
+  """
+  def decorator(function):
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+      if not _sinks:
+        return function(*args, **kwargs)
+      with Span(name):
+        return function(*args, **kwargs)
+
+    return wrapper
+
+  return decorator
+
+
+
+
+
+class HistogramSink(object):
+  """
+  <Purpose>
+    A sink keeping, in memory, a histogram of the durations of each span,
+    along with the number of spans, the number that ended with an exception,
+    and the total, least and greatest durations. Thread-safe.
+
+  <Arguments>
+    buckets   (optional)
+      The upper bounds of the histogram buckets, in seconds, in increasing
+      order. Default DEFAULT_BUCKETS.
+
+  <Methods>
+    record(name, seconds, error=False)
+    get_names()
+    get_histogram(name)
+    percentile(name, fraction)
+    get_summary()
+    reset()
+  """
+
+  def __init__(self, buckets=DEFAULT_BUCKETS):
+    buckets = tuple(buckets)
+    if not buckets or list(buckets) != sorted(set(buckets)):
+      raise uptane.Error('Expected buckets to be a non-empty sequence of '
+          'increasing bounds; received ' + repr(buckets))
+
+    self.buckets = buckets
+    self._histograms = {}
+    self._lock = threading.Lock()
+
+
+
+  def record(self, name, seconds, error=False):
+    with self._lock:
+      histogram = self._histograms.get(name)
+      if histogram is None:
+        histogram = self._histograms[name] = _Histogram(len(self.buckets))
+      histogram.add(bisect.bisect_left(self.buckets, seconds), seconds, error)
+
+
+
+  def get_names(self):
+    """Returns the sorted names of the spans recorded."""
+    with self._lock:
+      return sorted(self._histograms)
+
+
+
+  def get_histogram(self, name):
+    """
+    Returns a dictionary describing the durations recorded for the span with
+    the given name, or None if none have been recorded:
+      'count', 'errors', 'sum', 'min', 'max' (all durations in seconds), and
+      'buckets': a list of (upper bound, number of durations up to and
+      including that bound) pairs, ending with (float('inf'), count).
+    """
+    with self._lock:
+      histogram = self._histograms.get(name)
+      if histogram is None:
+        return None
+
+      cumulative_counts = []
+      total = 0
+      for count in histogram.counts:
+        total += count
+        cumulative_counts.append(total)
+
+      return {
+          'count': histogram.count,
+          'errors': histogram.errors,
+          'sum': histogram.sum,
+          'min': histogram.min,
+          'max': histogram.max,
+          'buckets': list(zip(self.buckets + (float('inf'),),
+              cumulative_counts))}
+
+
+
+  def percentile(self, name, fraction):
+    """
+    Returns an estimate of the given percentile (a fraction from 0 to 1) of
+    the durations recorded for the span with the given name: the upper bound
+    of the bucket containing it, or the greatest duration if that is lower.
+    Returns None if no durations have been recorded.
+    """
+    histogram = self.get_histogram(name)
+    if histogram is None:
+      return None
+
+    rank = max(1, int(math.ceil(fraction * histogram['count'])))
+    for upper_bound, cumulative_count in histogram['buckets']:
+      if cumulative_count >= rank:
+        return min(upper_bound, histogram['max'])
+
+
+
+  def get_summary(self):
+    """
+    Returns a dictionary mapping the name of each span recorded to a
+    dictionary with its 'count', 'errors', and 'mean', 'p50', 'p99' and 'max'
+    durations in seconds (percentiles estimated as by percentile()).
+    """
+    summary = {}
+    for name in self.get_names():
+      histogram = self.get_histogram(name)
+      summary[name] = {
+          'count': histogram['count'],
+          'errors': histogram['errors'],
+          'mean': histogram['sum'] / histogram['count'],
+          'p50': self.percentile(name, 0.5),
+          'p99': self.percentile(name, 0.99),
+          'max': histogram['max']}
+    return summary
+
+
+
+  def reset(self):
+    """Discards everything recorded."""
+    with self._lock:
+      self._histograms = {}
+
+
+
+
+
+class _Histogram(object):
+  """The durations recorded for one span by HistogramSink."""
+  __slots__ = ('counts', 'count', 'errors', 'sum', 'min', 'max')
+
+  def __init__(self, bucket_count):
+    # One count per bucket, plus one for durations above the last bound.
+    self.counts = [0] * (bucket_count + 1)
+    self.count = 0
+    self.errors = 0
+    self.sum = 0.0
+    self.min = None
+    self.max = None
+
+
+
+  def add(self, bucket_index, seconds, error):
+    self.counts[bucket_index] += 1
+    self.count += 1
+    if error:
+      self.errors += 1
+    self.sum += seconds
+    if self.min is None or seconds < self.min:
+      self.min = seconds
+    if self.max is None or seconds > self.max:
+      self.max = seconds
+
+
+
+
+
+class PrometheusSink(HistogramSink):
+  """
+  <Purpose>
+    A HistogramSink whose histograms can be exposed to Prometheus: see
+    get_exposition. Serve its result (with Content-Type
+    PrometheusSink.CONTENT_TYPE) from an HTTP endpoint that Prometheus scrapes.
+
+  <Arguments>
+    buckets   (optional)
+      See HistogramSink.
+
+    prefix   (optional)
+      Prefix of the names of the metrics exposed. Default
+      DEFAULT_METRIC_PREFIX.
+  """
+  CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+  def __init__(self, buckets=DEFAULT_BUCKETS, prefix=DEFAULT_METRIC_PREFIX):
+    super(PrometheusSink, self).__init__(buckets)
+    self.prefix = prefix
+
+
+
+  def get_exposition(self):
+    """
+    Returns the histograms in the Prometheus text exposition format, as a
+    string: a histogram metric <prefix>_span_duration_seconds and a counter
+    metric <prefix>_span_errors_total, each labeled by span name.
+    """
+    duration_metric = self.prefix + '_span_duration_seconds'
+    errors_metric = self.prefix + '_span_errors_total'
+
+    duration_lines = [
+        '# HELP ' + duration_metric + ' Time spent in instrumented spans.',
+        '# TYPE ' + duration_metric + ' histogram']
+    error_lines = [
+        '# HELP ' + errors_metric + ' Instrumented spans that ended with an '
+        'exception.',
+        '# TYPE ' + errors_metric + ' counter']
+
+    for name in self.get_names():
+      histogram = self.get_histogram(name)
+      label = 'span="' + _escape_label_value(name) + '"'
+
+      for upper_bound, cumulative_count in histogram['buckets']:
+        duration_lines.append(duration_metric + '_bucket{' + label +
+            ',le="' + _format_bound(upper_bound) + '"} ' +
+            str(cumulative_count))
+      duration_lines.append(duration_metric + '_sum{' + label + '} ' +
+          repr(histogram['sum']))
+      duration_lines.append(duration_metric + '_count{' + label + '} ' +
+          str(histogram['count']))
+
+      error_lines.append(
+          errors_metric + '{' + label + '} ' + str(histogram['errors']))
+
+    return '\n'.join(duration_lines + error_lines) + '\n'
+
+
+
+
+
+def _escape_label_value(value):
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+
+
+
+def _format_bound(upper_bound):
+  if upper_bound == float('inf'):
+    return '+Inf'
+  return repr(float(upper_bound))
+
+
+
+
+
+class StatsdSink(object):
+  """
+  <Purpose>
+    A sink sending each duration to a statsd server over UDP, as a timing
+    metric (in milliseconds) named <prefix>.<span name>, and each span that
+    ended with an exception as an increment of the counter
+    <prefix>.<span name>.errors. Sending never blocks, and failures to send
+    are ignored.
+
+  <Arguments>
+    host, port   (optional)
+      The address of the statsd server. Default DEFAULT_STATSD_HOST and
+      DEFAULT_STATSD_PORT.
+
+    prefix   (optional)
+      Prefix of the names of the metrics sent. Default DEFAULT_METRIC_PREFIX.
+
+  <Methods>
+    record(name, seconds, error=False)
+    close()
+  """
+
+  def __init__(self, host=DEFAULT_STATSD_HOST, port=DEFAULT_STATSD_PORT,
+      prefix=DEFAULT_METRIC_PREFIX):
+    self.address = (host, port)
+    self.prefix = prefix
+    self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    self._socket.setblocking(False)
+
+
+
+  def record(self, name, seconds, error=False):
+    metric = self.prefix + '.' + _sanitize_statsd_name(name)
+    packet = metric + ':' + '%.3f' % (seconds * 1000) + '|ms'
+    if error:
+      packet += '\n' + metric + '.errors:1|c'
+
+    try:
+      self._socket.sendto(packet.encode('utf-8'), self.address)
+    except (socket.error, OSError):
+      pass
+
+
+
+  def close(self):
+    self._socket.close()
+
+
+
+
+
+def _sanitize_statsd_name(name):
+  """Replaces the characters that delimit fields in statsd packets."""
+  for character in ':|@\n':
+    name = name.replace(character, '_')
+  return name
@@ -0,0 +1,329 @@
+"""
+<Program Name>
+  models.py
+
+<Purpose>
+  Compact classes holding ECU Manifests and Vehicle Manifests, for code that
+  keeps many of them in memory (such as the Director's inventory,
+  uptane/services/inventorydb.py).
+
+  Elsewhere, these are handled as Python dictionaries conforming to the
+  schemas in uptane/formats.py, and that remains the format at API boundaries:
+  each class here is built from such a dictionary with from_dict() and turned
+  back into an equal one with to_dict(). Neither copies the strings, numbers,
+  hash dictionaries or nonce lists the dictionaries hold; the objects refer to
+  the same ones. Each class uses __slots__, so that an instance takes a
+  fraction of the memory of the dictionary it replaces.
+
+  Neither from_dict() nor to_dict() checks the format of the data: check the
+  dictionary against the schema in uptane.formats before converting it. The
+  schemas allow keys they do not list; from_dict() keeps any such keys (in
+  the instance's extra fields, None when there are none), and to_dict()
+  restores them, so that the dictionary produced is always equal to the one
+  converted.
+
+<Classes>
+  Signature
+  InstalledImage
+  ECUManifest
+  VehicleManifest
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+
+
+
+class _Model(object):
+  """
+  Base class for the classes in this module, comparing instances by the
+  values of their slots.
+  """
+  __slots__ = ()
+
+  def __eq__(self, other):
+    return type(self) is type(other) and all(
+        getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+
+
+  def __ne__(self, other):
+    return not self == other
+
+
+
+  # Instances are mutable, so are not hashable.
+  __hash__ = None
+
+
+
+  def __repr__(self):
+    return type(self).__name__ + '(' + ', '.join(
+        name + '=' + repr(getattr(self, name)) for name in self.__slots__) + ')'
+
+
+
+
+
+def _extra_items(dictionary, known_keys):
+  """
+  Returns a dictionary of the items in the given dictionary whose keys are not
+  among known_keys, or None if there are none.
+  """
+  extra = dict((key, value) for key, value in dictionary.items()
+      if key not in known_keys)
+  return extra or None
+
+
+
+
+
+def _with_extra_items(dictionary, extra):
+  """
+  Adds the given extra items (see _extra_items), if any, to the given
+  dictionary, and returns it.
+  """
+  if extra:
+    dictionary.update(extra)
+  return dictionary
+
+
+
+
+
+class Signature(_Model):
+  """
+  <Purpose>
+    A signature, as in tuf.formats.SIGNATURE_SCHEMA.
+
+  <Fields>
+    self.keyid
+    self.method
+    self.sig
+
+    self.extra
+      Any other items of the signature dictionary, or None.
+  """
+  __slots__ = ('keyid', 'method', 'sig', 'extra')
+
+  def __init__(self, keyid, method, sig, extra=None):
+    self.keyid = keyid
+    self.method = method
+    self.sig = sig
+    self.extra = extra
+
+
+
+  @classmethod
+  def from_dict(cls, signature):
+    return cls(signature['keyid'], signature['method'], signature['sig'],
+        _extra_items(signature, ('keyid', 'method', 'sig')))
+
+
+
+  def to_dict(self):
+    return _with_extra_items(
+        {'keyid': self.keyid, 'method': self.method, 'sig': self.sig},
+        self.extra)
+
+
+
+
+
+def _signatures_from_dicts(signatures):
+  return tuple([Signature.from_dict(signature) for signature in signatures])
+
+
+
+
+
+def _signatures_to_dicts(signatures):
+  return [signature.to_dict() for signature in signatures]
+
+
+
+
+
+class InstalledImage(_Model):
+  """
+  <Purpose>
+    The image installed on an ECU, as in tuf.formats.TARGETFILE_SCHEMA.
+
+  <Fields>
+    self.filepath
+
+    self.length
+
+    self.hashes
+      A dictionary mapping hash function to hex digest.
+
+    self.custom
+      The custom fileinfo, or None if there is none.
+
+    self.extra, self.fileinfo_extra
+      Any other items of the target file dictionary and of its fileinfo, or
+      None.
+  """
+  __slots__ = ('filepath', 'length', 'hashes', 'custom', 'extra',
+      'fileinfo_extra')
+
+  def __init__(self, filepath, length, hashes, custom=None, extra=None,
+      fileinfo_extra=None):
+    self.filepath = filepath
+    self.length = length
+    self.hashes = hashes
+    self.custom = custom
+    self.extra = extra
+    self.fileinfo_extra = fileinfo_extra
+
+
+
+  @classmethod
+  def from_dict(cls, targetfile):
+    fileinfo = targetfile['fileinfo']
+    return cls(targetfile['filepath'], fileinfo['length'], fileinfo['hashes'],
+        fileinfo.get('custom'),
+        _extra_items(targetfile, ('filepath', 'fileinfo')),
+        _extra_items(fileinfo, ('length', 'hashes', 'custom')))
+
+
+
+  def to_dict(self):
+    fileinfo = {'length': self.length, 'hashes': self.hashes}
+    if self.custom is not None:
+      fileinfo['custom'] = self.custom
+    return _with_extra_items({'filepath': self.filepath,
+        'fileinfo': _with_extra_items(fileinfo, self.fileinfo_extra)},
+        self.extra)
+
+
+
+
+
+class ECUManifest(_Model):
+  """
+  <Purpose>
+    A signed ECU Manifest, as in
+    uptane.formats.SIGNABLE_ECU_VERSION_MANIFEST_SCHEMA.
+
+  <Fields>
+    self.ecu_serial
+    self.timeserver_time
+    self.previous_timeserver_time
+    self.attacks_detected
+
+    self.installed_image
+      An InstalledImage.
+
+    self.signatures
+      A tuple of Signatures.
+
+    self.extra, self.signed_extra
+      Any other items of the signable dictionary and of its signed contents,
+      or None.
+  """
+  __slots__ = ('ecu_serial', 'installed_image', 'timeserver_time',
+      'previous_timeserver_time', 'attacks_detected', 'signatures', 'extra',
+      'signed_extra')
+  def __init__(self, ecu_serial, installed_image, timeserver_time,
+      previous_timeserver_time, attacks_detected, signatures, extra=None,
+      signed_extra=None):
+    self.ecu_serial = ecu_serial
+    self.installed_image = installed_image
+    self.timeserver_time = timeserver_time
+    self.previous_timeserver_time = previous_timeserver_time
+    self.attacks_detected = attacks_detected
+    self.signatures = signatures
+    self.extra = extra
+    self.signed_extra = signed_extra
+
+
+
+  @classmethod
+  def from_dict(cls, signed_ecu_manifest):
+    signed = signed_ecu_manifest['signed']
+    return cls(signed['ecu_serial'],
+        InstalledImage.from_dict(signed['installed_image']),
+        signed['timeserver_time'], signed['previous_timeserver_time'],
+        signed['attacks_detected'],
+        _signatures_from_dicts(signed_ecu_manifest['signatures']),
+        _extra_items(signed_ecu_manifest, ('signed', 'signatures')),
+        _extra_items(signed, ('ecu_serial', 'installed_image',
+            'timeserver_time', 'previous_timeserver_time', 'attacks_detected')))
+
+
+
+  def to_dict(self):
+    return _with_extra_items({
+        'signed': _with_extra_items({
+            'ecu_serial': self.ecu_serial,
+            'installed_image': self.installed_image.to_dict(),
+            'timeserver_time': self.timeserver_time,
+            'previous_timeserver_time': self.previous_timeserver_time,
+            'attacks_detected': self.attacks_detected}, self.signed_extra),
+        'signatures': _signatures_to_dicts(self.signatures)}, self.extra)
+
+
+
+
+
+class VehicleManifest(_Model):
+  """
+  <Purpose>
+    A signed Vehicle Manifest, as in
+    uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.
+
+  <Fields>
+    self.vin
+    self.primary_ecu_serial
+
+    self.ecu_manifests
+      A dictionary mapping ECU Serial to a list of ECUManifests.
+
+    self.signatures
+      A tuple of Signatures.
+
+    self.extra, self.signed_extra
+      Any other items of the signable dictionary and of its signed contents,
+      or None.
+  """
+  __slots__ = ('vin', 'primary_ecu_serial', 'ecu_manifests', 'signatures',
+      'extra', 'signed_extra')
+
+  def __init__(self, vin, primary_ecu_serial, ecu_manifests, signatures,
+      extra=None, signed_extra=None):
+    self.vin = vin
+    self.primary_ecu_serial = primary_ecu_serial
+    self.ecu_manifests = ecu_manifests
+    self.signatures = signatures
+    self.extra = extra
+    self.signed_extra = signed_extra
+
+
+
+  @classmethod
+  def from_dict(cls, signed_vehicle_manifest):
+    signed = signed_vehicle_manifest['signed']
+    ecu_manifests = dict(
+        (ecu_serial, [ECUManifest.from_dict(manifest) for manifest in manifests])
+        for ecu_serial, manifests in signed['ecu_version_manifests'].items())
+    return cls(signed['vin'], signed['primary_ecu_serial'], ecu_manifests,
+        _signatures_from_dicts(signed_vehicle_manifest['signatures']),
+        _extra_items(signed_vehicle_manifest, ('signed', 'signatures')),
+        _extra_items(
+            signed, ('vin', 'primary_ecu_serial', 'ecu_version_manifests')))
+
+
+
+  def to_dict(self):
+    ecu_version_manifests = dict(
+        (ecu_serial, [manifest.to_dict() for manifest in manifests])
+        for ecu_serial, manifests in self.ecu_manifests.items())
+    return _with_extra_items({
+        'signed': _with_extra_items({
+            'vin': self.vin,
+            'primary_ecu_serial': self.primary_ecu_serial,
+            'ecu_version_manifests': ecu_version_manifests}, self.signed_extra),
+        'signatures': _signatures_to_dicts(self.signatures)}, self.extra)
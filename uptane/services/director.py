@@ -27,31 +27,74 @@
       a map of ecu serials to target info (or filenames from which to extract
       target info)
 
+  Per-vehicle repositories are lightweight until needed: the Director keeps
+  only each vehicle's repository directory and any targets assigned to it that
+  have not yet been applied, and creates the tuf.repository_tool.Repository
+  object for a vehicle (from its metadata on disk, if any) when that
+  repository is first used. Since all vehicles' root metadata is identical, a
+  single on-disk copy of it is shared by every vehicle's staged and live
+  metadata. The Director's keys are not shared in memory, however: each
+  loaded Repository object has its own entries for them in tuf.keydb and
+  tuf.roledb, so the memory they take grows with the number of Repository
+  objects loaded (see VehicleRepositories), not with the number of vehicles.
+
 """
 from __future__ import unicode_literals
 
 import uptane # Import before TUF modules; may change tuf.conf values.
 import uptane.formats
 import uptane.common
+import uptane.instrumentation as instrumentation
 import uptane.services.inventorydb as inventory
 import uptane.encoding.asn1_codec as asn1_codec
 import tuf
 import tuf.formats
+import tuf.roledb
+import tuf.keydb
 import tuf.repository_tool as rt
 #import uptane.ber_encoder as ber_encoder
 from uptane import GREEN, RED, YELLOW, ENDCOLORS
 
 import os
+import time
+import shutil # for publishing metadata and copying targets
 import hashlib
+import collections
+import multiprocessing # for assign_campaign
+try:
+  from collections.abc import MutableMapping # Python 3
+except ImportError:
+  from collections import MutableMapping # Python 2
 
 from uptane.encoding.asn1_codec import DATATYPE_TIME_ATTESTATION
 from uptane.encoding.asn1_codec import DATATYPE_ECU_MANIFEST
 from uptane.encoding.asn1_codec import DATATYPE_VEHICLE_MANIFEST
 
-log = uptane.logging.getLogger('director')
-log.addHandler(uptane.file_handler)
-log.addHandler(uptane.console_handler)
-log.setLevel(uptane.logging.DEBUG)
+log = uptane.logging.getLogger('uptane.director')
+
+# Number of seconds until root metadata for vehicle repositories expires. All
+# vehicle repositories created by a Director share the same root expiration
+# date, so that their root metadata is identical and can be stored once.
+ROOT_EXPIRATION = 31556900 # about one year
+
+# Number of seconds until timestamp metadata refreshed by
+# Director.refresh_timestamps expires.
+TIMESTAMP_EXPIRATION = 86400 # one day
+
+# Name of the directory, inside the Director's repositories directory, in
+# which root metadata shared by vehicle repositories is kept.
+SHARED_ROOT_DIRNAME = '.shared_root'
+
+# Name of the file, inside the Director's repositories directory, in which the
+# lengths and hashes of target files are cached. See
+# uptane.common.FileinfoCache.
+FILEINFO_CACHE_FNAME = '.fileinfo_cache.json'
+
+# Names, inside each vehicle's repository directory, of the (hosted) live
+# metadata directory and of the two directories it alternately points to. The
+# live metadata directory is a symbolic link; see publish_vehicle_repository.
+LIVE_METADATA_DIRNAME = 'metadata'
+LIVE_METADATA_SLOTS = ('metadata.live.a', 'metadata.live.b')
 
 
 
@@ -74,12 +117,28 @@ class Director:
       Private signing key for the targets role in the Director's repositories
 
     vehicle_repositories
-      A dictionary of tuf.repository_tool.Repository objects, indexed by VIN.
-      Each holds the Director metadata geared toward that particular vehicle.
+      A VehicleRepositories object, which acts as a dictionary of
+      tuf.repository_tool.Repository objects, indexed by VIN. Each holds the
+      Director metadata geared toward that particular vehicle. Repository
+      objects are only created when a vehicle's repository is used.
 
     director_repos_dir
       The root directory in which the repositories for each vehicle reside.
 
+    root_expiration
+      The expiration date (a datetime.datetime object) of root metadata in
+      every vehicle repository this Director creates.
+
+    fileinfo_cache
+      An uptane.common.FileinfoCache holding the lengths and hashes of target
+      files in vehicle repositories, so that writing a vehicle's metadata does
+      not require reading every target file assigned to the vehicle again.
+
+    last_publication_report
+      A dictionary reporting the work done by the last call to write_to_live
+      and the time taken by each stage, or None if write_to_live has not been
+      called. See write_to_live.
+
   """
 
 
@@ -92,9 +151,14 @@ class Director:
     key_snapshot_pri,
     key_snapshot_pub,
     key_targets_pri,
-    key_targets_pub):
+    key_targets_pub,
+    max_loaded_repositories=None):
 
     """
+    max_loaded_repositories (optional) is the greatest number of vehicle
+    repositories whose tuf.repository_tool.Repository objects are kept in
+    memory at once; see VehicleRepositories. If not provided, there is no
+    limit.
     """
 
     tuf.formats.RELPATH_SCHEMA.check_match(director_repos_dir)
@@ -115,7 +179,18 @@ class Director:
     self.key_dirtarg_pri = key_targets_pri
     self.key_dirtarg_pub = key_targets_pub
 
-    self.vehicle_repositories = dict()
+    self.vehicle_repositories = VehicleRepositories(
+        self, max_loaded=max_loaded_repositories)
+
+    # Shared by all vehicle repositories so that their root metadata is
+    # identical. (Whole seconds, as expiration dates are written that way.)
+    self.root_expiration = tuf.formats.unix_timestamp_to_datetime(
+        int(time.time()) + ROOT_EXPIRATION)
+
+    self.fileinfo_cache = uptane.common.FileinfoCache(
+        os.path.join(director_repos_dir, FILEINFO_CACHE_FNAME))
+
+    self.last_publication_report = None
 
 
 
@@ -152,15 +227,18 @@ class Director:
     inventory.register_ecu(
         is_primary, vin, ecu_serial, ecu_key, overwrite=False)
 
-    log.info(
-        GREEN + 'Registered a new ECU, ' + repr(ecu_serial) + ' in '
-        'vehicle ' + repr(vin) + ' with ECU public key: ' + repr(ecu_key) +
-        ENDCOLORS)
+    # repr(ecu_key) is long; only build the message if it will be logged.
+    if log.isEnabledFor(uptane.logging.INFO):
+      log.info(
+          GREEN + 'Registered a new ECU, ' + repr(ecu_serial) + ' in '
+          'vehicle ' + repr(vin) + ' with ECU public key: ' + repr(ecu_key) +
+          ENDCOLORS)
 
 
 
 
 
+  @instrumentation.timed('director.validate_ecu_manifest')
   def validate_ecu_manifest(self, ecu_serial, signed_ecu_manifest):
     """
     Arguments:
@@ -210,6 +288,7 @@ class Director:
 
 
 
+  @instrumentation.timed('director.register_vehicle_manifest')
   def register_vehicle_manifest(
       self, vin, primary_ecu_serial, signed_vehicle_manifest):
     """
@@ -271,8 +350,9 @@ class Director:
       signed_vehicle_manifest = asn1_codec.convert_signed_der_to_dersigned_json(
           signed_vehicle_manifest, DATATYPE_VEHICLE_MANIFEST)
 
-    uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.check_match(
-        signed_vehicle_manifest)
+    with instrumentation.span('director.check_schema'):
+      uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.check_match(
+          signed_vehicle_manifest)
 
     if vin not in inventory.ecus_by_vin:
       raise uptane.UnknownVehicle('Received a vehicle manifest purportedly '
@@ -287,9 +367,14 @@ class Director:
     # the inventorydb.
     inventory.save_vehicle_manifest(vin, signed_vehicle_manifest)
 
-    log.info(GREEN + ' Received a Vehicle Manifest from Primary ECU ' +
-        repr(primary_ecu_serial) + ', with a valid signature from that ECU.' +
-        ENDCOLORS)
+    # A vehicle that has just checked in is likely to be given new targets, so
+    # keep its repository loaded.
+    self.vehicle_repositories.touch(vin)
+
+    if log.isEnabledFor(uptane.logging.INFO):
+      log.info(GREEN + ' Received a Vehicle Manifest from Primary ECU ' +
+          repr(primary_ecu_serial) + ', with a valid signature from that '
+          'ECU.' + ENDCOLORS)
     # TODO: Note that the above hasn't checked that the signature was from
     # a Primary, just from an ECU. Fix.
 
@@ -325,6 +410,7 @@ class Director:
 
 
 
+  @instrumentation.timed('director.verify_primary_signature')
   def validate_primary_certification_in_vehicle_manifest(
       self, vin, primary_ecu_serial, vehicle_manifest):
     """
@@ -430,7 +516,8 @@ class Director:
     # Otherwise, we save it:
     inventory.save_ecu_manifest(vin, ecu_serial, signed_ecu_manifest)
 
-    log.debug('Stored a valid ECU manifest from ECU ' + repr(ecu_serial))
+    if log.isEnabledFor(uptane.logging.DEBUG):
+      log.debug('Stored a valid ECU manifest from ECU ' + repr(ecu_serial))
 
     # Alert if there's been a detected attack.
     if signed_ecu_manifest['signed']['attacks_detected']:
@@ -466,16 +553,21 @@ class Director:
 
   def create_director_repo_for_vehicle(self, vin):
     """
-    Creates a separate repository object for a given vehicle identifier.
-    Each uses the same keys.
-    Ideally, each would use the same root.json file, but that will have to
-    wait until TUF Augmentation Proposal 5 (when the hash of root.json ceases
-    to be included in snapshot.json).
+    Creates a separate repository for a given vehicle identifier.
+    Each uses the same keys and the same root metadata. (Root metadata is
+    still listed in each vehicle's snapshot metadata, until TUF Augmentation
+    Proposal 5, but identical root metadata files are stored only once; see
+    write_vehicle_repository.)
 
     The name of each repository is the VIN string.
 
     If the repository already exists, it is overwritten.
 
+    Only the repository's directory is created here; the
+    tuf.repository_tool.Repository object for the vehicle is created when the
+    repository is first used, e.g. by indexing vehicle_repositories or by
+    writing the repository.
+
     Usage:
 
       d = uptane.services.director.Director(...)
@@ -485,7 +577,10 @@ class Director:
     These repository objects can be manipulated as described in TUF
     documentation; for example, to produce metadata files afterwards for that
     vehicle:
-      d.vehicle_repositories[vin].write()
+      d.write_vehicle_repository(vin)
+    Do not call write() on the repository object directly: the vehicle's root
+    metadata file may be shared with other vehicles (see
+    write_vehicle_repository), and TUF would overwrite the shared file.
 
 
     # TODO: This may be outside of the scope of the reference implementation,
@@ -506,22 +601,545 @@ class Director:
     # Then I strip the common prefix back off the absolute path to get a
     # relative path and keep the guarantees.
     # TODO: Clumsy and hacky; fix.
-    vin = uptane.common.scrub_filename(vin, self.director_repos_dir)
-    vin = os.path.relpath(vin, self.director_repos_dir)
+    repo_dir = uptane.common.scrub_filename(vin, self.director_repos_dir)
+    vin = os.path.relpath(repo_dir, self.director_repos_dir)
+
+    # Create the targets directory now, so that target files can be copied
+    # into place before the repository object itself is created.
+    targets_dir = os.path.join(repo_dir, 'targets')
+    if not os.path.exists(targets_dir):
+      os.makedirs(targets_dir)
+
+    self.vehicle_repositories.add(vin, repo_dir)
+
+
+
+
+
+  def write_vehicle_repository(self, vin, write_partial=False):
+    """
+    Signs and writes the metadata for the given vehicle's repository to its
+    metadata.staged directory, refreshing timestamp and snapshot metadata.
+
+    If the vehicle's root metadata is identical to that of other vehicles, the
+    file is replaced with a hard link to a single shared copy. Such a link is
+    replaced with a copy of its own before the repository is written again,
+    so the vehicle's repository should only be written by this method (or
+    other methods of this class), never by calling write() on its Repository
+    object directly.
+
+    write_partial is passed on to tuf.repository_tool.Repository.write.
+    """
+    uptane.formats.VIN_SCHEMA.check_match(vin)
+    tuf.formats.BOOLEAN_SCHEMA.check_match(write_partial)
+
+    if vin not in self.vehicle_repositories:
+      raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is not '
+          'that of a vehicle known to this Director.')
+
+    repo = self.vehicle_repositories[vin]
+
+    self._write_vehicle_repository(repo, write_partial)
+
+    self.vehicle_repositories.set_written(vin)
+
+
+
+
+
+  def publish_vehicle_repository(self, vin):
+    """
+    Makes the metadata last written to the given vehicle's metadata.staged
+    directory live, i.e. visible in the vehicle's (hosted) metadata directory.
+
+    The live metadata directory is a symbolic link to one of two directories,
+    LIVE_METADATA_SLOTS, used in turn. The slot not currently in use is
+    updated to match metadata.staged, and the link is then atomically
+    replaced by one to that slot, so that clients never see a partially
+    updated directory.
+
+    Only files that have changed since the metadata was last published are
+    written to the slot, each as a copy placed by renaming a temporary file.
+    Files identical to those live (e.g. targets and snapshot metadata when
+    only the timestamp has been refreshed) are instead hard linked to the
+    live ones, and files already in place are left alone. This costs a read
+    of each staged and live file of the same size, to compare them, but
+    metadata files are small and usually in the page cache, so it is cheaper
+    than rewriting every file for every publication. Files in slots are never
+    written in place, so links between the two slots are safe. Staged files
+    themselves are copied rather than linked, because TUF writes metadata
+    files in place: later writes to metadata.staged must not reach the live
+    metadata. Root metadata files are the exception: they are hard linked,
+    so that the live metadata too uses the copy shared by all vehicles (see
+    _share_root_metadata). That is safe because the Director replaces a
+    linked root metadata file with a copy of its own before TUF writes it
+    (see _unshare_root_metadata).
+
+    Raises uptane.Error if no metadata has been written for the vehicle.
+    """
+    uptane.formats.VIN_SCHEMA.check_match(vin)
+
+    if vin not in self.vehicle_repositories:
+      raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is not '
+          'that of a vehicle known to this Director.')
+
+    repo_dir = self.vehicle_repositories.get_repository_directory(vin)
+    staged_dir = os.path.join(repo_dir, 'metadata.staged')
+    live_dir = os.path.join(repo_dir, LIVE_METADATA_DIRNAME)
+
+    if not os.path.isdir(staged_dir):
+      raise uptane.Error('Unable to publish metadata for vehicle ' + repr(vin) +
+          ': no metadata has been written for it.')
+
+    # Populate whichever slot the live metadata directory does not point to.
+    current_slot = None
+    if os.path.islink(live_dir):
+      current_slot = os.path.basename(os.readlink(live_dir))
+
+    if current_slot == LIVE_METADATA_SLOTS[0]:
+      new_slot = LIVE_METADATA_SLOTS[1]
+    else:
+      new_slot = LIVE_METADATA_SLOTS[0]
+
+    new_slot_dir = os.path.join(repo_dir, new_slot)
+    if not os.path.exists(new_slot_dir):
+      os.makedirs(new_slot_dir)
+
+    staged_relpaths = set()
+    for dirpath, dirnames, filenames in os.walk(staged_dir):
+      for fname in filenames:
+        relpath = os.path.relpath(os.path.join(dirpath, fname), staged_dir)
+        staged_relpaths.add(relpath)
+        staged_filepath = os.path.join(staged_dir, relpath)
+        slot_filepath = os.path.join(new_slot_dir, relpath)
+
+        if fname.startswith('root.'):
+          _link_or_copy(staged_filepath, slot_filepath)
+          continue
+
+        if current_slot is not None:
+          live_filepath = os.path.join(repo_dir, current_slot, relpath)
+          if _same_contents(staged_filepath, live_filepath):
+            _link_or_copy(live_filepath, slot_filepath)
+            continue
+
+        if _same_contents(staged_filepath, slot_filepath):
+          continue
+
+        if not os.path.exists(os.path.dirname(slot_filepath)):
+          os.makedirs(os.path.dirname(slot_filepath))
+        temp_filepath = slot_filepath + '.new'
+        shutil.copyfile(staged_filepath, temp_filepath)
+        os.rename(temp_filepath, slot_filepath)
+
+    # Remove metadata no longer staged (e.g. that of removed delegations).
+    for dirpath, dirnames, filenames in os.walk(new_slot_dir):
+      for fname in filenames:
+        filepath = os.path.join(dirpath, fname)
+        if os.path.relpath(filepath, new_slot_dir) not in staged_relpaths:
+          os.remove(filepath)
+
+    # Swap the link. (The link is relative, so that the repository directory
+    # can be moved.)
+    temp_link = live_dir + '.new'
+    if os.path.lexists(temp_link):
+      os.remove(temp_link)
+    os.symlink(new_slot, temp_link)
+
+    if os.path.isdir(live_dir) and not os.path.islink(live_dir):
+      # A live metadata directory from before links were used. A link cannot
+      # be renamed over a directory, so this one time it is removed first.
+      shutil.rmtree(live_dir)
+
+    os.rename(temp_link, live_dir)
+
+    self.vehicle_repositories.set_published(vin)
+
+
+
+
+
+  def write_to_live(self, vins=None, processes=None):
+    """
+    <Purpose>
+      Releases updated metadata for the given vehicles (by default, all
+      vehicles known to this Director): writes the metadata of each vehicle
+      whose repository has been modified since it was last written (see
+      write_vehicle_repository) and publishes that of each vehicle whose
+      written metadata is not yet live (see publish_vehicle_repository).
+
+      Vehicles whose repositories have not changed are neither re-signed nor
+      republished.
+
+      If processes is given, each vehicle is written and published in one of
+      that many worker processes. Vehicles whose Repository objects are
+      loaded are first written (if modified) and unloaded in this process, so
+      that the workers can load them from disk. Since signing is the bulk of
+      the work, the time taken to release a fleet's metadata then falls
+      roughly in proportion to the number of processes, up to the number of
+      cores available.
+
+      The work done and the time taken by each stage are logged and saved in
+      self.last_publication_report:
+        {'vehicles': <number of vehicles published>,
+         'written': <number of vehicles whose metadata was written>,
+         'processes': <processes, or None>,
+         'seconds': <total time taken>,
+         'vehicles_per_second': <vehicles published per second>,
+         'stage_seconds': {
+             'prepare': <time spent writing and unloading loaded
+                        repositories for the workers>,
+             'write': <time spent writing (signing) metadata>,
+             'publish': <time spent publishing metadata>}}
+      With worker processes, the 'write' and 'publish' times are totals over
+      all workers, so they may exceed the total time taken.
+
+    <Arguments>
+      vins   (optional)
+        A list of VINs of the vehicles to release metadata for.
+
+      processes   (optional)
+        Positive integer, the number of worker processes with which to write
+        and publish vehicles' metadata. If not provided, all work is done in
+        this process.
+
+    <Exceptions>
+      tuf.FormatError if any of the arguments is not correctly formatted.
+      uptane.UnknownVehicle if any of the VINs is not that of a vehicle known
+      to this Director.
+
+    <Returns>
+      A list of the VINs of the vehicles whose metadata was published.
+    """
+    start_time = time.time()
+
+    if vins is None:
+      vins = list(self.vehicle_repositories)
+
+    if processes is not None:
+      tuf.formats.LENGTH_SCHEMA.check_match(processes)
+      if processes < 1:
+        raise tuf.FormatError('Expected processes to be at least 1; received '
+            + repr(processes))
+
+    for vin in vins:
+      uptane.formats.VIN_SCHEMA.check_match(vin)
+      if vin not in self.vehicle_repositories:
+        raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is '
+            'not that of a vehicle known to this Director.')
+
+    repositories = self.vehicle_repositories
+    vins_to_release = [vin for vin in vins
+        if repositories.is_modified(vin) or not repositories.is_published(vin)]
+
+    stage_seconds = {'prepare': 0.0, 'write': 0.0, 'publish': 0.0}
+    written_count = 0
+
+    if processes is None:
+      for vin in vins_to_release:
+        if repositories.is_modified(vin):
+          stage_start_time = time.time()
+          self.write_vehicle_repository(vin)
+          stage_seconds['write'] += time.time() - stage_start_time
+          written_count += 1
+
+        stage_start_time = time.time()
+        self.publish_vehicle_repository(vin)
+        stage_seconds['publish'] += time.time() - stage_start_time
+
+    else:
+      stage_start_time = time.time()
+      for vin in vins_to_release:
+        if repositories.is_loaded(vin):
+          # Writes the repository first if it has been modified.
+          was_modified = repositories.is_modified(vin)
+          repositories.unload(vin)
+          if was_modified:
+            written_count += 1
+      self.fileinfo_cache.save() # for worker processes
+
+      tasks = [(vin, repositories.get_repository_directory(vin),
+          repositories.is_written(vin), repositories.is_modified(vin),
+          repositories.get_pending_targets(vin)) for vin in vins_to_release]
+      stage_seconds['prepare'] = time.time() - stage_start_time
+
+      pool = self._create_worker_pool(processes)
+      try:
+        results = pool.map(_write_to_live_in_worker, tasks)
+      finally:
+        pool.close()
+        pool.join()
+
+      for vin, write_seconds, publish_seconds in results:
+        if write_seconds is not None:
+          repositories.set_written(vin)
+          stage_seconds['write'] += write_seconds
+          written_count += 1
+        repositories.set_published(vin)
+        stage_seconds['publish'] += publish_seconds
+
+    seconds = time.time() - start_time
+    self.last_publication_report = {
+        'vehicles': len(vins_to_release),
+        'written': written_count,
+        'processes': processes,
+        'seconds': seconds,
+        'vehicles_per_second':
+            len(vins_to_release) / seconds if seconds else 0.0,
+        'stage_seconds': stage_seconds}
+
+    log.info('Published metadata for ' + str(len(vins_to_release)) +
+        ' vehicles (' + str(written_count) + ' written) in ' +
+        '%.3f' % seconds + ' seconds: ' + ', '.join(
+        [stage + ' ' + '%.3f' % stage_seconds[stage]
+        for stage in ['prepare', 'write', 'publish']]) + '.')
+
+    return vins_to_release
+
+
+
+
+
+  def refresh_timestamp(self, vin):
+    """
+    <Purpose>
+      Re-signs the given vehicle's timestamp metadata with a new version
+      number and an expiration date TIMESTAMP_EXPIRATION seconds from now,
+      and writes it to the vehicle's metadata.staged directory.
+
+      If the vehicle's metadata is up to date (see
+      VehicleRepositories.is_modified), only the timestamp role is written:
+      the new timestamp metadata lists the snapshot metadata already in
+      metadata.staged, which, like root and targets metadata, is neither
+      regenerated nor re-signed. Otherwise, all of the vehicle's metadata is
+      written, as by write_vehicle_repository.
+
+      The metadata is not published; see publish_vehicle_repository.
+
+    <Arguments>
+      vin
+        The VIN of the vehicle whose timestamp metadata to refresh.
+
+    <Exceptions>
+      tuf.FormatError if vin is not correctly formatted.
+      uptane.UnknownVehicle if vin is not that of a vehicle known to this
+      Director.
+
+    <Returns>
+      True if only the timestamp metadata was written, False if all of the
+      vehicle's metadata was.
+    """
+    uptane.formats.VIN_SCHEMA.check_match(vin)
+
+    if vin not in self.vehicle_repositories:
+      raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is not '
+          'that of a vehicle known to this Director.')
+
+    modified = self.vehicle_repositories.is_modified(vin)
+
+    repo = self.vehicle_repositories[vin]
+    repo.timestamp.expiration = tuf.formats.unix_timestamp_to_datetime(
+        int(time.time()) + TIMESTAMP_EXPIRATION)
+
+    if modified:
+      self._write_vehicle_repository(repo)
+
+    else:
+      repo.mark_dirty(['timestamp'])
+      # Root metadata is written too if something has marked it dirty.
+      self._unshare_root_metadata(
+          os.path.join(repo._repository_directory, 'metadata.staged'))
+      repo.write()
+
+    self.vehicle_repositories.set_written(vin)
+
+    return not modified
+
+
+
+
+
+  def refresh_timestamps(self, vins=None):
+    """
+    <Purpose>
+      Keeps the given vehicles' (by default, all vehicles') metadata fresh:
+      refreshes each vehicle's timestamp metadata (see refresh_timestamp) and
+      publishes the result (see publish_vehicle_repository). Intended to be
+      called on a schedule, more often than TIMESTAMP_EXPIRATION; for
+      vehicles with no other changes, only timestamp metadata is signed.
+
+    <Arguments>
+      vins   (optional)
+        A list of VINs of the vehicles whose timestamp metadata to refresh.
+
+    <Exceptions>
+      tuf.FormatError if any of the VINs is not correctly formatted.
+      uptane.UnknownVehicle if any of the VINs is not that of a vehicle known
+      to this Director.
+
+    <Returns>
+      The number of vehicles for which only timestamp metadata was written.
+    """
+    if vins is None:
+      vins = list(self.vehicle_repositories)
+
+    start_time = time.time()
+    timestamp_only_count = 0
+
+    for vin in vins:
+      if self.refresh_timestamp(vin):
+        timestamp_only_count += 1
+      self.publish_vehicle_repository(vin)
+
+    log.info('Refreshed timestamp metadata for ' + str(len(vins)) +
+        ' vehicles (' + str(len(vins) - timestamp_only_count) + ' fully '
+        'written) in ' + '%.3f' % (time.time() - start_time) + ' seconds.')
+
+    return timestamp_only_count
+
+
+
 
-    self.vehicle_repositories[vin] = this_repo = rt.create_new_repository(
-        vin, repository_name=vin)
 
+  def _create_worker_pool(self, processes):
+    """
+    Returns a multiprocessing.Pool of the given number of worker processes,
+    each with a Director of its own using this Director's repositories
+    directory, keys and root expiration date (see
+    _initialize_worker_director).
+    """
+    keys = [
+        self.key_dirroot_pri, self.key_dirroot_pub,
+        self.key_dirtime_pri, self.key_dirtime_pub,
+        self.key_dirsnap_pri, self.key_dirsnap_pub,
+        self.key_dirtarg_pri, self.key_dirtarg_pub]
+
+    return multiprocessing.Pool(processes, _initialize_worker_director,
+        (self.director_repos_dir, keys, self.root_expiration))
+
+
+
+
+
+  def _write_vehicle_repository(self, repo, write_partial=False):
+    """
+    Writes the given vehicle Repository object's metadata to metadata.staged,
+    as described in write_vehicle_repository. Also called by
+    VehicleRepositories to save a modified repository before discarding it.
+    """
+    staged_dir = os.path.join(repo._repository_directory, 'metadata.staged')
+
+    repo.mark_dirty(['timestamp', 'snapshot'])
+
+    self._unshare_root_metadata(staged_dir)
+
+    with uptane.common.use_fileinfo_cache(self.fileinfo_cache,
+        os.path.join(repo._repository_directory, 'targets')):
+      repo.write(write_partial=write_partial)
+
+    self._share_root_metadata(staged_dir)
+
+
+
+
+
+  def _load_vehicle_repository(self, vin, repo_dir, written):
+    """
+    Creates the tuf.repository_tool.Repository object for a vehicle, loading
+    it from its metadata.staged directory if metadata has been written for it
+    before, or creating a new repository otherwise, and loads this Director's
+    keys into it. Called by VehicleRepositories when the repository is first
+    needed.
+    """
+    if written:
+      this_repo = rt.load_repository(repo_dir, repository_name=vin)
+
+    else:
+      this_repo = rt.create_new_repository(repo_dir, repository_name=vin)
+
+      this_repo.root.add_verification_key(self.key_dirroot_pub)
+      this_repo.timestamp.add_verification_key(self.key_dirtime_pub)
+      this_repo.snapshot.add_verification_key(self.key_dirsnap_pub)
+      this_repo.targets.add_verification_key(self.key_dirtarg_pub)
+      this_repo.root.expiration = self.root_expiration
 
-    this_repo.root.add_verification_key(self.key_dirroot_pub)
-    this_repo.timestamp.add_verification_key(self.key_dirtime_pub)
-    this_repo.snapshot.add_verification_key(self.key_dirsnap_pub)
-    this_repo.targets.add_verification_key(self.key_dirtarg_pub)
     this_repo.root.load_signing_key(self.key_dirroot_pri)
     this_repo.timestamp.load_signing_key(self.key_dirtime_pri)
     this_repo.snapshot.load_signing_key(self.key_dirsnap_pri)
     this_repo.targets.load_signing_key(self.key_dirtarg_pri)
 
+    return this_repo
+
+
+
+
+
+  def _share_root_metadata(self, metadata_dir):
+    """
+    Replaces each root metadata file in the given directory with a hard link
+    to a shared copy with the same contents, stored in SHARED_ROOT_DIRNAME
+    under a name that includes its hash. Vehicles with identical root metadata
+    thus use only one copy of it on disk.
+
+    TUF writes metadata files in place (overwriting the existing file rather
+    than replacing it), so each vehicle's root metadata is given a copy of its
+    own (see _unshare_root_metadata) before its repository is written again.
+    """
+    shared_dir = os.path.join(self.director_repos_dir, SHARED_ROOT_DIRNAME)
+    if not os.path.exists(shared_dir):
+      os.makedirs(shared_dir)
+
+    for fname in os.listdir(metadata_dir):
+      if not fname.startswith('root.'):
+        continue
+
+      vehicle_fname = os.path.join(metadata_dir, fname)
+      with open(vehicle_fname, 'rb') as fobj:
+        digest = hashlib.sha256(fobj.read()).hexdigest()
+      shared_fname = os.path.join(shared_dir, digest + '.' + fname)
+
+      try:
+        if not os.path.exists(shared_fname):
+          os.link(vehicle_fname, shared_fname)
+
+        elif not os.path.samefile(vehicle_fname, shared_fname):
+          temp_fname = vehicle_fname + '.link'
+          os.link(shared_fname, temp_fname)
+          os.rename(temp_fname, vehicle_fname)
+
+      except OSError as e:
+        # e.g. a filesystem that does not support hard links. The vehicle
+        # simply keeps its own copy.
+        log.debug('Unable to share root metadata file ' + repr(vehicle_fname) +
+            ': ' + repr(e))
+
+
+
+
+
+  def _unshare_root_metadata(self, metadata_dir):
+    """
+    Replaces each root metadata file in the given directory that is a hard link
+    to a shared copy (see _share_root_metadata) or to live metadata (see
+    publish_vehicle_repository) with a copy of its own, so that TUF, which
+    writes metadata files in place, can write the vehicle's root metadata
+    without modifying the shared copy and with it the root metadata of every
+    other vehicle sharing it, or the live metadata. Called before every write
+    of a vehicle's repository.
+    """
+    if not os.path.isdir(metadata_dir):
+      return
+
+    for fname in os.listdir(metadata_dir):
+      if not fname.startswith('root.'):
+        continue
+
+      vehicle_fname = os.path.join(metadata_dir, fname)
+      if os.stat(vehicle_fname).st_nlink > 1:
+        temp_fname = vehicle_fname + '.copy'
+        shutil.copyfile(vehicle_fname, temp_fname)
+        os.rename(temp_fname, vehicle_fname)
+
 
 
 
@@ -550,5 +1168,727 @@ class Director:
     #   raise uptane.UnknownECU('The ECU Serial provided, ' + repr(ecu_serial) +
     #       ' is not that of an ECU known to this Director.')
 
-    self.vehicle_repositories[vin].targets.add_target(
-        target_filepath, custom={'ecu_serial': ecu_serial})
+    self.vehicle_repositories.add_target(
+        vin, target_filepath, custom={'ecu_serial': ecu_serial})
+
+
+
+
+
+  def assign_campaign(
+      self, target_filepath, assignments, filepath_in_repo=None,
+      processes=None):
+    """
+    <Purpose>
+      Assigns one target (e.g. a firmware image) to many ECUs in many vehicles
+      at once, and writes the resulting metadata for each vehicle concerned to
+      its metadata.staged directory (as write_vehicle_repository does).
+
+      The target file is placed in each vehicle's targets directory as a hard
+      link where possible (otherwise as a copy). Its length and hashes are
+      computed once and cached in self.fileinfo_cache, so that writing each
+      vehicle's metadata does not require reading the file again.
+
+      A vehicle's targets metadata lists each target path once, with the
+      serial of the one ECU it is for, and the path must match that of the
+      target in the Image Repository. So at most one ECU per vehicle can be
+      assigned the target; assigning it to a second is an error.
+
+      If processes is given, vehicles are written in that many worker
+      processes. Vehicles whose Repository objects are loaded are written (if
+      modified) and unloaded first, so that each worker can load the vehicle's
+      repository from disk.
+
+    <Arguments>
+      target_filepath
+        Path to the target file to assign.
+
+      assignments
+        A list of (VIN, ECU Serial) pairs, each an ECU to assign the target
+        to.
+
+      filepath_in_repo   (optional)
+        The path, relative to each vehicle repository's targets directory, at
+        which the target is placed and by which clients will request it. If
+        not provided, the target's filename is used.
+
+      processes   (optional)
+        Positive integer, the number of worker processes with which to write
+        vehicles' metadata. If not provided, metadata is written in this
+        process.
+
+    <Exceptions>
+      tuf.FormatError if the arguments are not correctly formatted.
+      uptane.UnknownVehicle if any of the VINs are not known to this Director.
+      uptane.Error if target_filepath is not a file, or if more than one ECU
+      in the same vehicle is to be assigned the target.
+
+    <Returns>
+      A dictionary reporting the work done and the throughput achieved:
+        {'vehicles': <number of vehicles written>,
+         'assignments': <number of (VIN, ECU Serial) assignments>,
+         'seconds': <time taken>,
+         'vehicles_per_second': <vehicles written per second>}
+    """
+    start_time = time.time()
+
+    tuf.formats.RELPATH_SCHEMA.check_match(target_filepath)
+    if filepath_in_repo is None:
+      filepath_in_repo = os.path.basename(target_filepath)
+    tuf.formats.RELPATH_SCHEMA.check_match(filepath_in_repo)
+    if processes is not None:
+      tuf.formats.LENGTH_SCHEMA.check_match(processes)
+      if processes < 1:
+        raise tuf.FormatError('Expected processes to be at least 1; received '
+            + repr(processes))
+
+    if not os.path.isfile(target_filepath):
+      raise uptane.Error('Unable to assign target ' + repr(target_filepath) +
+          ': it is not a file.')
+
+    if not isinstance(assignments, (list, tuple)):
+      raise tuf.FormatError('Expected a list of (VIN, ECU Serial) pairs; '
+          'received ' + repr(assignments))
+
+    # Find the ECU for each vehicle, checking all arguments before changing
+    # anything.
+    ecu_by_vin = collections.OrderedDict()
+    for vin, ecu_serial in assignments:
+      uptane.formats.VIN_SCHEMA.check_match(vin)
+      uptane.formats.ECU_SERIAL_SCHEMA.check_match(ecu_serial)
+      if vin not in self.vehicle_repositories:
+        raise uptane.UnknownVehicle('The VIN provided, ' + repr(vin) + ' is '
+            'not that of a vehicle known to this Director.')
+      if ecu_by_vin.get(vin, ecu_serial) != ecu_serial:
+        raise uptane.Error('Unable to assign target ' + repr(filepath_in_repo) +
+            ' to both ECU ' + repr(ecu_by_vin[vin]) + ' and ECU ' +
+            repr(ecu_serial) + ' in vehicle ' + repr(vin) + ': a vehicle\'s '
+            'targets metadata can assign a target path to only one ECU.')
+      ecu_by_vin[vin] = ecu_serial
+
+    # Hash the target once. Hard links to it share its cache entry.
+    self.fileinfo_cache.get_fileinfo(target_filepath)
+    self.fileinfo_cache.save() # for worker processes
+
+    # Place the target in each vehicle's targets directory and add it to each
+    # vehicle's targets role, for the vehicle's ECU concerned.
+    for vin, ecu_serial in ecu_by_vin.items():
+      destination = os.path.join(
+          self.vehicle_repositories.get_repository_directory(vin), 'targets',
+          filepath_in_repo)
+      _link_or_copy(target_filepath, destination)
+
+      if processes is not None:
+        self.vehicle_repositories.unload(vin)
+
+      self.vehicle_repositories.add_target(
+          vin, destination, custom={'ecu_serial': ecu_serial})
+
+    # Write the metadata for each vehicle concerned.
+    if processes is None:
+      for vin in ecu_by_vin:
+        self.write_vehicle_repository(vin)
+
+    else:
+      tasks = [(vin, self.vehicle_repositories.get_repository_directory(vin),
+          self.vehicle_repositories.is_written(vin),
+          self.vehicle_repositories.get_pending_targets(vin))
+          for vin in ecu_by_vin]
+
+      pool = self._create_worker_pool(processes)
+      try:
+        written_vins = pool.map(_write_vehicle_repository_in_worker, tasks)
+      finally:
+        pool.close()
+        pool.join()
+
+      for vin in written_vins:
+        self.vehicle_repositories.set_written(vin)
+
+    seconds = time.time() - start_time
+    report = {
+        'vehicles': len(ecu_by_vin),
+        'assignments': len(assignments),
+        'seconds': seconds,
+        'vehicles_per_second': len(ecu_by_vin) / seconds if seconds else 0.0}
+
+    log.info('Assigned target ' + repr(filepath_in_repo) + ' to ' +
+        str(report['assignments']) + ' ECUs in ' + str(report['vehicles']) +
+        ' vehicles in ' + '%.3f' % seconds + ' seconds (' +
+        '%.1f' % report['vehicles_per_second'] + ' vehicles per second).')
+
+    return report
+
+
+
+
+
+class VehicleRepositories(MutableMapping):
+  """
+  <Purpose>
+    The Director's per-vehicle repositories: a dictionary-like object mapping
+    VIN to tuf.repository_tool.Repository object.
+
+    For each vehicle, only its repository directory, whether or not metadata
+    has been written for it, and any targets added to it that have not yet
+    been applied are kept. The Repository object for a vehicle (which holds
+    copies of the Director's keys and the vehicle's full role information) is
+    created by the Director the first time the vehicle's repository is
+    indexed.
+
+    Indexing does not mark a vehicle's repository as modified: a caller that
+    changes a Repository object obtained by indexing must say so with
+    mark_modified(vin), so that the vehicle's metadata is written (e.g. by
+    Director.write_to_live). Targets added with add_target, and Repository
+    objects set by assignment, are noted automatically.
+
+    At most max_loaded Repository objects are kept. When another is needed,
+    the least recently used one that is clean (whose metadata has been
+    written since it was last modified) is evicted: the object and TUF's role
+    and key information for it are discarded, and the next time that
+    vehicle's repository is indexed, it is loaded again from metadata.staged.
+    Eviction never writes metadata. Repository objects that are not clean
+    are kept, even if that means keeping more than max_loaded of them, until
+    they are written (e.g. by Director.write_vehicle_repository) or
+    explicitly unloaded.
+
+    Checking whether a VIN is known, iterating over VINs, and adding targets
+    (see add_target) do not create Repository objects.
+
+  <Fields>
+    self.max_loaded
+      The greatest number of Repository objects to keep, or None for no limit.
+
+    self.loads
+      Number of times a Repository object has been created or loaded.
+
+    self.evictions
+      Number of times a Repository object has been evicted.
+
+  <Methods>
+    add(vin, repo_dir)
+    add_target(vin, target_filepath, custom=None)
+    get_repository_directory(vin)
+    is_loaded(vin)
+    is_modified(vin)
+    is_published(vin)
+    mark_modified(vin)
+    set_written(vin)
+    set_published(vin)
+    touch(vin)
+    (and the usual dictionary methods)
+  """
+
+  def __init__(self, director, max_loaded=None):
+    if max_loaded is not None:
+      tuf.formats.LENGTH_SCHEMA.check_match(max_loaded)
+      if max_loaded < 1:
+        raise tuf.FormatError('Expected max_loaded to be at least 1; received '
+            + repr(max_loaded))
+
+    self.max_loaded = max_loaded
+    self.loads = 0
+    self.evictions = 0
+
+    # The Director that creates Repository objects and whose keys they use.
+    self._director = director
+
+    # VIN -> _VehicleRepositoryRecord, for every known vehicle.
+    self._records = dict()
+
+    # VIN -> tuf.repository_tool.Repository, for vehicles whose Repository
+    # objects have been created, least recently used first.
+    self._loaded = collections.OrderedDict()
+
+
+
+
+
+  def add(self, vin, repo_dir):
+    """
+    Adds a vehicle whose repository resides in repo_dir, replacing any
+    existing repository for that vehicle. No metadata is read or written.
+    """
+    if vin in self._loaded:
+      self._release(vin)
+    self._records[vin] = _VehicleRepositoryRecord(repo_dir)
+
+
+
+
+
+  def add_target(self, vin, target_filepath, custom=None):
+    """
+    Adds the given target file (which must be in the vehicle's repository's
+    targets directory) to the vehicle's targets role, with the given custom
+    data, as tuf.repository_tool.Targets.add_target would. If the vehicle's
+    Repository object has not been created, the target is recorded and added
+    when it is.
+    """
+    record = self._records[vin]
+
+    if vin in self._loaded:
+      self._loaded[vin].targets.add_target(target_filepath, custom=custom)
+      self.mark_modified(vin)
+      self.touch(vin)
+      return
+
+    # Perform the same checks that add_target would, so that errors are raised
+    # now rather than when the Repository object is created.
+    target_filepath = os.path.abspath(target_filepath)
+    targets_dir = os.path.join(record.repo_dir, 'targets')
+    if not target_filepath.startswith(targets_dir + os.sep):
+      raise tuf.Error(repr(target_filepath) + ' does not exist under the '
+          'repository\'s targets directory: ' + repr(targets_dir))
+    elif not os.path.isfile(target_filepath):
+      raise tuf.Error(repr(target_filepath) + ' is not a valid file.')
+
+    record.pending_targets.append((target_filepath, custom))
+
+
+
+
+
+  def get_repository_directory(self, vin):
+    """Returns the directory in which the vehicle's repository resides."""
+    return self._records[vin].repo_dir
+
+
+
+
+
+  def is_loaded(self, vin):
+    """
+    Returns True if the Repository object for the given vehicle has been
+    created, else False.
+    """
+    return vin in self._loaded
+
+
+
+
+
+  def is_written(self, vin):
+    """
+    Returns True if metadata has been written to the given vehicle's
+    metadata.staged directory, else False.
+    """
+    return self._records[vin].written
+
+
+
+
+
+  def is_modified(self, vin):
+    """
+    Returns True if the given vehicle's metadata must be written before it
+    reflects the vehicle's repository: if no metadata has been written for it,
+    or if targets have been added to it or it has been marked as modified (see
+    mark_modified) since. Else returns False.
+    """
+    record = self._records[vin]
+    return not record.written or record.changed or bool(record.pending_targets)
+
+
+
+
+
+  def is_published(self, vin):
+    """
+    Returns True if the metadata last written for the given vehicle has been
+    made live (see Director.publish_vehicle_repository), else False.
+    """
+    return self._records[vin].published
+
+
+
+
+
+  def get_pending_targets(self, vin):
+    """
+    Returns a list of the (target filepath, custom data) pairs added to the
+    given vehicle's targets role since its Repository object was last
+    created, which will be added to the object when it is next created.
+    """
+    return list(self._records[vin].pending_targets)
+
+
+
+
+
+  def mark_modified(self, vin):
+    """
+    Notes that the given vehicle's Repository object has been changed (other
+    than by add_target, which notes this itself), so that its metadata must be
+    written again, and that the object must not be evicted until it is.
+    """
+    self._records[vin].changed = True
+
+
+
+
+
+  def set_written(self, vin):
+    """
+    Notes that the given vehicle's metadata has been written to its
+    metadata.staged directory, so that its Repository object is loaded from
+    there in future rather than created anew, and need not be written before
+    it is evicted. Any pending targets are assumed to have been included.
+    The newly written metadata is not yet live.
+    """
+    record = self._records[vin]
+    record.written = True
+    record.changed = False
+    record.published = False
+    record.pending_targets = []
+
+    # Other Repository objects may now be evicted.
+    self._evict_if_over_budget(vin)
+
+
+
+
+
+  def set_published(self, vin):
+    """
+    Notes that the metadata last written for the given vehicle has been made
+    live.
+    """
+    self._records[vin].published = True
+
+
+
+
+
+  def unload(self, vin):
+    """
+    Discards the given vehicle's Repository object, if loaded, first writing
+    its metadata (as Director.write_vehicle_repository does) if it is not
+    clean. (See the class docstring.) Unlike eviction, which never writes,
+    this is only done when requested, e.g. so that worker processes can load
+    the repository from disk.
+    """
+    if vin not in self._loaded:
+      return
+
+    if not self._is_clean(vin):
+      self._director._write_vehicle_repository(self._loaded[vin])
+      self.set_written(vin)
+
+    self._evict(vin)
+
+
+
+
+
+  def touch(self, vin):
+    """
+    Marks the given vehicle's Repository object, if loaded, as the most
+    recently used, so that it is the last to be evicted. Does nothing if the
+    object is not loaded or the VIN is unknown.
+    """
+    if vin in self._loaded:
+      # (OrderedDict.move_to_end is not available in Python 2.)
+      self._loaded[vin] = self._loaded.pop(vin)
+
+
+
+
+
+  def __getitem__(self, vin):
+    record = self._records[vin]
+
+    if vin in self._loaded:
+      self.touch(vin)
+
+    else:
+      repo = self._director._load_vehicle_repository(
+          vin, record.repo_dir, record.written)
+      self.loads += 1
+
+      for target_filepath, custom in record.pending_targets:
+        repo.targets.add_target(target_filepath, custom=custom)
+      if record.pending_targets:
+        record.pending_targets = []
+        self.mark_modified(vin)
+
+      self._loaded[vin] = repo
+      self._evict_if_over_budget(vin)
+
+    return self._loaded[vin]
+
+
+
+
+
+  def __setitem__(self, vin, repository):
+    """
+    Replaces the Repository object for the given vehicle (e.g. with one loaded
+    from a backup of its metadata).
+    """
+    if vin in self._loaded and self._loaded[vin] is not repository:
+      self._release(vin)
+
+    if vin not in self._records:
+      self._records[vin] = _VehicleRepositoryRecord(
+          repository._repository_directory)
+
+    record = self._records[vin]
+    record.written = True
+    record.pending_targets = []
+    self.mark_modified(vin)
+    self._loaded.pop(vin, None)
+    self._loaded[vin] = repository
+    self._evict_if_over_budget(vin)
+
+
+
+
+
+  def __delitem__(self, vin):
+    if vin in self._loaded:
+      self._release(vin)
+    del self._records[vin]
+
+
+
+
+
+  def __contains__(self, vin):
+    return vin in self._records
+
+
+
+
+
+  def __iter__(self):
+    return iter(self._records)
+
+
+
+
+
+  def __len__(self):
+    return len(self._records)
+
+
+
+
+
+  def _evict_if_over_budget(self, vin_in_use):
+    """
+    Evicts clean Repository objects other than that of the vehicle in use,
+    least recently used first, until no more than self.max_loaded remain or
+    none of those remaining can be evicted.
+    """
+    if self.max_loaded is None or len(self._loaded) <= self.max_loaded:
+      return
+
+    for vin in [vin for vin in self._loaded
+        if vin != vin_in_use and self._is_clean(vin)]:
+      if len(self._loaded) <= self.max_loaded:
+        break
+      self._evict(vin)
+
+    if len(self._loaded) > self.max_loaded:
+      log.debug(str(len(self._loaded)) + ' vehicle repositories are loaded, '
+          'more than the limit of ' + str(self.max_loaded) + ', as some have '
+          'been modified and not yet written.')
+
+
+
+
+
+  def _is_clean(self, vin):
+    """
+    Returns True if the given vehicle's metadata has been written since its
+    Repository object was last modified, so that the object can be discarded
+    without losing anything.
+    """
+    record = self._records[vin]
+    return record.written and not record.changed
+
+
+
+
+
+  def _evict(self, vin):
+    self._release(vin)
+    self.evictions += 1
+
+
+
+
+
+  def __repr__(self):
+    return '<VehicleRepositories: ' + repr(len(self)) + ' vehicles, ' + \
+        repr(len(self._loaded)) + ' loaded>'
+
+
+
+
+
+  def _release(self, vin):
+    """
+    Discards the Repository object for the given vehicle, along with the
+    copies of its role and key information that TUF keeps (under the
+    repository's name) in tuf.roledb and tuf.keydb.
+    """
+    repo = self._loaded.pop(vin)
+
+    # TUF does not allow the default repository to be removed; that is only
+    # used if a caller loaded a repository without naming it.
+    repository_name = getattr(repo, '_repository_name', vin)
+    if repository_name != 'default':
+      tuf.roledb.remove_roledb(repository_name)
+      tuf.keydb.remove_keydb(repository_name)
+
+
+
+
+
+class _VehicleRepositoryRecord(object):
+  """
+  What VehicleRepositories keeps for every vehicle: the directory in which the
+  vehicle's repository resides, whether or not metadata has been written to
+  its metadata.staged directory, whether its loaded Repository object may
+  have been changed since then, whether the metadata last written has been
+  made live, and targets (pairs of target filepath and custom data) added
+  since its Repository object was last created.
+  """
+  def __init__(self, repo_dir):
+    self.repo_dir = repo_dir
+    self.written = False
+    self.changed = False
+    self.published = False
+    self.pending_targets = []
+
+
+
+
+
+def _link_or_copy(source_filepath, destination_filepath):
+  """
+  Places the file at source_filepath at destination_filepath (replacing any
+  file there), as a hard link if possible, otherwise as a copy. Does nothing
+  if the two are already the same file.
+  """
+  destination_dir = os.path.dirname(destination_filepath)
+  if not os.path.exists(destination_dir):
+    os.makedirs(destination_dir)
+
+  elif os.path.exists(destination_filepath) and \
+      os.path.samefile(source_filepath, destination_filepath):
+    return
+
+  temp_filepath = destination_filepath + '.new'
+  if os.path.exists(temp_filepath):
+    os.remove(temp_filepath)
+
+  try:
+    os.link(source_filepath, temp_filepath)
+  except OSError:
+    shutil.copy(source_filepath, temp_filepath)
+
+  os.rename(temp_filepath, destination_filepath)
+
+
+
+
+
+def _same_contents(filepath, other_filepath):
+  """
+  Returns True if other_filepath is a file with the same contents as the file
+  at filepath, else False. (Unlike filecmp.cmp, nothing is cached: metadata
+  files are rewritten in place, possibly more than once within the
+  resolution of their modification times.)
+  """
+  if not os.path.isfile(other_filepath) or \
+      os.path.getsize(filepath) != os.path.getsize(other_filepath):
+    return False
+
+  with open(filepath, 'rb') as fobj:
+    with open(other_filepath, 'rb') as other_fobj:
+      return fobj.read() == other_fobj.read()
+
+
+
+
+
+# The Director used by a worker process of a Director's worker pool.
+_worker_director = None
+
+def _initialize_worker_director(director_repos_dir, keys, root_expiration):
+  """
+  Runs in each worker process of a Director's worker pool (see
+  Director._create_worker_pool), creating a Director with the same
+  repositories directory, keys (a list of the eight arguments to Director
+  after director_repos_dir), and root expiration date as the Director using
+  the pool.
+  """
+  global _worker_director
+  _worker_director = Director(director_repos_dir, *keys)
+  _worker_director.root_expiration = root_expiration
+
+
+
+
+
+def _write_vehicle_repository_in_worker(task):
+  """
+  Runs in a worker process of Director.assign_campaign's pool. Given a VIN,
+  its repository directory, whether metadata has been written for it before,
+  and targets to add to it, loads (or creates) the vehicle's repository, adds
+  the targets, writes the vehicle's metadata, and discards the repository
+  object again. Returns the VIN.
+  """
+  vin, repo_dir, written, pending_targets = task
+
+  repositories = _worker_director.vehicle_repositories
+  repositories.add(vin, repo_dir)
+  if written:
+    repositories.set_written(vin)
+  for target_filepath, custom in pending_targets:
+    repositories.add_target(vin, target_filepath, custom=custom)
+
+  _worker_director.write_vehicle_repository(vin)
+
+  del repositories[vin]
+
+  return vin
+
+
+
+
+
+def _write_to_live_in_worker(task):
+  """
+  Runs in a worker process of Director.write_to_live's pool. Given a VIN, its
+  repository directory, whether metadata has been written for it before,
+  whether it has been modified since, and targets to add to it, writes the
+  vehicle's metadata if modified, publishes it, and discards the repository
+  object again. Returns the VIN, the time taken to write its metadata (None
+  if it was not written), and the time taken to publish it.
+  """
+  vin, repo_dir, written, modified, pending_targets = task
+
+  repositories = _worker_director.vehicle_repositories
+  repositories.add(vin, repo_dir)
+  if written:
+    repositories.set_written(vin)
+  for target_filepath, custom in pending_targets:
+    repositories.add_target(vin, target_filepath, custom=custom)
+
+  write_seconds = None
+  if modified:
+    start_time = time.time()
+    _worker_director.write_vehicle_repository(vin)
+    write_seconds = time.time() - start_time
+
+  start_time = time.time()
+  _worker_director.publish_vehicle_repository(vin)
+  publish_seconds = time.time() - start_time
+
+  del repositories[vin]
+
+  return vin, write_seconds, publish_seconds
@@ -25,9 +25,11 @@
 
       A dictionary indexed by the VINs (vehicle identification numbers) of
       known vehicles (uptane.format.VIN_SCHEMA), with values each being lists
-      of vehicle manifests from that vehicle - each list element is a manifest
-      with structure complying with the format specification
-      uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.
+      of vehicle manifests from that vehicle - each list element is an
+      uptane.models.VehicleManifest, built from a manifest complying with
+      the format specification
+      uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA. The get_*
+      functions below return them in that dictionary format.
 
       All known vehicles should be in this dictionary.
 
@@ -38,11 +40,13 @@
 
       A dictionary indexed by the ECU Serials of known ECUs
       (uptane.format.ECU_SERIAL_SCHEMA), with values each being lists of ECU
-      manifests from that ECU. Individual list elements comply with
+      manifests from that ECU. Individual list elements are
+      uptane.models.ECUManifests, built from manifests complying with
       uptane.formats.SIGNABLE_ECU_VERSION_MANIFEST_SCHEMA.
 
-      This is duplicated data, as all ECU Manifests were extracted from Vehicle
-      Manifests which are also saved in full in global vehicle_manifests.
+      All ECU Manifests were extracted from Vehicle Manifests which are also
+      saved in full in global vehicle_manifests. Where possible, the same
+      uptane.models.ECUManifest object is kept in both.
 
       All known ECU Serials should be in this dictionary.
 
@@ -117,6 +121,7 @@ from io import open
 
 import uptane # Import before TUF modules; may change tuf.conf values.
 import uptane.formats
+import uptane.models
 import tuf
 
 # Global dictionaries
@@ -154,7 +159,7 @@ def get_ecu_public_key(ecu_serial):
 
 def get_vehicle_manifests(vin):
   check_vin_registered(vin)
-  return vehicle_manifests[vin]
+  return [manifest.to_dict() for manifest in vehicle_manifests[vin]]
 
 
 
@@ -165,7 +170,7 @@ def get_last_vehicle_manifest(vin):
   if not vehicle_manifests[vin]:
     return None
   else:
-    return vehicle_manifests[vin][-1]
+    return vehicle_manifests[vin][-1].to_dict()
 
 
 
@@ -173,7 +178,7 @@ def get_last_vehicle_manifest(vin):
 
 def get_ecu_manifests(ecu_serial):
   check_ecu_registered(ecu_serial)
-  return ecu_manifests[ecu_serial]
+  return [manifest.to_dict() for manifest in ecu_manifests[ecu_serial]]
 
 
 
@@ -184,7 +189,7 @@ def get_last_ecu_manifest(ecu_serial):
   if not ecu_manifests[ecu_serial]:
     return None
   else:
-    return ecu_manifests[ecu_serial][-1]
+    return ecu_manifests[ecu_serial][-1].to_dict()
 
 
 
@@ -200,7 +205,8 @@ def save_vehicle_manifest(vin, signed_vehicle_manifest):
   uptane.formats.SIGNABLE_VEHICLE_VERSION_MANIFEST_SCHEMA.check_match(
        signed_vehicle_manifest)
 
-  vehicle_manifests[vin].append(signed_vehicle_manifest)
+  vehicle_manifests[vin].append(
+      uptane.models.VehicleManifest.from_dict(signed_vehicle_manifest))
 
 
   # Not doing it this way because the Director is going to pass through a
@@ -235,7 +241,8 @@ def get_all_ecu_manifests_from_vehicle(vin):
 
   ecus_in_vehicle = ecus_by_vin[vin]
 
-  return {serial: ecu_manifests[serial] for serial in ecus_in_vehicle}
+  return {serial: [manifest.to_dict() for manifest in ecu_manifests[serial]]
+      for serial in ecus_in_vehicle}
 
 
 
@@ -248,7 +255,19 @@ def save_ecu_manifest(vin, ecu_serial, signed_ecu_manifest):
   uptane.formats.SIGNABLE_ECU_VERSION_MANIFEST_SCHEMA.check_match(
        signed_ecu_manifest)
 
-  ecu_manifests[ecu_serial].append(signed_ecu_manifest)
+  manifest = uptane.models.ECUManifest.from_dict(signed_ecu_manifest)
+
+  # ECU Manifests are usually saved just after the Vehicle Manifest that
+  # contains them. If so, keep the object already held for it there rather
+  # than a second, equal one.
+  if vehicle_manifests.get(vin):
+    for contained_manifest in \
+        vehicle_manifests[vin][-1].ecu_manifests.get(ecu_serial, []):
+      if contained_manifest == manifest:
+        manifest = contained_manifest
+        break
+
+  ecu_manifests[ecu_serial].append(manifest)
 
 
 
@@ -0,0 +1,450 @@
+"""
+<Program Name>
+  metadataserver.py
+
+<Purpose>
+  Provides an HTTP server for the metadata and target files of repositories
+  (e.g. the Director's per-vehicle repositories, or the Image Repository),
+  built for many clients that frequently poll for metadata that has usually
+  not changed:
+
+   -Requests are handled concurrently, each in its own thread.
+   -Metadata files (files in a directory named 'metadata') are kept in memory
+    (see MetadataCache), so that most requests for them are answered without
+    touching the filesystem.
+   -Every response carries an ETag. For metadata, this is the SHA-256 hash of
+    the file's contents. A client that sends back the ETag it last received
+    in an If-None-Match header receives a body-less 304 (Not Modified)
+    response if the file is unchanged.
+   -Other files (targets, e.g. firmware images) are not cached in memory, and
+    are sent with sendfile where available, so that their contents need not
+    be copied through Python.
+
+  Only GET and HEAD requests are supported, and directories are not listed.
+
+  Use:
+    python -m uptane.services.metadataserver <port> <directory>
+
+"""
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import uptane # Import before TUF modules; may change tuf.conf values.
+
+import os
+import sys
+import time
+import shutil
+import hashlib
+import threading
+import collections
+from six.moves import BaseHTTPServer
+from six.moves import socketserver # for ThreadingMixIn
+from six.moves.urllib.parse import unquote
+
+log = uptane.logging.getLogger('uptane.metadataserver')
+
+# Default number of seconds for which a cached metadata file is served
+# without checking whether the file on disk has changed. Newly published
+# metadata may therefore be served up to this long after it is published.
+DEFAULT_CACHE_TTL = 1.0
+
+# Default maximum total size, in bytes, of the metadata files kept in memory.
+# The least recently used files are discarded to stay within it.
+DEFAULT_MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# Name of the directories whose files are treated as metadata.
+METADATA_DIRNAME = 'metadata'
+
+# Size of the chunks in which files are sent where sendfile is unavailable.
+_COPY_CHUNK_SIZE = 64 * 1024
+
+
+
+
+
+class MetadataCache(object):
+  """
+  <Purpose>
+    An in-memory cache of the contents and ETags of files, for
+    MetadataServer. Thread-safe.
+
+    A cached file is served from memory for ttl seconds after it was last
+    read or checked. After that, the next request for it checks the file's
+    identity, size and modification time (one stat call) and reads it again
+    only if one of them has changed.
+
+  <Fields>
+    self.ttl
+      Number of seconds for which a cached file is served without checking
+      the file on disk.
+
+    self.max_bytes
+      Greatest total size of the files kept, in bytes. Files larger than this
+      are never cached.
+
+    self.hits
+      Number of requests answered from memory without touching the disk.
+
+    self.checks
+      Number of requests for which the file on disk was checked and found
+      unchanged.
+
+    self.misses
+      Number of requests for which the file was (re-)read from disk.
+  """
+
+  def __init__(
+      self, ttl=DEFAULT_CACHE_TTL, max_bytes=DEFAULT_MAX_CACHE_BYTES):
+    self.ttl = ttl
+    self.max_bytes = max_bytes
+    self.hits = 0
+    self.checks = 0
+    self.misses = 0
+
+    self._lock = threading.Lock()
+
+    # filepath -> _CacheEntry, least recently used first.
+    self._entries = collections.OrderedDict()
+    self._size = 0
+
+
+
+
+
+  def get(self, filepath):
+    """
+    Returns a pair (ETag, contents) for the file at filepath, from memory if
+    possible. Raises IOError or OSError if the file cannot be read.
+    """
+    now = time.time()
+
+    with self._lock:
+      entry = self._entries.pop(filepath, None)
+      if entry is not None:
+        # (OrderedDict.move_to_end is not available in Python 2.)
+        self._entries[filepath] = entry
+        if now - entry.checked < self.ttl:
+          self.hits += 1
+          return entry.etag, entry.content
+
+    # Check the file on disk outside the lock, so that other requests are not
+    # held up by filesystem access.
+    stat_key = _stat_key(os.stat(filepath))
+
+    if entry is not None and entry.stat_key == stat_key:
+      with self._lock:
+        entry.checked = now
+        self.checks += 1
+      return entry.etag, entry.content
+
+    with open(filepath, 'rb') as fobj:
+      content = fobj.read()
+    etag = '"' + hashlib.sha256(content).hexdigest() + '"'
+
+    with self._lock:
+      self.misses += 1
+      self._discard(filepath)
+      if len(content) <= self.max_bytes:
+        self._entries[filepath] = _CacheEntry(stat_key, etag, content, now)
+        self._size += len(content)
+        while self._size > self.max_bytes:
+          self._discard(next(iter(self._entries)))
+
+    return etag, content
+
+
+
+
+
+  def _discard(self, filepath):
+    entry = self._entries.pop(filepath, None)
+    if entry is not None:
+      self._size -= len(entry.content)
+
+
+
+
+
+  def __len__(self):
+    return len(self._entries)
+
+
+
+
+
+class _CacheEntry(object):
+  """
+  A file cached by MetadataCache: what identifies the version of the file
+  read (see _stat_key), its ETag and contents, and when it was last read or
+  checked.
+  """
+  def __init__(self, stat_key, etag, content, checked):
+    self.stat_key = stat_key
+    self.etag = etag
+    self.content = content
+    self.checked = checked
+
+
+
+
+
+def _stat_key(stat_result):
+  """
+  Returns what identifies a version of a file, from the result of os.stat:
+  its device, inode, size and modification time. Since published files are
+  replaced rather than rewritten, a new version of a file has a new inode.
+  """
+  return (stat_result.st_dev, stat_result.st_ino, stat_result.st_size,
+      stat_result.st_mtime)
+
+
+
+
+
+class MetadataRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """
+  Answers GET and HEAD requests for files under the MetadataServer's root
+  directory. See the module docstring.
+  """
+  protocol_version = 'HTTP/1.1' # allows persistent connections
+  server_version = 'UptaneMetadataServer/1.0'
+
+  def do_GET(self):
+    self._respond(send_body=True)
+
+
+
+  def do_HEAD(self):
+    self._respond(send_body=False)
+
+
+
+  def _respond(self, send_body):
+    self.server.count_request()
+
+    filepath, is_metadata = self.server.translate_path(self.path)
+
+    if filepath is None or not os.path.isfile(filepath):
+      self._send_empty_response(404)
+      return
+
+    try:
+      if is_metadata:
+        self._send_metadata(filepath, send_body)
+      else:
+        self._send_target(filepath, send_body)
+
+    except (IOError, OSError) as e:
+      # e.g. the file was removed after it was found. If headers have already
+      # been sent, the connection is simply closed.
+      log.debug('Unable to send ' + repr(filepath) + ': ' + repr(e))
+      self.close_connection = True
+
+
+
+  def _send_metadata(self, filepath, send_body):
+    etag, content = self.server.cache.get(filepath)
+
+    if self._etag_matches(etag):
+      self._send_not_modified(etag)
+      return
+
+    self._send_headers(etag, len(content))
+    if send_body:
+      self.wfile.write(content)
+
+
+
+  def _send_target(self, filepath, send_body):
+    with open(filepath, 'rb') as fobj:
+      stat_key = _stat_key(os.fstat(fobj.fileno()))
+      etag = '"' + '-'.join(['%x' % int(value) for value in stat_key]) + '"'
+
+      if self._etag_matches(etag):
+        self._send_not_modified(etag)
+        return
+
+      length = stat_key[2]
+      self._send_headers(etag, length)
+      if not send_body:
+        return
+
+      self.wfile.flush()
+      if hasattr(self.connection, 'sendfile'): # Python 3.5+
+        self.connection.sendfile(fobj, 0, length)
+      else:
+        shutil.copyfileobj(fobj, self.wfile, _COPY_CHUNK_SIZE)
+
+
+
+  def _etag_matches(self, etag):
+    if_none_match = self.headers.get('If-None-Match')
+    if if_none_match is None:
+      return False
+    if if_none_match.strip() == '*':
+      return True
+    return etag in [tag.strip() for tag in if_none_match.split(',')]
+
+
+
+  def _send_headers(self, etag, length):
+    self.send_response(200)
+    self.send_header('Content-Type', 'application/octet-stream')
+    self.send_header('Content-Length', str(length))
+    self.send_header('ETag', etag)
+    # Clients may keep copies, but must check that they are current.
+    self.send_header('Cache-Control', 'no-cache')
+    self.end_headers()
+
+
+
+  def _send_not_modified(self, etag):
+    self.server.count_not_modified()
+    self.send_response(304)
+    self.send_header('ETag', etag)
+    self.send_header('Cache-Control', 'no-cache')
+    self.end_headers()
+
+
+
+  def _send_empty_response(self, code):
+    self.send_response(code)
+    self.send_header('Content-Length', '0')
+    self.end_headers()
+
+
+
+  def log_message(self, format, *args):
+    log.debug(self.address_string() + ' ' + format % args)
+
+
+
+
+
+class MetadataServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """
+  <Purpose>
+    A threaded HTTP server for the files in (and under) a directory. See the
+    module docstring.
+
+  <Arguments>
+    root_directory
+      The directory whose files to serve.
+
+    server_address
+      The (host, port) pair on which to listen.
+
+    cache_ttl   (optional)
+      See MetadataCache.
+
+    max_cache_bytes   (optional)
+      See MetadataCache.
+
+  <Fields>
+    self.root_directory
+      The absolute path of the directory whose files are served.
+
+    self.cache
+      The MetadataCache from which metadata files are served.
+
+    self.requests
+      Number of requests received.
+
+    self.not_modified
+      Number of requests answered with 304 (Not Modified).
+
+  <Methods>
+    serve_forever()  (see socketserver.BaseServer)
+    shutdown()  (see socketserver.BaseServer)
+    translate_path(url_path)
+  """
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, root_directory, server_address,
+      cache_ttl=DEFAULT_CACHE_TTL, max_cache_bytes=DEFAULT_MAX_CACHE_BYTES):
+
+    if not os.path.isdir(root_directory):
+      raise uptane.Error('Unable to serve ' + repr(root_directory) + ': it is '
+          'not a directory.')
+
+    self.root_directory = os.path.abspath(root_directory)
+    self.cache = MetadataCache(cache_ttl, max_cache_bytes)
+    self.requests = 0
+    self.not_modified = 0
+    self._counter_lock = threading.Lock()
+
+    # (HTTPServer is an old-style class in Python 2, so super() is not used.)
+    BaseHTTPServer.HTTPServer.__init__(
+        self, server_address, MetadataRequestHandler)
+
+
+
+
+
+  def translate_path(self, url_path):
+    """
+    Returns a pair: the path of the file under self.root_directory that the
+    given URL path refers to (or None if it does not refer to one), and
+    whether or not that file is treated as metadata (i.e. is in a directory
+    named METADATA_DIRNAME).
+    """
+    url_path = unquote(url_path.split('?', 1)[0].split('#', 1)[0])
+
+    components = [component for component in url_path.split('/')
+        if component not in ['', '.']]
+
+    if not components or any(
+        component == '..' or os.sep in component or
+        (os.altsep and os.altsep in component) for component in components):
+      return None, False
+
+    filepath = os.path.join(self.root_directory, *components)
+    is_metadata = METADATA_DIRNAME in components[:-1]
+
+    return filepath, is_metadata
+
+
+
+
+
+  def count_request(self):
+    with self._counter_lock:
+      self.requests += 1
+
+
+
+
+
+  def count_not_modified(self):
+    with self._counter_lock:
+      self.not_modified += 1
+
+
+
+
+
+def serve(root_directory, port, host=''):
+  """
+  Serves the files under root_directory on the given port until interrupted.
+  """
+  server = MetadataServer(root_directory, (host, port))
+  print('Serving ' + repr(server.root_directory) + ' on port ' + str(port))
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+
+
+
+
+
+if __name__ == '__main__':
+  if len(sys.argv) != 3:
+    print('Usage: python -m uptane.services.metadataserver <port> <directory>')
+    sys.exit(1)
+
+  serve(sys.argv[2], int(sys.argv[1]))
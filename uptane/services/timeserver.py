@@ -7,6 +7,15 @@
   Initialized with a key, the Timeserver will, when given a list of nonces,
   return a signed time attestation that includes those nonces.
 
+  Each Timeserver object has its own key (see class Timeserver). The
+  module-level functions use a default Timeserver whose key is set with
+  set_timeserver_key.
+
+  Under load, requests can be answered in batches (see
+  TimeAttestationBatcher): the nonces of all requests that arrive within a
+  short window are listed in a single signed attestation, which is returned to
+  every one of those requesters.
+
 """
 from __future__ import unicode_literals
 
@@ -27,10 +36,233 @@ else:
  PYASN1_EXISTS = True
 
 import time
+import threading # for Timeserver and TimeAttestationBatcher
+import collections # for TimeAttestationBatcher
+import multiprocessing # for Timeserver worker pools
 #log = uptane.logging.getLogger('timeserver')
 
 timeserver_key = None
 
+# Default length of time, in seconds, that a TimeAttestationBatcher waits to
+# gather further requests before signing an attestation for a batch.
+DEFAULT_BATCH_WINDOW = 0.02
+
+# Default maximum number of distinct nonces listed in a single batched
+# attestation. A batch that reaches this size is signed immediately.
+DEFAULT_BATCH_MAX_NONCES = 1024
+
+
+
+
+
+class Timeserver(object):
+  """
+  <Purpose>
+    An Uptane Timeserver with its own signing key. Given a list of nonces, it
+    returns a signed time attestation that includes those nonces.
+
+    Each instance has its own key, so a single process can serve attestations
+    for several fleets with different keys. Signing is safe to call from
+    multiple threads. Optionally, signing can be farmed out to a pool of
+    worker processes so that a single host can use all of its cores.
+
+    The module-level functions set_timeserver_key, get_signed_time, and
+    get_signed_time_der operate on a default instance of this class.
+
+  <Fields>
+    self.key
+      The private key with which this Timeserver signs attestations,
+      conforming to tuf.formats.ANYKEY_SCHEMA, or None if not yet set.
+
+    self.public_key
+      The public portion of self.key, or None if not yet set. This is what
+      clients should be configured to trust.
+
+    self.keyid
+      The keyid of self.key, or None if not yet set.
+
+    self.processes
+      The number of worker processes to sign in, or None to sign in the calling
+      thread.
+
+  <Methods>
+    set_key(private_key)
+    get_time(nonces)
+    get_signed_time(nonces)
+    get_signed_time_der(nonces)
+    close()
+  """
+
+  def __init__(self, private_key=None, processes=None):
+    """
+    <Arguments>
+      private_key   (optional)
+        The key to sign with, conforming to tuf.formats.ANYKEY_SCHEMA. May
+        instead be provided later via set_key.
+
+      processes   (optional)
+        If provided, a positive integer: the number of worker processes in the
+        pool used to sign attestations. The pool is started when first needed.
+        If not provided, attestations are signed in the calling thread.
+
+    <Exceptions>
+      tuf.FormatError if any of the arguments are not correctly formatted.
+    """
+    if processes is not None:
+      tuf.formats.LENGTH_SCHEMA.check_match(processes)
+      if processes < 1:
+        raise tuf.FormatError('Expected processes to be at least 1; received '
+            + repr(processes))
+
+    self.processes = processes
+    self.key = None
+    self.public_key = None
+    self.keyid = None
+
+    # Guards the key fields above (which must change together) and the pool.
+    self._lock = threading.Lock()
+    self._pool = None
+
+    if private_key is not None:
+      self.set_key(private_key)
+
+
+
+
+
+  def set_key(self, private_key):
+    """
+    Sets the key this Timeserver signs with, replacing any previous key.
+    The public key and keyid are derived once here rather than on each
+    request. Requests already being signed finish with the previous key.
+    """
+    tuf.formats.ANYKEY_SCHEMA.check_match(private_key)
+
+    # TODO: Add check to make sure it's a private key, not a public key.
+
+    public_key = uptane.common.public_key_from_canonical(private_key)
+
+    with self._lock:
+      self.key = private_key
+      self.public_key = public_key
+      self.keyid = private_key['keyid']
+
+
+
+
+
+  def get_time(self, nonces):
+    """
+    Returns an unsigned time attestation (time and nonces), conforming to
+    uptane.formats.TIMESERVER_ATTESTATION_SCHEMA.
+    """
+    return get_time(nonces)
+
+
+
+
+
+  def get_signed_time(self, nonces):
+    """
+    Returns a time attestation listing the given nonces, signed by this
+    Timeserver's key over the JSON encoding of the attestation, conforming to
+    uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA.
+    """
+    uptane.formats.NONCE_LIST_SCHEMA.check_match(nonces)
+    return self._sign(nonces, der=False)
+
+
+
+
+
+  def get_signed_time_der(self, nonces):
+    """
+    Same as get_signed_time, but converts the resulting Python dictionary into
+    an ASN.1 representation, encodes it as DER (Distinguished Encoding Rules),
+    replaces the signature with a signature over the hash of the DER encoding
+    of the 'signed' portion of the data (the time and nonces).
+    """
+    if not PYASN1_EXISTS:
+      raise uptane.Error('This Timeserver does not support DER: pyasn1 is not '
+          'installed.')
+    uptane.formats.NONCE_LIST_SCHEMA.check_match(nonces)
+    return self._sign(nonces, der=True)
+
+
+
+
+
+  def close(self):
+    """
+    Stops this Timeserver's worker processes, if any were started. If the
+    Timeserver is used again afterwards, a new pool is started.
+    """
+    with self._lock:
+      pool = self._pool
+      self._pool = None
+
+    if pool is not None:
+      pool.close()
+      pool.join()
+
+
+
+
+
+  def _sign(self, nonces, der):
+    # Take the key once so that the whole attestation is signed with the same
+    # key even if set_key is called concurrently.
+    key = self.key
+
+    if self.processes is None:
+      return _sign_time_attestation(key, nonces, der)
+
+    with self._lock:
+      if self._pool is None:
+        self._pool = multiprocessing.Pool(self.processes)
+      pool = self._pool
+
+    # Pool.apply is safe to call from multiple threads at once.
+    return pool.apply(_sign_time_attestation, (key, nonces, der))
+
+
+
+
+
+def _sign_time_attestation(private_key, nonces, der):
+  """
+  Produces a signed time attestation listing the given (already validated)
+  nonces. This is a module-level function so that it can be run in a worker
+  process of a Timeserver's pool.
+  """
+  time_attestation = get_time(nonces)
+
+  signable_time_attestation = tuf.formats.make_signable(time_attestation)
+  uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA.check_match(
+      signable_time_attestation)
+
+  if der:
+    # Convert it, re-signing over the hash of the DER encoding of the
+    # attestation.
+    return asn1_codec.convert_signed_metadata_to_der(
+        signable_time_attestation, DATATYPE_TIME_ATTESTATION,
+        private_key=private_key, resign=True)
+
+  uptane.common.sign_signable(
+      signable_time_attestation,
+      [private_key],
+      DATATYPE_TIME_ATTESTATION,
+      metadata_format='json')
+
+  return signable_time_attestation
+
+
+
+
+
+# The Timeserver used by the module-level functions below.
+default_timeserver = Timeserver()
+
 
 
 
@@ -39,9 +271,7 @@ def set_timeserver_key(private_key):
 
   global timeserver_key
 
-  tuf.formats.ANYKEY_SCHEMA.check_match(private_key)
-
-  # TODO: Add check to make sure it's a private key, not a public key.
+  default_timeserver.set_key(private_key)
 
   timeserver_key = private_key
 
@@ -68,19 +298,7 @@ def get_time(nonces):
 
 
 def get_signed_time(nonces):
-  time_attestation = get_time(nonces)
-
-  signable_time_attestation = tuf.formats.make_signable(time_attestation)
-  uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA.check_match(
-      signable_time_attestation)
-
-  uptane.common.sign_signable(
-      signable_time_attestation,
-      [timeserver_key],
-      DATATYPE_TIME_ATTESTATION,
-      metadata_format='json')
-
-  return signable_time_attestation
+  return default_timeserver.get_signed_time(nonces)
 
 
 
@@ -93,19 +311,182 @@ def get_signed_time_der(nonces):
   replaces the signature with a signature over the hash of the DER encoding of
   the 'signed' portion of the data (the time and nonces).
   """
-  if not PYASN1_EXISTS:
-    raise uptane.Error('This Timeserver does not support DER: pyasn1 is not '
-        'installed.')
-  time_attestation = get_time(nonces)
+  return default_timeserver.get_signed_time_der(nonces)
 
-  signable_time_attestation = tuf.formats.make_signable(time_attestation)
-  uptane.formats.SIGNABLE_TIMESERVER_ATTESTATION_SCHEMA.check_match(
-      signable_time_attestation)
 
-  # Convert it, re-signing over the hash of the DER encoding of the attestation.
-  der_attestation = asn1_codec.convert_signed_metadata_to_der(
-      signable_time_attestation, DATATYPE_TIME_ATTESTATION,
-      private_key=timeserver_key, resign=True)
 
 
-  return der_attestation
+
+class TimeAttestationBatcher(object):
+  """
+  <Purpose>
+    Answers concurrent requests for signed time attestations in batches.
+
+    The first request to arrive opens a batch and waits for a short window
+    (window, in seconds). The nonces of every request that arrives during that
+    window are added to the batch. At the end of the window (or sooner, if the
+    batch reaches max_nonces distinct nonces), a single attestation listing
+    all of the batch's nonces is signed, and that same attestation is returned
+    to each requester in the batch.
+
+    Because Primaries and Secondaries only check that the nonces they sent are
+    listed in the attestation, an attestation listing other vehicles' nonces
+    as well is valid for all of them, so no changes are needed to clients or
+    to the attestation format. The cost is one signature per batch instead of
+    one per request, at the price of up to window seconds of added latency.
+
+    This is only of use when requests are handled concurrently (e.g. by a
+    threading XML-RPC server); a single-threaded caller simply sees each of its
+    requests delayed by the window.
+
+  <Fields>
+    self.sign_function
+      Function that, given a list of nonces, returns a signed attestation
+      listing them, e.g. get_signed_time or get_signed_time_der.
+
+    self.window
+      Number of seconds to wait for further requests before signing a batch.
+
+    self.max_nonces
+      Maximum number of distinct nonces to list in a single attestation.
+
+    self.attestations_signed
+      Number of attestations signed so far.
+
+    self.requests_served
+      Number of requests answered so far (including failed requests).
+
+  <Methods>
+    get_signed_time(nonces)
+  """
+
+  def __init__(self, sign_function=None, window=DEFAULT_BATCH_WINDOW,
+      max_nonces=DEFAULT_BATCH_MAX_NONCES):
+    """
+    <Arguments>
+      sign_function
+        As described in the class docstring above. Defaults to
+        get_signed_time_der.
+
+      window   (optional)
+        Number of seconds (a non-negative int or float) to wait for further
+        requests before signing a batch.
+
+      max_nonces   (optional)
+        Positive integer, the maximum number of distinct nonces to list in a
+        single attestation.
+
+    <Exceptions>
+      tuf.FormatError if any of the arguments are not correctly formatted.
+    """
+    if sign_function is None:
+      sign_function = get_signed_time_der
+
+    elif not callable(sign_function):
+      raise tuf.FormatError('Expected sign_function to be callable; received '
+          + repr(sign_function))
+
+    if isinstance(window, bool) or not isinstance(window, (int, float)) or \
+        window < 0:
+      raise tuf.FormatError('Expected window to be a non-negative number of '
+          'seconds; received ' + repr(window))
+
+    tuf.formats.LENGTH_SCHEMA.check_match(max_nonces)
+    if max_nonces < 1:
+      raise tuf.FormatError('Expected max_nonces to be at least 1; received '
+          + repr(max_nonces))
+
+    self.sign_function = sign_function
+    self.window = window
+    self.max_nonces = max_nonces
+    self.attestations_signed = 0
+    self.requests_served = 0
+
+    # The batch currently accepting requests, if any, and the lock that guards
+    # it and the counters above.
+    self._open_batch = None
+    self._lock = threading.Lock()
+
+
+
+
+
+  def get_signed_time(self, nonces):
+    """
+    <Purpose>
+      Returns a signed time attestation listing the given nonces (and any
+      others requested in the same batch), in the form produced by
+      self.sign_function. Blocks until the batch has been signed.
+
+    <Arguments>
+      nonces
+        List of nonces, conforming to uptane.formats.NONCE_LIST_SCHEMA.
+
+    <Exceptions>
+      tuf.FormatError if nonces is not correctly formatted.
+
+      Any exception raised by self.sign_function while signing this request's
+      batch is raised to every requester in the batch.
+    """
+    uptane.formats.NONCE_LIST_SCHEMA.check_match(nonces)
+
+    with self._lock:
+      batch = self._open_batch
+      is_leader = batch is None
+      if is_leader:
+        batch = self._open_batch = _TimeAttestationBatch()
+
+      for nonce in nonces:
+        batch.nonces[nonce] = True
+
+      # If this batch is full, close it so that later requests start a new one,
+      # and wake the leader so that it signs this batch now.
+      if len(batch.nonces) >= self.max_nonces:
+        self._open_batch = None
+        batch.full.set()
+
+    if is_leader:
+      # The request that opened the batch is responsible for signing it once
+      # the window has elapsed.
+      batch.full.wait(self.window)
+      with self._lock:
+        if self._open_batch is batch:
+          self._open_batch = None
+        nonces_to_attest = list(batch.nonces)
+
+      try:
+        batch.result = self.sign_function(nonces_to_attest)
+      except Exception as e:
+        batch.error = e
+      finally:
+        with self._lock:
+          self.attestations_signed += 1
+        batch.done.set()
+
+    else:
+      batch.done.wait()
+
+    with self._lock:
+      self.requests_served += 1
+
+    if batch.error is not None:
+      raise batch.error
+
+    return batch.result
+
+
+
+
+
+class _TimeAttestationBatch(object):
+  """
+  Requests gathered by a TimeAttestationBatcher to be answered with a single
+  attestation. nonces is an OrderedDict used as an ordered set, so that each
+  nonce is listed only once and in the order in which it was requested.
+  """
+  def __init__(self):
+    self.nonces = collections.OrderedDict()
+    self.full = threading.Event()
+    self.done = threading.Event()
+    self.result = None
+    self.error = None